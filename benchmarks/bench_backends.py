@@ -0,0 +1,88 @@
+"""Measures how speech backend selection copes with a slow, flaky backend.
+
+Speaks a batch of utterances through a Synthesizer whose preferred backend
+answers slowly and sometimes fails (like gTTS on a bad connection), next to a
+fast local one, then reports where each utterance went and how long it took
+to start. Both backends are stubs, so it runs anywhere. Run from the root
+directory with:
+    python -m benchmarks.bench_backends
+"""
+import random
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+from speech import BackendSelector, SpeechBackend, Synthesizer
+from speechcache import SpeechCache
+
+UTTERANCES = 40
+
+
+class StubBackend(SpeechBackend):
+    """A backend taking about latency seconds that fails failure_rate of the
+    time, after latency seconds.
+    """
+
+    lang = 'en'
+    fmt = 'mp3'
+
+    def __init__(self, name, latency, failure_rate=0.0):
+        self.name = name
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.used = 0
+
+    def stream(self, text):
+        # Jitter by up to a fifth either way
+        sleep(self.latency * random.uniform(0.8, 1.2))
+        if random.random() < self.failure_rate:
+            raise ConnectionError()
+        self.used += 1
+        yield b'\xff\xf3' + text.encode()
+
+
+def run(backends, directory):
+    """Returns the time-to-first-part of every utterance, in seconds, and how
+    many utterances could not be spoken at all.
+    """
+    synthesizer = Synthesizer(SpeechCache(directory), BackendSelector(
+        backends, cooldown=0.5
+    ))
+    latencies = []
+    silent = 0
+    for index in range(UTTERANCES):
+        start = monotonic()
+        clips = iter(synthesizer.stream('Utterance {}.'.format(index)))
+        try:
+            next(clips)
+        except ConnectionError:
+            silent += 1
+        latencies.append(monotonic() - start)
+        # Let it finish caching before moving on
+        list(clips)
+    return latencies, silent
+
+
+def report(label, backends, directory):
+    """Print percentiles of latencies and how often each backend was used."""
+    latencies, silent = run(backends, directory)
+    ordered = sorted(latencies)
+    print('  {:<14} p50 {:.3f}s  p95 {:.3f}s  silent {:>2}  ({})'.format(
+        label, ordered[len(ordered) // 2],
+        ordered[round(0.95 * (len(ordered) - 1))], silent,
+        ', '.join('{} {}'.format(b.name, b.used) for b in backends)
+    ))
+
+
+def main():
+    random.seed(0)
+    print('Speaking {} utterances:'.format(UTTERANCES))
+    with TemporaryDirectory() as directory:
+        remote = StubBackend('remote', 0.3, failure_rate=0.2)
+        report('remote only', [remote], directory)
+    with TemporaryDirectory() as directory:
+        remote = StubBackend('remote', 0.3, failure_rate=0.2)
+        local = StubBackend('local', 0.02)
+        report('remote, local', [remote, local], directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Measures hotword detection as the number of models grows.
+
+Detects a growing number of models with a ShardedDetector, first as a single
+shard (the same work a single snowboy detector does) and then with a shard
+per core, and reports the CPU used (by every process, as a share of one core)
+and how long each hotword took to be detected after its audio was captured.
+snowboy and the microphone are stubs (see StubSnowboyDetect), so it runs
+anywhere. Run from the root directory with:
+    python -m benchmarks.bench_detection [CPU seconds per model per second]
+"""
+import os
+import random
+import sys
+from threading import Event, Thread
+from time import monotonic, process_time, sleep
+from detection import ShardedDetector
+from logquery import percentile
+from benchmarks.stubs import StubAudioStream, install_hardware
+
+MODEL_COUNTS = (4, 8, 16, 32, 64)
+HOTWORDS = 6
+# Seconds between hotwords, so each is its own utterance
+PAUSE = 0.4
+
+
+def cpu_seconds(pid):
+    """Returns the CPU seconds a process has used so far, from /proc."""
+    with open('/proc/{}/stat'.format(pid)) as stream:
+        # Skip past the command name, which may hold spaces
+        fields = stream.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def run(models, shards):
+    """Returns the CPU used as a share of one core, the latency of each
+    hotword (None if it was missed), and how many shards there were.
+    """
+    names = ['command{}'.format(number) for number in range(models)]
+    detector = ShardedDetector(
+        ['models/{}.pmdl'.format(name) for name in names],
+        resource='common.res', shards=shards, refractory=PAUSE / 2,
+        engine='benchmarks.stubs'
+    )
+    heard = dict()
+    woken = Event()
+
+    def hear(name):
+        heard[name] = monotonic()
+        woken.set()
+
+    latencies = []
+    done = Event()
+
+    def speak():
+        try:
+            for _ in range(HOTWORDS):
+                name = random.choice(names)
+                heard.pop(name, None)
+                woken.clear()
+                StubAudioStream.say(name)
+                woken.wait(5)
+                latencies.append(
+                    heard[name] - StubAudioStream.captured[name]
+                    if name in heard else None
+                )
+                sleep(PAUSE)
+        finally:
+            done.set()
+
+    pids = detector.pids
+    cpu_start = process_time() + sum(cpu_seconds(pid) for pid in pids)
+    wall_start = monotonic()
+    Thread(target=speak, daemon=True).start()
+    detector.start(
+        detected_callback=[
+            (lambda name=name: hear(name)) for name in names
+        ],
+        interrupt_check=done.is_set
+    )
+    cpu = process_time() + sum(cpu_seconds(pid) for pid in pids) - cpu_start
+    wall = monotonic() - wall_start
+    detector.terminate()
+    return cpu / wall, latencies, len(pids)
+
+
+def main():
+    random.seed(0)
+    if len(sys.argv) > 1:
+        os.environ['XAVIER_STUB_DETECT_COST'] = sys.argv[1]
+    install_hardware()
+    cores = os.cpu_count() or 1
+    print('{} core(s), {}s of CPU per model per second of audio:'.format(
+        cores, os.environ.get('XAVIER_STUB_DETECT_COST', '0.02')
+    ))
+    print('  {:>6} {:>6} {:>7} {:>9} {:>9} {:>7}'.format(
+        'models', 'shards', 'cpu', 'p50', 'max', 'missed'
+    ))
+    for models in MODEL_COUNTS:
+        for shards in sorted({1, cores}):
+            cpu, latencies, count = run(models, shards)
+            heard = [latency for latency in latencies if latency is not None]
+            print('  {:>6} {:>6} {:>6.0%} {:>9} {:>9} {:>7}'.format(
+                models, count, cpu,
+                *('-' if not heard else '{:.3f}s'.format(value)
+                  for value in (percentile(heard, 50), max(heard or [0]))),
+                len(latencies) - len(heard)
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measures how LogQuery copes with a long command history.
+
+Writes a JSON Lines log with years of made-up commands, then times indexing
+it from scratch, refreshing after a few more commands are logged, and
+answering queries from the index. Run from the root directory with:
+    python -m benchmarks.bench_logquery [number of records]
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from tempfile import TemporaryDirectory
+from time import monotonic
+from logger import json_line
+from logquery import LogQuery
+
+COMMANDS = [
+    'weather_today_full', 'weather_today_brief', 'time', 'date', 'joke',
+    'toggle_lamp', 'neat', 'why',
+]
+
+
+def write_history(path, records, start):
+    """Log records commands, a few minutes apart, from start onwards."""
+    when = start
+    with open(path, 'w') as stream:
+        for _ in range(records):
+            when += timedelta(minutes=random.randint(1, 10))
+            failed = random.random() < 0.05
+            stream.write(json_line(
+                time=when, level='WARN' if failed else 'INFO',
+                command=random.choice(COMMANDS),
+                duration=round(random.lognormvariate(0, 0.5), 6),
+                **{'stacktrace' if failed else 'output': 'x' * 80}
+            ))
+    return when
+
+
+def timed(label, func, *args):
+    """Run func, printing how long it took, and return its result."""
+    start = monotonic()
+    result = func(*args)
+    print('  {:<28} {:.3f}s'.format(label, monotonic() - start))
+    return result
+
+
+def main():
+    random.seed(0)
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'xavier.jsonl')
+        end = write_history(path, records, datetime(2015, 1, 1))
+        print('{} records ({:.0f}MB):'.format(
+            records, os.path.getsize(path) / 1024 / 1024
+        ))
+
+        query = LogQuery(path)
+        timed('index from scratch', query.refresh)
+        write_history(path + '.more', 100, end)
+        with open(path, 'a') as stream, open(path + '.more') as more:
+            stream.write(more.read())
+        timed('refresh after 100 more', LogQuery(path).refresh)
+        timed('stats for every command', query.stats)
+        timed('stats for a month', query.stats,
+              'weather_today_full', '2016-03-01', '2016-03-31')
+        timed('records for a month', query.records,
+              'weather_today_full', '2016-03-01', '2016-03-31')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Measures CPU time spent while a clip plays.
+
+Compares the old busy-wait in Body.play_sound to the Player, both against a
+stubbed mixer, so it runs anywhere. Run from the root directory with:
+    python -m benchmarks.bench_playback
+"""
+from time import monotonic, process_time
+from playback import Player
+from benchmarks.stubs import StubMusic
+
+CLIP_SECONDS = 1.0
+
+
+def busy_wait(music):
+    """The playback loop Body.play_sound used before the Player."""
+    music.load('clip.mp3')
+    music.play()
+    while music.get_busy():
+        continue
+
+
+def measure(play):
+    """Returns the wall and CPU seconds spent inside play()."""
+    wall_start, cpu_start = monotonic(), process_time()
+    play()
+    return monotonic() - wall_start, process_time() - cpu_start
+
+
+def main():
+    music = StubMusic(CLIP_SECONDS)
+    player = Player(music)
+
+    results = {
+        'busy-wait': measure(lambda: busy_wait(music)),
+        'player': measure(lambda: player.play('clip.mp3')),
+    }
+    player.stop()
+
+    print('Playing a {:.1f}s clip:'.format(CLIP_SECONDS))
+    for name, (wall, cpu) in results.items():
+        print('  {:10} wall {:6.3f}s  cpu {:6.3f}s  ({:5.1f}% of a core)'
+              .format(name, wall, cpu, 100 * cpu / wall))
+
+
+if __name__ == '__main__':
+    main()
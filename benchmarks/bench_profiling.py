@@ -0,0 +1,52 @@
+"""Measures what the profiling hook costs each command.
+
+Times many calls of a trivial command made the way HomeCommand makes them:
+directly, behind the disabled hook's check, and through each way of
+profiling. Run from the root directory with:
+    python -m benchmarks.bench_profiling
+"""
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from profiling import CommandProfiler
+
+CALLS = 2000
+
+
+def command():
+    """Stands in for a command that does next to nothing."""
+    return sum(range(100))
+
+
+def per_call(profiler):
+    """Returns the seconds each call takes through the hook."""
+    start = perf_counter()
+    for _ in range(CALLS):
+        if profiler is not None and profiler.enabled:
+            profiler.call('command', command)
+        else:
+            command()
+    return (perf_counter() - start) / CALLS
+
+
+def main():
+    with TemporaryDirectory() as directory:
+        direct = per_call(None)
+        print('Per call over {} calls:'.format(CALLS))
+        for label, profiler in (
+            ('direct', None),
+            ('hook disabled', CommandProfiler(directory=directory)),
+            ('sampled (threshold)', CommandProfiler(
+                threshold=60, directory=directory
+            )),
+            ('cProfile every 100th', CommandProfiler(
+                every=100, directory=directory
+            )),
+        ):
+            seconds = per_call(profiler)
+            print('  {:<22} {:>8.2f}us  (+{:.2f}us)'.format(
+                label, seconds * 1e6, (seconds - direct) * 1e6
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measures how many commands per second the CommandServer sustains.
+
+Serves a silent (IMMEDIATE) command that does nothing and a spoken (AUDIO)
+one that takes a few milliseconds, through a real CommandRegistry and
+CommandExecutor, then has more and more clients ask for them at once over
+kept-alive connections for a few seconds each. Prints the commands answered
+per second, how long answers took, and how many commands were dropped
+because their lane was full. Run from the root directory with:
+    python -m benchmarks.bench_server [seconds per run]
+"""
+import sys
+from http.client import HTTPConnection
+from statistics import quantiles
+from threading import Thread
+from time import monotonic, sleep
+from commandserver import CommandServer
+from enums import CommandPolicy
+from executor import CommandExecutor
+from registry import CommandRegistry
+
+CLIENTS = [1, 4, 16, 64]
+
+
+class Body:
+    """Stands in for a Body, with a real executor."""
+
+    def __init__(self):
+        self.executor = CommandExecutor()
+
+
+def toggle_lamp(body):
+    return 'toggled'
+
+
+def time(body):
+    # About how long a response that's already synthesized takes to queue
+    sleep(0.002)
+    return 'noon'
+
+
+def client(address, path, until, latencies, statuses):
+    """Ask for path over one connection until the given time."""
+    connection = HTTPConnection(*address)
+    while monotonic() < until:
+        start = monotonic()
+        connection.request('POST', path)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(monotonic() - start)
+        statuses.append(response.status)
+    connection.close()
+
+
+def run(server, name, clients, seconds):
+    """Returns the commands answered per second, the p50 and p99 seconds
+    answers took, and how many commands were dropped.
+    """
+    latencies = []
+    statuses = []
+    until = monotonic() + seconds
+    threads = [
+        Thread(target=client, args=(
+            server.address, '/commands/' + name, until, latencies, statuses
+        ))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cuts = quantiles(latencies, n=100)
+    return (statuses.count(200) / seconds, cuts[49], cuts[98],
+            statuses.count(503))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    toggle_lamp.policy = CommandPolicy.IMMEDIATE
+    time.policy = CommandPolicy.AUDIO
+    body = Body()
+    registry = CommandRegistry(body, {toggle_lamp: 0.5, time: 0.5})
+    server = CommandServer(registry, port=0)
+    server.start()
+    try:
+        for name in ('toggle_lamp', 'time'):
+            print('{}:'.format(name))
+            print('  {:>7} {:>10} {:>9} {:>9} {:>8}'.format(
+                'clients', 'per second', 'p50', 'p99', 'dropped'
+            ))
+            for clients in CLIENTS:
+                rate, p50, p99, dropped = run(server, name, clients, seconds)
+                print('  {:>7} {:>10.0f} {:>8.4f}s {:>8.4f}s {:>8}'.format(
+                    clients, rate, p50, p99, dropped
+                ))
+    finally:
+        server.stop()
+        body.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Measures time-to-first-audio for spoken responses.
+
+Compares the old path (save gTTS output to sounds/temp_voice.mp3, then load
+and play it) to streaming synthesized parts straight from memory into the
+Player, both with a stubbed gTTS and mixer, so it runs anywhere. Run from the
+root directory with:
+    python -m benchmarks.bench_tts
+"""
+import os
+from tempfile import TemporaryDirectory
+from time import monotonic
+from benchmarks.stubs import StubMusic, StubTTS, install_gtts
+
+install_gtts()
+from playback import Player  # noqa: E402
+from speech import Synthesizer, SPEECH_LANG  # noqa: E402
+from speechcache import SpeechCache  # noqa: E402
+
+# Roughly as long as a full weather broadcast
+TEXT = (
+    "Tonight, it's pretty cold outside with a temperature of 28! "
+    "It's a nice day, too! AND it's windy! Be sure to dress for the weather! "
+    "Tomorrow, it's cool with a temperature of 41! "
+    "It's a lame, cloudy day, too!"
+)
+
+
+class TimedMusic(StubMusic):
+    """StubMusic that remembers when it first started playing."""
+
+    def __init__(self):
+        super().__init__(clip_seconds=0.01)
+        self.first_play = None
+
+    def play(self):
+        if self.first_play is None:
+            self.first_play = monotonic()
+        super().play()
+
+
+def save_then_load(directory):
+    """Returns the time-to-first-audio of the old save-then-load path."""
+    music = TimedMusic()
+    start = monotonic()
+    path = os.path.join(directory, 'temp_voice.mp3')
+    StubTTS(TEXT, SPEECH_LANG).save(path)
+    music.load(path)
+    music.play()
+    return music.first_play - start
+
+
+def streamed(directory):
+    """Returns the time-to-first-audio of streaming from memory."""
+    music = TimedMusic()
+    player = Player(music, tick=0.01)
+    synthesizer = Synthesizer(SpeechCache(directory))
+    start = monotonic()
+    player.play(synthesizer.stream(TEXT))
+    player.stop()
+    return music.first_play - start
+
+
+def main():
+    parts = -(-len(TEXT) // 100)
+    print('Speaking {} characters ({} parts at {:.1f}s each):'.format(
+        len(TEXT), parts, StubTTS.part_seconds
+    ))
+    with TemporaryDirectory() as directory:
+        print('  save-then-load  first audio after {:.3f}s'.format(
+            save_then_load(directory)
+        ))
+        print('  streamed        first audio after {:.3f}s'.format(
+            streamed(directory)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Measures how much detection the voice gate saves, and what it costs.
+
+Runs a bank of stub hotword models (see StubSnowboyDetect) over recordings
+of a few rooms, first on everything heard and then behind a VoiceGate, and
+reports the CPU used (gate included), how much of the audio the gate let
+through, and how long each command took to be detected after it was said:
+the audio still to be captured once it ended, plus the time spent on the
+chunk it ended in. A command is only detected if the models heard all of it
+without being reset partway through, so a gate that clips a command's onset
+or ending misses it.
+
+No recordings ship with Xavier, so the recordings are made up from a fixed
+seed: room tone, some clatter and hiss, chatter, and commands (a breathy
+onset, then a few voiced syllables), at different distances. Needs numpy.
+Run from the root directory with:
+    python -m benchmarks.bench_vad [CPU seconds per model per second]
+"""
+import os
+import sys
+from time import perf_counter, thread_time
+import numpy as np
+from logquery import percentile
+from vad import GatedDetect, VoiceGate
+from benchmarks.stubs import StubSnowboyDetect
+
+RATE = 16000
+# Samples captured at a time, as snowboydecoder does
+CHUNK = 2048
+MODELS = 12
+SECONDS = 60
+# Each room's name, how loud its tone is, and how many bursts of clatter,
+# hiss, and chatter (which isn't a command) it has per minute
+ROOMS = (
+    ('quiet', 15, 2, 0, 0),
+    ('noisy', 120, 10, 6, 0),
+    ('chatty', 40, 4, 2, 10),
+)
+COMMANDS_PER_MINUTE = 6
+
+
+def utterance(rng, syllables, onset=True):
+    """Returns speech-like samples: voiced syllables with rising and falling
+    pitch, after a breathy onset that crosses zero as often as hiss does.
+    """
+    parts = []
+    if onset:
+        parts.append(rng.normal(0, 0.15, int(RATE * 0.05)))
+    for _ in range(syllables):
+        length = int(RATE * rng.uniform(0.12, 0.25))
+        times = np.arange(length) / RATE
+        pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * times))
+        phase = 2 * np.pi * np.cumsum(pitch) / RATE
+        voiced = sum(np.sin(harmonic * phase) / harmonic
+                     for harmonic in range(1, 9))
+        parts.append(voiced * np.hanning(length) / 2)
+        parts.append(np.zeros(int(RATE * rng.uniform(0.03, 0.08))))
+    return np.concatenate(parts)
+
+
+def record(rng, tone, clatter, hiss, chatter):
+    """Returns a minute of made-up audio as 16-bit PCM, and where each
+    command in it starts and ends (in samples).
+    """
+    audio = rng.normal(0, tone, SECONDS * RATE)
+    # Mains hum, which is loud but never voice-like enough to count
+    audio += tone * np.sin(2 * np.pi * 60 * np.arange(audio.size) / RATE)
+
+    def place(samples, amplitude):
+        start = int(rng.integers(0, audio.size - samples.size))
+        audio[start:start + samples.size] += amplitude * samples
+        return start, start + samples.size
+
+    # Commands are spread evenly, so nothing else lands on top of them
+    commands = []
+    spacing = audio.size // COMMANDS_PER_MINUTE
+    for number in range(COMMANDS_PER_MINUTE):
+        samples = utterance(rng, int(rng.integers(2, 5)))
+        start = number * spacing + int(rng.integers(0, spacing // 2))
+        amplitude = rng.uniform(1500, 8000)
+        audio[start:start + samples.size] += amplitude * samples
+        commands.append((start, start + samples.size))
+    for _ in range(clatter):
+        place(rng.normal(0, 1, int(RATE * 0.02)) *
+              np.exp(-np.arange(int(RATE * 0.02)) / 60), 12000)
+    for _ in range(hiss):
+        place(rng.normal(0, 1, int(RATE * rng.uniform(0.5, 2))), 2000)
+    for _ in range(chatter):
+        place(utterance(rng, int(rng.integers(4, 12)), onset=False),
+              rng.uniform(500, 3000))
+    pcm = np.clip(audio, -32768, 32767).astype('<i2')
+    return pcm, commands
+
+
+class FixtureDetect(StubSnowboyDetect):
+    """Stub models that hear a command once they've heard all of it.
+
+    Keeps track of which samples of the recording it has heard since it was
+    last reset: all of them in order, or whichever frames gate passed on.
+    """
+
+    def __init__(self, commands, gate=None):
+        super().__init__(b'common.res', ','.join(
+            'models/command{}.pmdl'.format(number)
+            for number in range(MODELS)
+        ).encode())
+        self.commands = list(commands)
+        self.gate = gate
+        # The first and next samples heard since I was reset
+        self.first = 0
+        self.next = 0
+
+    def Reset(self):
+        self.first = None
+
+    def RunDetection(self, data):
+        super().RunDetection(data)
+        if self.gate is None:
+            start, end = self.next, self.next + len(data) // 2
+        else:
+            size = self.gate.frame_size
+            start = int(self.gate.included[0]) * size
+            end = (int(self.gate.included[-1]) + 1) * size
+        if self.first is None:
+            self.first = start
+        self.next = end
+        for start, end in self.commands:
+            if self.first <= start and end <= self.next:
+                self.commands.remove((start, end))
+                return 1
+        return 0
+
+
+def run(pcm, commands, gated):
+    """Returns the CPU seconds used, the share of audio detected in, and the
+    latency of each command (None if it was missed).
+    """
+    gate = VoiceGate(rate=RATE) if gated else None
+    detect = FixtureDetect(commands, gate)
+    if gated:
+        detect = GatedDetect(detect, gate)
+    ends = {end: None for _, end in commands}
+    data = pcm.tobytes()
+    cpu_start = thread_time()
+    for start in range(0, pcm.size, CHUNK):
+        began = perf_counter()
+        answer = detect.RunDetection(data[start * 2:(start + CHUNK) * 2])
+        if answer > 0:
+            # The command that ended most recently is the one just heard
+            end = max(end for end in ends if end <= start + CHUNK)
+            ends[end] = (start + CHUNK - end) / RATE + perf_counter() - began
+    cpu = thread_time() - cpu_start
+    heard = gate.passed / gate.seen if gated else 1.0
+    return cpu, heard, list(ends.values())
+
+
+def main():
+    if len(sys.argv) > 1:
+        os.environ['XAVIER_STUB_DETECT_COST'] = sys.argv[1]
+    print('{} models, {}s of CPU per model per second of audio:'.format(
+        MODELS, os.environ.get('XAVIER_STUB_DETECT_COST', '0.02')
+    ))
+    print('  {:>7} {:>5} {:>7} {:>6} {:>7} {:>9} {:>9} {:>7}'.format(
+        'room', 'gate', 'cpu', 'saved', 'heard', 'p50', 'max', 'missed'
+    ))
+    for number, (room, *sounds) in enumerate(ROOMS):
+        pcm, commands = record(np.random.default_rng(number), *sounds)
+        baseline = None
+        for gated in (False, True):
+            cpu, heard, latencies = run(pcm, commands, gated)
+            baseline = baseline or cpu
+            detected = [latency for latency in latencies
+                        if latency is not None]
+            print('  {:>7} {:>5} {:>6.2f}s {:>6.0%} {:>7.0%} {:>9} {:>9} '
+                  '{:>7}'.format(
+                      room, 'on' if gated else 'off', cpu,
+                      1 - cpu / baseline, heard,
+                      *('-' if not detected else '{:.3f}s'.format(value)
+                        for value in (percentile(detected, 50),
+                                      max(detected or [0]))),
+                      len(latencies) - len(detected)
+                  ))
+
+
+if __name__ == '__main__':
+    main()
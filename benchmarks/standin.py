@@ -0,0 +1,162 @@
+"""Local stand-in for weather.gov and icanhazdadjoke.com.
+
+Answers the same paths with documents shaped like the real ones (including
+weather.gov's caching headers and ETags), after a fixed delay standing in for
+the network. Route an HttpClient to it with host_overrides. Run from the root
+directory with:
+    python -m benchmarks.standin [--latency SECONDS]
+which prints the server's base URL, then serves until stdin is closed, so it
+can run in its own process and stay out of whatever is being measured.
+"""
+import argparse
+import json
+import sys
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import sleep
+
+# Seconds forecasts may be cached for, as weather.gov usually sends
+FORECAST_MAX_AGE = 300
+# How many jokes the stand-in knows
+JOKE_COUNT = 300
+PERIOD_NAMES = [
+    'This Afternoon', 'Tonight', 'Monday', 'Monday Night', 'Tuesday',
+    'Tuesday Night', 'Wednesday', 'Wednesday Night', 'Thursday',
+    'Thursday Night', 'Friday', 'Friday Night', 'Saturday', 'Saturday Night',
+]
+POINTS = {'properties': {
+    'forecast': 'https://api.weather.gov/gridpoints/RNK/59,57/forecast',
+    'forecastHourly':
+        'https://api.weather.gov/gridpoints/RNK/59,57/forecast/hourly',
+}}
+FORECAST = {'properties': {'periods': [
+    {
+        'number': number, 'name': name,
+        'temperature': 40 + (number * 7) % 30,
+        'temperatureUnit': 'F',
+        'windSpeed': '{} to {} mph'.format(number % 10, number % 10 + 15),
+        'shortForecast': ('Mostly Cloudy', 'Clear', 'Chance Rain Showers')[
+            number % 3
+        ],
+        'detailedForecast': 'Partly sunny, with a high near 60. ' * 3,
+    }
+    for number, name in enumerate(PERIOD_NAMES, 1)
+]}}
+FORECAST_ETAG = '"{:08x}"'.format(
+    zlib.crc32(json.dumps(FORECAST).encode())
+)
+JOKES = [
+    {'id': 'joke{}'.format(number),
+     'joke': 'Why did joke {} cross the road? It\u2019s a secret.'.format(
+         number
+     )}
+    for number in range(JOKE_COUNT)
+]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like weather.gov and icanhazdadjoke.com, over keep-alive.
+
+    Set latency on the class to delay every answer by that many seconds.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def do_GET(self):
+        sleep(self.latency)
+        path, _, query = self.path.partition('?')
+        headers = {'Content-Type': 'application/json'}
+        if path.startswith('/points/'):
+            self.__send(200, POINTS, headers)
+        elif path.startswith('/gridpoints/'):
+            headers['Cache-Control'] = 'public, max-age={}'.format(
+                FORECAST_MAX_AGE
+            )
+            headers['ETag'] = FORECAST_ETAG
+            if self.headers.get('If-None-Match') == FORECAST_ETAG:
+                self.__send(304, None, headers)
+            else:
+                self.__send(200, FORECAST, headers)
+        elif path == '/search':
+            params = dict(
+                pair.partition('=')[::2] for pair in query.split('&') if pair
+            )
+            limit = int(params.get('limit', 20))
+            page = int(params.get('page', 1))
+            start = (page - 1) * limit
+            self.__send(200, {
+                'current_page': page, 'limit': limit,
+                'results': JOKES[start:start + limit],
+                'total_jokes': len(JOKES),
+                'total_pages': -(-len(JOKES) // limit),
+            }, headers)
+        elif path == '/':
+            self.__send(200, JOKES[0]['joke'].encode(),
+                        {'Content-Type': 'text/plain'})
+        else:
+            self.__send(404, {'status': 404}, headers)
+
+    def log_message(self, *args):
+        """Keep the benchmark output clean."""
+
+    # Helpers #
+    def __send(self, status, body, headers):
+        """Send a response, encoding body as JSON unless it is bytes."""
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves each connection on its own thread, like weather.gov would."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Ignore clients hanging up on kept-alive connections."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(latency=0.0):
+    """Start a stand-in server on a free local port, on a daemon thread.
+
+    Args:
+        latency (float): Seconds to delay every answer by.
+
+    Returns:
+        StandInServer: The running server. Its base URL is
+            http://127.0.0.1:<server_port>.
+    """
+    handler = type('Handler', (StandInHandler,), {'latency': latency})
+    server = StandInServer(('127.0.0.1', 0), handler)
+    Thread(target=server.serve_forever, name='standin', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve a stand-in for weather.gov and icanhazdadjoke.'
+    )
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds to delay every answer by')
+    args = parser.parse_args()
+
+    server = serve(args.latency)
+    print('http://127.0.0.1:{}'.format(server.server_port), flush=True)
+    # Serve until whoever started me closes my stdin
+    sys.stdin.read()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
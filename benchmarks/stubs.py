@@ -0,0 +1,416 @@
+import os
+import sys
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Condition, Event, Thread
+from time import monotonic, sleep, thread_time
+from types import ModuleType
+
+
+class StubMusic:
+    """Stands in for pygame.mixer.music without any audio hardware.
+
+    Every clip "plays" for a fixed number of seconds of wall-clock time, which
+    is all a caller can observe through get_busy.
+
+    Args:
+        clip_seconds (float): How long each clip plays for.
+    """
+
+    def __init__(self, clip_seconds=1.0):
+        self.clip_seconds = clip_seconds
+        self.__ends_at = 0.0
+
+    def load(self, source, namehint=''):
+        pass
+
+    def play(self):
+        self.__ends_at = monotonic() + self.clip_seconds
+
+    def stop(self):
+        self.__ends_at = 0.0
+
+    def get_busy(self):
+        return monotonic() < self.__ends_at
+
+
+class StubTTS:
+    """Stands in for gtts.gTTS without any network access.
+
+    Like gTTS, splits text into parts of at most 100 characters and makes one
+    "request" per part, each taking part_seconds, yielding a fake mp3 per part.
+
+    Args:
+        text (str): Text to speak.
+        lang (str): Language to speak it in.
+    """
+
+    # How long each part takes to synthesize; gTTS usually takes 0.2-0.5s
+    part_seconds = 0.3
+
+    def __init__(self, text, lang='en'):
+        self.text = text
+        self.lang = lang
+
+    def stream(self):
+        for start in range(0, len(self.text), 100):
+            sleep(self.part_seconds)
+            yield b'\xff\xf3' + self.text[start:start + 100].encode()
+
+    def write_to_fp(self, stream):
+        for part in self.stream():
+            stream.write(part)
+
+    def save(self, path):
+        with open(path, 'wb') as stream:
+            self.write_to_fp(stream)
+
+
+def install_gtts():
+    """Make `from gtts import gTTS` import StubTTS, if gTTS isn't installed."""
+    if 'gtts' not in sys.modules:
+        module = ModuleType('gtts')
+        module.gTTS = StubTTS
+        sys.modules['gtts'] = module
+
+
+class StubGPIO:
+    """Stands in for the RPi.GPIO module without any pins.
+
+    Remembers what each pin was set to and, like RPi.GPIO, refuses to touch a
+    pin before a numbering mode is chosen and the pin is set up. Also counts
+    every write, so a benchmark can wait for a pin to be written (like the
+    thinking LED turning off once a command is done).
+    """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self):
+        self.__mode = None
+        self.__states = dict()
+        # Maps (pin, value) to how many times value was written to pin
+        self.__writes = dict()
+        self.__condition = Condition()
+
+    def setmode(self, mode):
+        self.__mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channels, direction, initial=LOW):
+        if self.__mode is None:
+            raise RuntimeError('Please set pin numbering mode using '
+                               'GPIO.setmode(GPIO.BOARD) or '
+                               'GPIO.setmode(GPIO.BCM)')
+        if isinstance(channels, int):
+            channels = [channels]
+        with self.__condition:
+            for channel in channels:
+                self.__states[channel] = bool(initial)
+
+    def output(self, channels, values):
+        # Like RPi.GPIO, takes a channel and value or lists of each
+        if isinstance(channels, int):
+            channels = [channels]
+        if not isinstance(values, (list, tuple)):
+            values = [values] * len(channels)
+        with self.__condition:
+            for channel, value in zip(channels, values):
+                if channel not in self.__states:
+                    raise RuntimeError(
+                        'The GPIO channel has not been set up as an OUTPUT'
+                    )
+                self.__states[channel] = bool(value)
+                key = (channel, bool(value))
+                self.__writes[key] = self.__writes.get(key, 0) + 1
+            self.__condition.notify_all()
+
+    def input(self, channel):
+        with self.__condition:
+            return int(self.__states[channel])
+
+    def cleanup(self):
+        with self.__condition:
+            self.__states.clear()
+        self.__mode = None
+
+    def writes(self, channel, value):
+        """Returns how many times value has been written to channel."""
+        with self.__condition:
+            return self.__writes.get((channel, bool(value)), 0)
+
+    def wait_for_write(self, channel, value, seen, timeout=None):
+        """Wait until value has been written to channel more than seen times.
+
+        Returns:
+            bool: False if timeout seconds passed first.
+        """
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: self.__writes.get((channel, bool(value)), 0) > seen,
+                timeout
+            )
+
+
+class StubSound:
+    """Stands in for pygame.mixer.Sound without any audio hardware.
+
+    Like pygame, holds samples in the mixer's format: "decoding" a file
+    makes silence as long as a clip, while a buffer is taken as samples.
+
+    Args:
+        mixer (StubMixer): Mixer the sound belongs to.
+        file (str): Path of a file to decode.
+        buffer (bytes): Samples, in the mixer's format.
+    """
+
+    def __init__(self, mixer, file=None, buffer=None):
+        frequency, size, channels = mixer.get_init()
+        self.__bytes_per_second = frequency * abs(size) // 8 * channels
+        if file is not None:
+            with open(file, 'rb') as stream:
+                stream.read()
+            buffer = bytes(
+                int(mixer.music.clip_seconds * self.__bytes_per_second)
+            )
+        self.__samples = bytes(buffer)
+
+    def get_raw(self):
+        return self.__samples
+
+    def get_length(self):
+        return len(self.__samples) / self.__bytes_per_second
+
+
+class StubChannel:
+    """Stands in for pygame.mixer.Channel without any audio hardware."""
+
+    def __init__(self, number):
+        self.number = number
+        self.__ends_at = 0.0
+
+    def play(self, sound):
+        self.__ends_at = monotonic() + sound.get_length()
+
+    def stop(self):
+        self.__ends_at = 0.0
+
+    def get_busy(self):
+        return monotonic() < self.__ends_at
+
+
+class StubMixer:
+    """Stands in for the pygame.mixer module without any audio hardware.
+
+    Args:
+        music (StubMusic): Stands in for pygame.mixer.music.
+    """
+
+    def __init__(self, music):
+        self.music = music
+        self.__frequency = 22050
+        self.__settings = None
+        self.__channels = []
+        self.reserved = 0
+
+    def pre_init(self, frequency=22050, *args, **kwargs):
+        self.__frequency = frequency
+
+    def init(self, *args, **kwargs):
+        # pygame reports (frequency, format, channels) once initialized
+        self.__settings = (self.__frequency, -16, 2)
+        self.set_num_channels(8)
+
+    def get_init(self):
+        return self.__settings
+
+    def quit(self):
+        self.__settings = None
+
+    def Sound(self, file=None, buffer=None):
+        return StubSound(self, file, buffer)
+
+    def Channel(self, number):
+        return self.__channels[number]
+
+    def get_num_channels(self):
+        return len(self.__channels)
+
+    def set_num_channels(self, count):
+        self.__channels = [StubChannel(number) for number in range(count)]
+
+    def set_reserved(self, count):
+        self.reserved = count
+
+
+class StubSnowboyDetect:
+    """Stands in for snowboydetect.SnowboyDetect, at a fixed CPU cost.
+
+    Hears a model in a chunk of audio that starts with HOTWORD followed by the
+    model's name (like time, for models/time.pmdl). Like snowboy, checking a
+    chunk costs CPU in proportion to how many models are loaded: the
+    XAVIER_STUB_DETECT_COST environment variable's seconds of CPU per model
+    per second of audio (2% of a core by default). It is read from the
+    environment since detector shards run in their own processes.
+    """
+
+    HOTWORD = b'HOTWORD:'
+
+    def __init__(self, resource_filename, model_str):
+        self.models = [
+            Path(model).stem for model in model_str.decode().split(',')
+        ]
+        self.cost = float(os.environ.get('XAVIER_STUB_DETECT_COST', 0.02))
+        self.sensitivity = b','.join([b'0.5'] * len(self.models))
+
+    def SetAudioGain(self, gain):
+        pass
+
+    def SetSensitivity(self, sensitivity_str):
+        self.sensitivity = sensitivity_str
+
+    def GetSensitivity(self):
+        return self.sensitivity
+
+    def ApplyFrontend(self, apply_frontend):
+        pass
+
+    def NumHotwords(self):
+        return len(self.models)
+
+    def Reset(self):
+        pass
+
+    def SampleRate(self):
+        return 16000
+
+    def NumChannels(self):
+        return 1
+
+    def BitsPerSample(self):
+        return 16
+
+    def RunDetection(self, data):
+        seconds = len(data) / (self.SampleRate() * 2)
+        end = thread_time() + self.cost * len(self.models) * seconds
+        while thread_time() < end:
+            continue
+        if data.startswith(self.HOTWORD):
+            name = data[len(self.HOTWORD):].split(b'\0')[0].decode()
+            if name in self.models:
+                return self.models.index(name) + 1
+        return 0
+
+
+# So this module can be the engine of a ShardedDetector's shards
+SnowboyDetect = StubSnowboyDetect
+
+
+class StubAudioStream:
+    """Stands in for a pyaudio input stream without a microphone.
+
+    Calls stream_callback with a chunk of silence every time one would have
+    been captured, or with a hotword (see StubSnowboyDetect) once say is
+    called. When each hotword's chunk was captured is kept in captured.
+    """
+
+    # Names waiting to be said, when each said name was captured, and set
+    #   while a stream is capturing
+    said = Queue()
+    captured = dict()
+    capturing = Event()
+
+    def __init__(self, rate, frames_per_buffer, stream_callback):
+        self.__bytes = frames_per_buffer * 2
+        self.__seconds = frames_per_buffer / rate
+        self.__callback = stream_callback
+        self.__stopped = Event()
+        self.__thread = Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+        StubAudioStream.capturing.set()
+
+    @classmethod
+    def say(cls, name):
+        """Have the next chunk captured hold the named hotword."""
+        cls.said.put(name)
+
+    def stop_stream(self):
+        StubAudioStream.capturing.clear()
+        self.__stopped.set()
+        self.__thread.join()
+
+    def close(self):
+        pass
+
+    # Helpers #
+    def __run(self):
+        next_at = monotonic()
+        while not self.__stopped.is_set():
+            next_at += self.__seconds
+            sleep(max(0.0, next_at - monotonic()))
+            chunk = bytes(self.__bytes)
+            try:
+                name = self.said.get_nowait()
+            except Empty:
+                name = None
+            if name is not None:
+                word = StubSnowboyDetect.HOTWORD + name.encode()
+                chunk = word + chunk[len(word):]
+                StubAudioStream.captured[name] = monotonic()
+            self.__callback(chunk, len(chunk) // 2, dict(), 0)
+
+
+class StubPyAudio:
+    """Stands in for pyaudio.PyAudio without any audio hardware."""
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, rate, frames_per_buffer=1024, stream_callback=None,
+             **kwargs):
+        return StubAudioStream(rate, frames_per_buffer, stream_callback)
+
+    def terminate(self):
+        pass
+
+
+def install_hardware(clip_seconds=0.2):
+    """Replace every module the Body needs hardware or a network for.
+
+    Unlike install_gtts, always replaces them (even on a Raspberry Pi), so
+    results compare across machines.
+
+    Args:
+        clip_seconds (float): How long each clip plays for.
+
+    Returns:
+        StubGPIO: The stand-in for RPi.GPIO, to watch pins with.
+    """
+    gpio = StubGPIO()
+    rpi = ModuleType('RPi')
+    rpi.GPIO = gpio
+    mixer = StubMixer(StubMusic(clip_seconds))
+    pygame = ModuleType('pygame')
+    pygame.mixer = mixer
+    gtts = ModuleType('gtts')
+    gtts.gTTS = StubTTS
+    snowboydecoder = ModuleType('snowboydecoder')
+    snowboydecoder.RESOURCE_FILE = 'resources/common.res'
+    snowboydetect = ModuleType('snowboydetect')
+    snowboydetect.SnowboyDetect = StubSnowboyDetect
+    pyaudio = ModuleType('pyaudio')
+    pyaudio.PyAudio = StubPyAudio
+    pyaudio.paContinue = 0
+    sys.modules.update({
+        'RPi': rpi, 'RPi.GPIO': gpio, 'pygame': pygame,
+        'pygame.mixer': mixer, 'gtts': gtts,
+        'snowboydecoder': snowboydecoder, 'snowboydetect': snowboydetect,
+        'pyaudio': pyaudio,
+    })
+    return gpio
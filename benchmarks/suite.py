@@ -0,0 +1,277 @@
+"""Measures Xavier end to end on an ordinary computer.
+
+Runs a real Body with stand-ins for everything it needs a Raspberry Pi or the
+network for (see stubs.install_hardware and standin), then measures:
+    * startup: Seconds to import core, construct a Body, and start listening,
+        each in a fresh process, plus how long each of the Body's own startup
+        steps took (see Startup).
+    * commands: For each command, the wall-clock seconds from being said
+        (into the stand-in microphone) to the thinking LED turning off, and
+        the CPU seconds the process spent meanwhile.
+    * traces: The Body's own per-phase histograms (see Tracer).
+Detecting hotwords costs no CPU, unless XAVIER_STUB_DETECT_COST says
+otherwise (see StubSnowboyDetect). Everything runs in a scratch directory, so
+caches start cold and nothing in the repository is touched. Results are
+saved as JSON, named after the current commit, so two commits can be
+compared. Run from the root directory with:
+    python -m benchmarks.suite [--runs N] [--compare OLD.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime
+from statistics import median
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import monotonic, process_time
+from benchmarks.stubs import StubAudioStream, install_hardware
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+PINS = {'thinking': 10, 'lamp': 11}
+# Longest a single command may take before it is counted as hung
+COMMAND_TIMEOUT = 60
+
+
+def git_commit():
+    """Returns the current commit's short hash, with +dirty if the tree has
+    uncommitted changes, or 'unknown' outside of git.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        changes = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if changes else '')
+
+
+def make_sandbox(directory):
+    """Set up a scratch directory for a Body to run in."""
+    os.symlink(os.path.join(ROOT, 'sounds'), os.path.join(directory, 'sounds'))
+    os.makedirs(os.path.join(directory, 'logs'))
+
+
+def route(body, base):
+    """Send every request the body makes to the stand-in server at base."""
+    body.brain.client.host_overrides.update({
+        'api.weather.gov': base,
+        'icanhazdadjoke.com': base,
+    })
+
+
+def listen(body, drive):
+    """Start the body listening, running drive(microphone) on another
+    thread once it is, then stop the body once drive returns.
+    """
+    def driver():
+        StubAudioStream.capturing.wait()
+        try:
+            drive(StubAudioStream)
+        finally:
+            body.stop()
+
+    thread = Thread(target=driver, name='driver')
+    thread.start()
+    # Listening has to happen on the main thread, since it handles signals
+    body.start()
+    thread.join()
+
+
+def measure_startup(base, clip_seconds):
+    """Print how long this (fresh) process took to start a Body, as JSON."""
+    install_hardware(clip_seconds)
+    start = monotonic()
+    import core
+    imported = monotonic()
+    body = core.Body(PINS, logfile='xavier.jsonl')
+    constructed = monotonic()
+    route(body, base)
+    times = dict()
+    listen(body, lambda microphone: times.setdefault('listen', monotonic()))
+    steps = {
+        'step:' + timing['name']: timing['seconds']
+        for timing in body.startup.timings() if timing['seconds']
+    }
+    del body
+    print(json.dumps(dict({
+        'import': imported - start,
+        'construct': constructed - imported,
+        'listen': times['listen'] - constructed,
+    }, **steps)))
+
+
+def run_startups(runs, base, clip_seconds):
+    """Returns a dict mapping each startup phase to its seconds in each run."""
+    samples = dict()
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(runs):
+        with TemporaryDirectory() as directory:
+            make_sandbox(directory)
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.suite', '--startup', base,
+                 '--clip-seconds', str(clip_seconds)],
+                cwd=directory, env=environment, capture_output=True,
+                text=True, check=True
+            ).stdout
+        for phase, seconds in json.loads(output.splitlines()[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    return samples
+
+
+def run_commands(runs, base, clip_seconds):
+    """Returns a dict mapping each command to the seconds it took and the CPU
+    seconds spent during each run, plus the Body's traces.
+    """
+    gpio = install_hardware(clip_seconds)
+    import core
+    names = [command.__name__ for command in core.Body.get_commands()]
+    samples = {name: {'latency': [], 'cpu': []} for name in names}
+    # Commands sometimes play a sound instead; make that happen the same way
+    #   every time
+    random.seed(0)
+
+    def drive(microphone):
+        thinking = PINS['thinking']
+        for _ in range(runs):
+            for name in names:
+                seen = gpio.writes(thinking, False)
+                cpu_start, start = process_time(), monotonic()
+                microphone.say(name)
+                done = gpio.wait_for_write(
+                    thinking, False, seen, COMMAND_TIMEOUT
+                )
+                latency = monotonic() - start if done else None
+                samples[name]['latency'].append(latency)
+                samples[name]['cpu'].append(process_time() - cpu_start)
+
+    with TemporaryDirectory() as directory:
+        make_sandbox(directory)
+        os.chdir(directory)
+        try:
+            body = core.Body(PINS, logfile='xavier.jsonl')
+            route(body, base)
+            listen(body, drive)
+            traces = body.tracer.snapshot()
+            del body
+        finally:
+            os.chdir(ROOT)
+    return samples, traces
+
+
+def summarize(samples):
+    """Returns the median of samples, ignoring runs that hung, or None."""
+    finished = [sample for sample in samples if sample is not None]
+    return median(finished) if finished else None
+
+
+def show(results, baseline=None):
+    """Print the medians of results, next to baseline's if given."""
+    def row(label, new, old):
+        line = '  {:<24} {:>9}'.format(label, '-' if new is None else
+                                        '{:.3f}s'.format(new))
+        if old is not None and new is not None:
+            line += ' {:>9} {:>+7.1%}'.format(
+                '{:.3f}s'.format(old), (new - old) / old if old else 0.0
+            )
+        print(line)
+
+    def old(*keys):
+        if baseline is None:
+            return None
+        value = baseline
+        for key in keys:
+            if key not in value:
+                return None
+            value = value[key]
+        return summarize(value)
+
+    print('Commit {}{}:'.format(results['commit'], '' if baseline is None
+                                else ' (against {})'.format(
+                                    baseline['commit'])))
+    print('Startup:')
+    for phase, samples in results['startup'].items():
+        row(phase, summarize(samples), old('startup', phase))
+    for measure in ('latency', 'cpu'):
+        print('Command {}:'.format(measure))
+        for name, command in results['commands'].items():
+            row(name, summarize(command[measure]),
+                old('commands', name, measure))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark Xavier end to end without hardware.'
+    )
+    parser.add_argument('--runs', type=int, default=5,
+                        help='times to start up and run each command')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds the stand-in server delays answers by')
+    parser.add_argument('--clip-seconds', type=float, default=0.2,
+                        help='seconds each clip plays for')
+    parser.add_argument('--output', help='where to save results; defaults to '
+                        'benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', metavar='OLD',
+                        help='earlier results to compare against')
+    parser.add_argument('--startup', metavar='BASE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # Only measure the stand-in detector's cost if asked to
+    os.environ.setdefault('XAVIER_STUB_DETECT_COST', '0')
+
+    if args.startup:
+        measure_startup(args.startup, args.clip_seconds)
+        return
+
+    # Keep the server's work out of my CPU time by running it separately
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.standin',
+         '--latency', str(args.latency)],
+        cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        base = server.stdout.readline().strip()
+        startup = run_startups(args.runs, base, args.clip_seconds)
+        commands, traces = run_commands(args.runs, base, args.clip_seconds)
+    finally:
+        server.stdin.close()
+        server.wait()
+
+    results = {
+        'commit': git_commit(),
+        'recorded_on': str(datetime.now()),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'settings': {
+            'runs': args.runs, 'latency': args.latency,
+            'clip_seconds': args.clip_seconds,
+        },
+        'startup': startup,
+        'commands': commands,
+        'traces': traces,
+    }
+    output = args.output or os.path.join(
+        RESULTS, '{}.json'.format(results['commit'])
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as stream:
+        json.dump(results, stream, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as stream:
+            baseline = json.load(stream)
+    show(results, baseline)
+    print('Saved to {}'.format(output))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
-import requests
+import requests.exceptions
 from datetime import datetime
 import calendar
 from enums import WeatherDay
-import toolbox
+from httpclient import HttpClient
+from forecastcache import ForecastCache
+from gridpoints import GridpointResolver
+from jokes import JokeReservoir, clean_joke
+from tracing import Tracer
 
 
 class Brain:
@@ -13,17 +17,42 @@ class Brain:
     Args:
         location_coords (dict): Coordinates used in finding weather with keys
             x and y. Default location is Blacksburg, VA.
+        client (HttpClient): Client to make every request with. Defaults to
+            a new one.
+        forecast_cache (ForecastCache): Cache to pull forecasts through.
+            Defaults to one persisted in the cache directory.
+        gridpoints (GridpointResolver): Resolver finding which forecast covers
+            my location. Defaults to one persisted in the cache directory.
+        jokes (JokeReservoir): Reservoir to pull jokes from. Defaults to one
+            that does not warm its jokes.
+        tracer (Tracer): Where to record how long network requests take, as
+            the fetch phase of whichever command made them. Defaults to one
+            that only keeps them in memory.
     """
 
-    def __init__(self, location_coords=None):
+    def __init__(self, location_coords=None, client=None, forecast_cache=None,
+                 gridpoints=None, jokes=None, tracer=None):
         default_location_coords = {'x': '37.232191', 'y': '-80.423165'}
         self.location_coords = location_coords or default_location_coords
+        self.client = client or HttpClient()
+        # Shared by every broadcast, so asking for two in a row only fetches
+        #   the forecast once
+        self.forecasts = forecast_cache or ForecastCache(session=self.client)
+        # Looks up which forecast covers my location once, instead of having
+        #   weather.gov redirect every request
+        self.gridpoints = gridpoints or GridpointResolver(session=self.client)
+        # The reservoir is falsy while empty, so check for None explicitly
+        self.jokes = jokes if jokes is not None \
+            else JokeReservoir(session=self.client)
+        self.tracer = tracer or Tracer()
 
     # Helper #
     def __request_weather(self, day):
         """Returns the appropriate weather period depending on day.
 
-        Uses https://api.weather.gov/.
+        Uses https://api.weather.gov/, through my forecast cache.
+        If my location's forecast no longer exists, looks the location up
+        again, since weather.gov must have changed its grid.
 
         Args:
             day (WeatherDay enum): Which day (today or tomorrow) to return
@@ -32,10 +61,20 @@ class Brain:
         Returns:
             dict: The weather period for the given day.
         """
-        weather_periods = requests.get(
-            'https://api.weather.gov/points/{x},{y}/forecast'
-            .format(**self.location_coords)
-        ).json()['properties']['periods']
+        with self.tracer.span('fetch'):
+            try:
+                forecast = self.forecasts.get(
+                    self.gridpoints.forecast_url(self.location_coords)
+                )
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or \
+                        e.response.status_code not in (404, 410):
+                    raise
+                self.gridpoints.invalidate(self.location_coords)
+                forecast = self.forecasts.get(
+                    self.gridpoints.forecast_url(self.location_coords)
+                )
+        weather_periods = forecast['properties']['periods']
         # If I need today, then I just want the first period
         index = 0
         # If I need tomorrow, find tomorrow's period
@@ -129,13 +168,17 @@ class Brain:
         month = calendar.month_name[now.month]
         return '{}, {} {}.'.format(weekday, month, now.day)
 
-    @staticmethod
-    def get_joke():
-        """Returns a dad joke as a string using https://icanhazdadjoke.com/."""
+    def get_joke(self):
+        """Returns a dad joke as a string using https://icanhazdadjoke.com/.
+
+        Pulls from my joke reservoir, only fetching a single joke directly if
+        the reservoir is empty.
+        """
+        joke = self.jokes.take()
+        if joke is not None:
+            return joke
         url = 'https://icanhazdadjoke.com/'
         headers = {'Accept': 'text/plain'}
-        response = requests.get(url, headers=headers)
-        # Replace non-ascii characters, namely odd/malformed apostrophes
-        result = toolbox.repair_response(response.text)
-        # Replace CR, LF, and tab characters with spaces
-        return result.replace('\r\n', ' ').replace('\n', ' ').replace('\t', ' ')
+        with self.tracer.span('fetch'):
+            response = self.client.get(url, headers=headers)
+        return clean_joke(response.text)
@@ -0,0 +1,235 @@
+import os
+import wave
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+
+class AudioRing:
+    """Holds the latest audio captured, for any number of readers at once.
+
+    Chunks of audio are copied in once, into a buffer allocated up front,
+    and every reader is handed memoryviews of them straight from the buffer,
+    so no reader ever copies (or waits on) another. Each chunk is kept whole:
+    one that doesn't fit before the end of the buffer starts over at its
+    beginning, so every chunk is a single view. Readers sleep until a chunk
+    is written rather than checking for one every so often.
+
+    A view is only good until the buffer comes back around to it, which
+    takes as long as the buffer holds (ten seconds of audio for a Capture).
+    A reader that falls further behind than that skips ahead (see
+    RingReader.dropped), and one that wants to keep a chunk longer should
+    copy it.
+
+    Args:
+        size (int): Bytes of audio to hold.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.__buffer = memoryview(bytearray(size))
+        self.__written = Condition()
+        # Every chunk still in the buffer, oldest first, as (number, start,
+        #   end, when captured), where start and end count every byte ever
+        #   written (or skipped over)
+        self.__chunks = deque()
+        self.__count = 0
+        self.__end = 0
+
+    def write(self, data, captured_at=None):
+        """Copy a chunk of audio in, waking every reader waiting for one.
+
+        Args:
+            data (bytes): The chunk.
+            captured_at (float): When it was captured. Defaults to now.
+
+        Raises:
+            ValueError: If the chunk is bigger than the whole buffer.
+        """
+        length = len(data)
+        if length > self.size:
+            raise ValueError('A chunk of {} bytes does not fit in {}'.format(
+                length, self.size
+            ))
+        if captured_at is None:
+            captured_at = monotonic()
+        with self.__written:
+            start = self.__end
+            offset = start % self.size
+            if offset + length > self.size:
+                # Skip the rest of the buffer, so the chunk stays whole
+                start += self.size - offset
+                offset = 0
+            end = start + length
+            self.__buffer[offset:offset + length] = data
+            # Forget the chunks I just wrote over
+            while self.__chunks and self.__chunks[0][1] < end - self.size:
+                self.__chunks.popleft()
+            self.__chunks.append((self.__count, start, end, captured_at))
+            self.__count += 1
+            self.__end = end
+            self.__written.notify_all()
+
+    def read(self, number, timeout=None):
+        """Returns a chunk, waiting for it to be written if it hasn't been.
+
+        Args:
+            number (int): Number of the chunk, counting from the first one
+                ever written.
+            timeout (float): Most seconds to wait for it. Forever if None.
+
+        Returns:
+            tuple: The chunk's number, a memoryview of it, and when it was
+                captured, or None if it wasn't written in time. If it was
+                already written over, the oldest chunk I still have instead.
+        """
+        with self.__written:
+            if not self.__written.wait_for(
+                    lambda: self.__count > number, timeout):
+                return None
+            first = self.__chunks[0][0]
+            number, start, end, captured_at = \
+                self.__chunks[max(number, first) - first]
+            offset = start % self.size
+            return number, self.__buffer[offset:offset + end - start], \
+                captured_at
+
+    def latest(self, size):
+        """Returns memoryviews of the newest chunks, oldest first, holding at
+        least size bytes of audio (or everything I have, if less).
+        """
+        views = []
+        with self.__written:
+            for _, start, end, _ in reversed(self.__chunks):
+                if size <= 0:
+                    break
+                offset = start % self.size
+                views.append(self.__buffer[offset:offset + end - start])
+                size -= end - start
+        views.reverse()
+        return views
+
+    def reader(self):
+        """Returns a RingReader starting with the next chunk written."""
+        with self.__written:
+            return RingReader(self, self.__count)
+
+
+class RingReader:
+    """Reads every chunk written to an AudioRing in order, as memoryviews.
+
+    Args:
+        ring (AudioRing): The ring to read.
+        number (int): Number of the first chunk to read.
+    """
+
+    def __init__(self, ring, number):
+        self.ring = ring
+        self.next = number
+        # Chunks written over before I got to them
+        self.dropped = 0
+
+    def read(self, timeout=None):
+        """Returns the next chunk, waiting for it to be captured if needed.
+
+        Args:
+            timeout (float): Most seconds to wait. Forever if None.
+
+        Returns:
+            tuple: A memoryview of the chunk and when it was captured, or
+                None if no chunk was captured in time.
+        """
+        chunk = self.ring.read(self.next, timeout)
+        if chunk is None:
+            return None
+        number, data, captured_at = chunk
+        self.dropped += number - self.next
+        self.next = number + 1
+        return data, captured_at
+
+
+class Capture:
+    """Captures audio from the microphone, for every part of Xavier at once.
+
+    Whatever is captured is written to an AudioRing, so the hotword detector,
+    the voice gate, and anything else can each read the same audio through a
+    reader of their own without opening the microphone again (see reader),
+    and the last few seconds can always be saved (see dump).
+
+    Args:
+        rate (int): Samples per second.
+        channels (int): Number of channels.
+        bits (int): Bits per sample.
+        seconds (float): Seconds of audio to hold.
+        frames_per_buffer (int): Frames of audio captured at a time.
+    """
+
+    def __init__(self, rate=16000, channels=1, bits=16, seconds=10,
+                 frames_per_buffer=2048):
+        self.rate = rate
+        self.channels = channels
+        self.bits = bits
+        self.frames_per_buffer = frames_per_buffer
+        self.bytes_per_second = rate * channels * bits // 8
+        self.ring = AudioRing(int(seconds * self.bytes_per_second))
+        self.__audio = None
+        self.__stream = None
+
+    def reader(self):
+        """Returns a RingReader of everything captured from now on."""
+        return self.ring.reader()
+
+    def start(self):
+        """Start capturing, if I'm not already."""
+        if self.__stream is not None:
+            return
+        import pyaudio
+        ring = self.ring
+
+        def capture(in_data, frame_count, time_info, status):
+            ring.write(in_data)
+            return None, pyaudio.paContinue
+
+        self.__audio = pyaudio.PyAudio()
+        self.__stream = self.__audio.open(
+            input=True, output=False,
+            format=self.__audio.get_format_from_width(self.bits // 8),
+            channels=self.channels, rate=self.rate,
+            frames_per_buffer=self.frames_per_buffer, stream_callback=capture
+        )
+
+    def stop(self):
+        """Stop capturing, keeping what was captured."""
+        if self.__stream is None:
+            return
+        self.__stream.stop_stream()
+        self.__stream.close()
+        self.__audio.terminate()
+        self.__stream = None
+
+    def last(self, seconds):
+        """Returns memoryviews of about the last given seconds of audio,
+        oldest first.
+        """
+        return self.ring.latest(int(seconds * self.bytes_per_second))
+
+    def dump(self, path, seconds=5):
+        """Save about the last given seconds of audio as a WAV file.
+
+        Args:
+            path (str): Where to save it. Its directory is created if it
+                doesn't exist.
+            seconds (float): Seconds of audio to save.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so a crash never leaves half a dump
+        temp_path = path + '.part'
+        with wave.open(temp_path, 'wb') as stream:
+            stream.setnchannels(self.channels)
+            stream.setsampwidth(self.bits // 8)
+            stream.setframerate(self.rate)
+            for view in self.last(seconds):
+                stream.writeframes(view)
+        os.replace(temp_path, path)
@@ -1,9 +1,23 @@
-from functools import wraps
+import sys
+from functools import partial, wraps
 from pathlib import Path
 from random import randint
-import requests.exceptions
+from time import monotonic
 from traceback import format_exc
 import toolbox
+from enums import CommandPolicy
+
+
+def announce(proclaim):
+    """Proclaim something from the audio lane.
+
+    Silent (IMMEDIATE) commands must never use the speaker, so they hand this
+    to their body's executor (as an AUDIO command) instead of speaking.
+
+    Args:
+        proclaim (callable): What to say, taking no arguments.
+    """
+    proclaim()
 
 
 class HomeCommand:
@@ -11,24 +25,38 @@ class HomeCommand:
 
     Used by the Body to do the following:
         * Turns on/off thinking LED of the given body.
-        * Records the method and its sensitivity to be used at runtime.
-        * Logs the method call.
+        * Tags the method with its sensitivity, so find can list it with the
+            rest of a class's commands at runtime.
+        * Records the method's sound, so check_sounds can make sure it exists
+            while the Body starts up (rather than when the Body is defined).
+        * Logs the method call, then returns what it returned.
+        * Traces the method call and its phases with the body's Tracer.
         * If given a sound, allows a 10% chance to play the sound instead of
             running the command.
+        * Tags the method with its policy, telling the Body's executor how it
+            may run alongside other commands. Only AUDIO commands may use the
+            speaker, so failures of IMMEDIATE commands are announced from the
+            AUDIO lane.
     Can only be used within a body object.
 
     Args:
         sensitivity (float): Sensitivity in detection for this command.
         sound (str): Sound, if any, (without path or extension) to potentially
             play instead of executing this command.
-    """
+        policy (CommandPolicy enum): How this command may run alongside other
+            commands. Defaults to AUDIO, which is always safe.
 
-    # Stores commands mapped to their sensitivities
-    commands = dict()
+    Raises:
+        ValueError: If given a sound for an IMMEDIATE command, which would
+            play over whatever the AUDIO lane is playing.
+    """
 
-    def __init__(self, sensitivity, sound=None):
+    def __init__(self, sensitivity, sound=None, policy=CommandPolicy.AUDIO):
+        if sound and policy == CommandPolicy.IMMEDIATE:
+            raise ValueError('IMMEDIATE commands cannot play a sound.')
         self.sensitivity = sensitivity
         self.sound = sound
+        self.policy = policy
 
     def __call__(self, func):
         """The real decorator.
@@ -43,75 +71,184 @@ class HomeCommand:
         """
         # If I was given a potential sound
         if self.sound:
-            # Ensure I'll be able to load the sound first
-            sound_path = Path('sounds/{}.mp3'.format(self.sound))
-            if not sound_path.is_file():
-                raise FileNotFoundError(
-                    'Error initializing {}: {} does not exist'.format(
-                        func.__name__, sound_path
-                    )
-                )
-
             @wraps(func)
             def wrapper(body, *args, **kwargs):
-                body.set_thinking(True)
-                if randint(0, 9):
-                    self.__safe_call(func, body, *args, **kwargs)
-                else:
-                    result = body.play_sound(self.sound)
-                    body.logger.log_info(func.__name__, result)
-                body.set_thinking(False)
+                # Trace every phase of the command under its name
+                with body.tracer.command(func.__name__):
+                    with body.tracer.span('led_on'):
+                        body.set_thinking(True)
+                    # Release my hold on the LED even if the command fails
+                    try:
+                        if randint(0, 9):
+                            result = self.__safe_call(
+                                func, self.policy, body, *args, **kwargs
+                            )
+                        else:
+                            start = monotonic()
+                            result = body.play_sound(self.sound)
+                            body.logger.log_info(
+                                func.__name__, result, monotonic() - start
+                            )
+                    finally:
+                        with body.tracer.span('led_off'):
+                            body.set_thinking(False)
+                return result
 
         # Otherwise, just add the LED effect
         else:
             @wraps(func)
             def wrapper(body, *args, **kwargs):
-                body.set_thinking(True)
-                self.__safe_call(func, body, *args, **kwargs)
-                body.set_thinking(False)
-
-        # Record the modified command and its sensitivity
-        HomeCommand.commands[wrapper] = self.sensitivity
+                with body.tracer.command(func.__name__):
+                    with body.tracer.span('led_on'):
+                        body.set_thinking(True)
+                    try:
+                        result = self.__safe_call(
+                            func, self.policy, body, *args, **kwargs
+                        )
+                    finally:
+                        with body.tracer.span('led_off'):
+                            body.set_thinking(False)
+                return result
+
+        # Tag the modified command with its sensitivity, policy, and sound
+        wrapper.sensitivity = self.sensitivity
+        wrapper.policy = self.policy
+        wrapper.sound = self.sound
         return wrapper
 
     @staticmethod
-    def __safe_call(func, body, *args, **kwargs):
+    def find(owner):
+        """Returns the commands of a class (including those it inherits)
+        mapped to their sensitivities, in the order they were defined.
+
+        Nothing is recorded globally, so each class (and each Body's
+        CommandRegistry) has its own commands.
+        """
+        # Maps names to commands, so overriding a command replaces it
+        commands = dict()
+        for cls in reversed(owner.__mro__):
+            for name, value in vars(cls).items():
+                if callable(value) and hasattr(value, 'sensitivity'):
+                    commands[name] = value
+        return {
+            command: command.sensitivity for command in commands.values()
+        }
+
+    @staticmethod
+    def check_sounds(commands):
+        """Ensure the sound of every given command can be loaded.
+
+        Args:
+            commands (iterable): Commands to check.
+
+        Raises:
+            FileNotFoundError: If a command's sound does not exist.
+        """
+        for command in commands:
+            if not command.sound:
+                continue
+            sound_path = Path('sounds/{}.mp3'.format(command.sound))
+            if not sound_path.is_file():
+                raise FileNotFoundError(
+                    'Error initializing {}: {} does not exist'.format(
+                        command.__name__, sound_path
+                    )
+                )
+
+    @staticmethod
+    def __safe_call(func, policy, body, *args, **kwargs):
         """Helper method to perform a safe call using the given method.
 
-        Catches recoverable exceptions and logs the results.
+        Catches recoverable exceptions and logs the results. If the body's
+        profiler is enabled, the call is made through it, so it may be
+        profiled.
 
         Args:
             func (callable): Method to call.
+            policy (CommandPolicy enum): The method's policy, deciding which
+                lane its failures are proclaimed from.
             body (Body): Body to use to make the call.
             args (list): Positional arguments to use in the call.
             kwargs (dict): Keyword arguments to use in the call.
+
+        Returns:
+            The method's result, or None if it failed recoverably.
         """
+        start = monotonic()
         try:
-            result = func(body, *args, **kwargs)
-
-        # Catch and report recoverable errors
-        except requests.exceptions.ConnectionError:
-            body.logger.log_warn(func.__name__, format_exc())
-            # Proclaim the command failed but will not kill me
-            body.report_warn(func.__name__, 'Connection Error')
+            # Checking once is all profiling costs while it is disabled
+            if body.profiler.enabled:
+                result = body.profiler.call(
+                    func.__name__, func, body, *args, **kwargs
+                )
+            else:
+                result = func(body, *args, **kwargs)
 
-        # For all unexpected errors, log the error before raising it
         except Exception as e:
-            body.logger.log_error(func.__name__, format_exc())
+            recoverable = HomeCommand.__recoverable(e)
+            # Catch and report recoverable errors
+            if recoverable:
+                body.logger.log_warn(
+                    func.__name__, format_exc(), monotonic() - start
+                )
+                # Proclaim the command failed but will not kill me
+                HomeCommand.__proclaim(
+                    body, policy,
+                    partial(body.report_warn, func.__name__, recoverable)
+                )
+                return
+
+            # For all unexpected errors, log the error before raising it
+            body.logger.log_error(
+                func.__name__, format_exc(), monotonic() - start
+            )
             # Proclaim the command failed and will kill me
             # Add necessary spaces in the exception name to say it properly
             formatted_exception_name = toolbox.split_caps(type(e).__name__)
-            body.report_error(func.__name__, formatted_exception_name)
+            HomeCommand.__proclaim(body, policy, partial(
+                body.report_error, func.__name__, formatted_exception_name
+            ))
             # Lastly, delete the body to close its logger before allowing
             #   the exception to kill the program
             del body
             raise
 
-        # If the call succeeded, log its success
+        # If the call succeeded, log its success and how long it took
+        else:
+            body.logger.log_info(func.__name__, result, monotonic() - start)
+            return result
+
+    @staticmethod
+    def __proclaim(body, policy, proclaim):
+        """Proclaim something right away if the command is on the AUDIO
+        lane, and otherwise queue it there (see announce).
+        """
+        if policy == CommandPolicy.AUDIO:
+            proclaim()
         else:
-            body.logger.log_info(func.__name__, result)
+            body.executor.submit(announce, proclaim)
+
+    @staticmethod
+    def __recoverable(exception):
+        """Returns how to say the kind of a recoverable exception, or None.
+
+        Connection errors are recoverable, and so are timeouts, since requests
+        time out instead of hanging.
+
+        Args:
+            exception (Exception): The exception a command raised.
 
-    @classmethod
-    def get_commands(cls):
-        """Returns all commands I have seen mapped to their sensitivities."""
-        return cls.commands
+        Returns:
+            str: The exception's kind, with spaces between words (like
+                Connection Error), or None if it is unrecoverable.
+        """
+        # Nothing can raise requests' exceptions before requests is imported,
+        #   so there is no need to import it (and slow down startup) here
+        exceptions = sys.modules.get('requests.exceptions')
+        if exceptions is None:
+            return None
+        if isinstance(exception, exceptions.ConnectionError):
+            return 'Connection Error'
+        if isinstance(exception, exceptions.Timeout):
+            return 'Timeout'
+        return None
@@ -0,0 +1,148 @@
+import json
+from concurrent.futures import TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import monotonic
+from urllib.parse import parse_qs, urlsplit
+
+
+class CommandServer:
+    """Runs commands asked for over HTTP, by anything on this computer.
+
+    Lets commands be run without saying them, such as by home automation
+    hooks, or by load generators measuring how many commands per second
+    Xavier keeps up with. Every request is handled on a thread of its own,
+    so any number can wait on their commands at once, and every command is
+    run through the registry and its body's executor just like a detected
+    one: it is queued in its lane (or dropped once the lane is full),
+    traced, and logged the same way.
+
+    Requests (every answer is JSON):
+        * GET /commands: Lists the name of every command.
+        * POST /commands/<name>: Runs a command, answering with what it
+            returned, the seconds it waited to start and took to run, and the
+            seconds the whole request took. With ?wait=0, answers as soon as
+            the command is queued instead.
+
+    Args:
+        registry (CommandRegistry): The commands to run, by name.
+        port (int): Port to listen on. Any free one if 0.
+        host (str): Address to listen on. Only this computer by default.
+        timeout (float): Most seconds to wait for a command to finish before
+            answering that it's still running.
+    """
+
+    def __init__(self, registry, port=8420, host='127.0.0.1', timeout=30):
+        self.__server = ThreadingHTTPServer((host, port), CommandHandler)
+        # Handlers find what they need on the server
+        self.__server.registry = registry
+        self.__server.command_timeout = timeout
+        self.__thread = None
+
+    @property
+    def address(self):
+        """tuple: The host and port I'm listening on."""
+        return self.__server.server_address[:2]
+
+    def start(self):
+        """Start answering requests, on a thread of my own."""
+        self.__thread = Thread(
+            target=self.__server.serve_forever, name='xavier-server',
+            daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        """Stop answering requests and close my socket."""
+        if self.__thread is not None:
+            self.__server.shutdown()
+            self.__thread.join()
+            self.__thread = None
+        self.__server.server_close()
+
+
+class CommandHandler(BaseHTTPRequestHandler):
+    """Answers a request to a CommandServer."""
+
+    # Keep connections open between requests, so clients sending many don't
+    #   connect for each one
+    protocol_version = 'HTTP/1.1'
+    # Headers and content are written separately, so don't let the second
+    #   wait for the first to be acknowledged (which takes about 40ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if urlsplit(self.path).path.rstrip('/') != '/commands':
+            self.__answer(404, {'error': 'Not found'})
+            return
+        self.__answer(200, {'commands': list(self.server.registry)})
+
+    def do_POST(self):
+        start = monotonic()
+        url = urlsplit(self.path)
+        # Nothing is read from the request's body, but it has to be read for
+        #   the connection to be reused
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Closes the connection, since the body can't be skipped
+            self.send_error(400, 'Invalid Content-Length')
+            return
+        self.rfile.read(length)
+        prefix, _, name = url.path.rpartition('/')
+        if prefix != '/commands':
+            self.__answer(404, {'error': 'Not found'})
+            return
+        try:
+            future = self.server.registry.run(name)
+        except KeyError:
+            self.__answer(404, {'error': 'No command named {}'.format(name)})
+            return
+        if future is None:
+            self.__answer(503, {
+                'command': name, 'error': 'Too many commands waiting',
+                'total': monotonic() - start,
+            })
+            return
+        if parse_qs(url.query).get('wait') == ['0']:
+            self.__answer(202, {
+                'command': name, 'total': monotonic() - start,
+            })
+            return
+
+        try:
+            outcome = future.result(self.server.command_timeout)
+        except TimeoutError:
+            self.__answer(202, {
+                'command': name, 'error': 'Still running',
+                'total': monotonic() - start,
+            })
+        except Exception as e:
+            # Just like when it's heard, this will stop Xavier
+            self.__answer(500, {
+                'command': name,
+                'error': '{}: {}'.format(type(e).__name__, e),
+                'total': monotonic() - start,
+            })
+        else:
+            self.__answer(200, {
+                'command': name, 'result': outcome.result,
+                'waited': outcome.waited, 'seconds': outcome.seconds,
+                'total': monotonic() - start,
+            })
+
+    def log_message(self, format, *args):
+        # The Body's logger already logs every command
+        pass
+
+    # Helpers #
+    def __answer(self, status, content):
+        """Answer with the given status and content, as JSON."""
+        body = json.dumps(content, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -1,19 +1,34 @@
-# What the Body needs to directly interact with the world
-from RPi import GPIO
-from pygame import mixer
-from pygame.mixer import music
-from gtts import gTTS
+# What the Body needs to directly interact with the world (GPIO, the mixer,
+#   and snowboy) and the network (requests) is slow to import, so it is only
+#   imported while starting up, on the thread that needs it (see Startup)
 
 # What the Body needs to figure out how to respond to commands
-from time import sleep
-from brain import Brain
+from time import monotonic
+from functools import partial
 from logger import Logger
+from tracing import Tracer
+from profiling import CommandProfiler
+from speechcache import SpeechCache
+from speech import (
+    Synthesizer, BackendSelector, GTTSBackend, EspeakBackend
+)
+from pipeline import SpeechPipeline
+from prefetch import Prefetcher
+from playback import Player
+from soundbank import SoundBank
+from pins import PinManager
 from command import HomeCommand
-from enums import WeatherDay
+from registry import CommandRegistry
+from executor import CommandExecutor
+from enums import WeatherDay, CommandPolicy
+from startup import Startup
 
 # What the Body needs to start listening
-import snowboydecoder
 import signal
+from datetime import datetime
+from threading import Thread
+from traceback import format_exc, format_exception
+from capture import Capture
 
 
 class Body:
@@ -32,77 +47,280 @@ class Body:
         logfile (str): Name of the file to log to WITH extension. Creates it if
             it doesn't exist. Appends to it if it already exists. If no file is
             specified, the logger will log to the console.
+        profile_every (int): Profile every this many runs of each command
+            with cProfile. Never if 0.
+        profile_threshold (float): Sample every command, saving the samples
+            of any that take at least this many seconds. Never if None.
+        startup (Startup): Times each step of starting up. Defaults to one
+            dumping its timings to logs/startup.json once I start listening.
+        detector_shards (int): Spread hotword detection over this many
+            processes (see ShardedDetector). Detects in this process if 0.
+        voice_gate (bool): Whether to only detect hotwords while someone
+            might be speaking (see VoiceGate). Needs numpy.
+        command_port (int): Also run commands asked for over HTTP on this
+            port, from this computer only, while listening (see
+            CommandServer). Never if None.
     """
 
-    def __init__(self, pin_mapping, location_coords=None, logfile=None):
+    def __init__(self, pin_mapping, location_coords=None, logfile=None,
+                 profile_every=0, profile_threshold=None, startup=None,
+                 detector_shards=0, voice_gate=False, command_port=None):
         # Remember what pin numbers relate to which operations
         self.thinking = pin_mapping['thinking']
         self.lamp = pin_mapping['lamp']
+        self.detector_shards = detector_shards
+        self.voice_gate = voice_gate
+        self.command_port = command_port
+        # Times every step of starting up, dumping them to my logs
+        self.startup = startup or Startup(path='logs/startup.json')
 
         # Create the additional objects I need
-        self.brain = Brain(location_coords)
-        self.logger = Logger(logfile)
+        # Breaks every command down into phases, dumping them to my logs
+        self.tracer = Tracer('logs/traces.json')
+        # Saves profiles of commands to my logs, if asked to
+        self.profiler = CommandProfiler(profile_every, profile_threshold)
+        # Runs detected commands so listening never waits on them
+        self.executor = CommandExecutor(tracer=self.tracer)
+        # Captures what I hear once, for my detector and anything else
+        #   (such as dump_audio) to read; my detector starts it
+        self.capture = Capture()
+        # Holds my commands by name, keeping my detector in step with them
+        self.registry = CommandRegistry(self, Body.get_commands())
+        commands = self.registry.entries()
+
+        # None of these depend on each other, so set them all up at once
+        subsystems = self.startup.run(
+            mixer=Body.__set_up_mixer,
+            gpio=partial(Body.__set_up_gpio, list(pin_mapping.values())),
+            detector=partial(
+                Body.__load_detector, detector_shards, voice_gate,
+                self.capture, commands
+            ),
+            # Commands only queue their log records; a thread writes them
+            # Keep about 50MB of history: ten gzipped 5MB segments
+            logger=partial(
+                Logger, logfile, max_bytes=5 * 1024 * 1024, backups=10,
+                asynchronous=True
+            ),
+            speech=Body.__set_up_speech,
+            network=partial(
+                Body.__set_up_network, location_coords, self.tracer
+            ),
+            sounds=partial(
+                HomeCommand.check_sounds,
+                [command.function for command in commands]
+            ),
+        )
+        self.mixer, self.player, self.sounds = subsystems['mixer']
+        self.pins = subsystems['gpio']
+        self.__detectors = subsystems['detector']
+        # The commands my detector was loaded with, in the order of its models
+        self.__detected = commands
+        self.logger = subsystems['logger']
+        self.speech_cache, self.synthesizer, self.pipeline = \
+            subsystems['speech']
+        self.brain = subsystems['network']
+        # Have the next few jokes synthesized before they are asked for
+        self.brain.jokes.warm = self.pipeline.warm
+
+        # Will be used later to determine if my event loop should end
+        # Starts as False, since I am just initializing; I am not listening yet
+        self.is_running = False
 
+    def __del__(self):
+        """Close my executor, logger, pins, player, sounds, pipeline, and
+        the mixer.
+        """
+        self.executor.shutdown()
+        del self.logger
+        self.pins.close()
+        self.player.stop()
+        self.sounds.stop()
+        self.pipeline.shutdown()
+        self.mixer.quit()
+
+    # Startup Steps #
+    # Note: These run on their own threads, so they must not use a Body
+    @staticmethod
+    def __set_up_mixer():
+        """Returns the initialized mixer, a Player on its music stream, and a
+        SoundBank of every sound.
+        """
+        from pygame import mixer
+        from pygame.mixer import music
         # Set up the sound player (mixer) only if it hasn't been initialized yet
         if not mixer.get_init():
             # Set the frequency to 24000Hz, since that's what gTTS uses
             mixer.pre_init(24000)
             mixer.init()
+        # Play everything through one player so nothing ever busy-waits
+        # Load a different, constant sound after each clip to release its file
+        player = Player(music, idle_path='sounds/akuwhat.mp3')
+        # Decode every sound now, so none of them has to be decoded to play
+        return mixer, player, SoundBank(mixer)
+
+    @staticmethod
+    def __set_up_gpio(used_pins):
+        """Returns a PinManager of the given pins, set up as outputs."""
+        from RPi import GPIO
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False)
         # Set up the pins I need to use
-        used_pins = list(pin_mapping.values())
         GPIO.setup(used_pins, GPIO.OUT)
+        # Commands only post changes to my pins; its thread writes them
+        return PinManager(GPIO, used_pins)
 
-        # Will be used later to determine if my event loop should end
-        # Starts as False, since I am just initializing; I am not listening yet
-        self.is_running = False
+    @staticmethod
+    def __load_detector(shards, voice_gate, capture, commands):
+        """Returns a snowboy detector with the model of each of the given
+        Commands loaded, reading audio from capture.
+
+        Models are in the same order as commands, so callbacks can be matched
+        to them later. If shards is nonzero, they are spread over that many
+        processes. If voice_gate is True, they only run while someone might
+        be speaking.
+        """
+        models = [command.model for command in commands]
+        sensitivities = [command.sensitivity for command in commands]
+        gate = None
+        if voice_gate:
+            from vad import VoiceGate
+            # Snowboy always listens to 16kHz mono
+            gate = VoiceGate(rate=16000)
+        if shards:
+            from detection import ShardedDetector
+            return ShardedDetector(
+                models, sensitivity=sensitivities, shards=shards, gate=gate,
+                capture=capture
+            )
+        from detection import LocalDetector
+        return LocalDetector(
+            models, sensitivity=sensitivities, capture=capture, gate=gate
+        )
 
-    def __del__(self):
-        """Close my logger and the mixer."""
-        del self.logger
-        mixer.quit()
+    @staticmethod
+    def __set_up_speech():
+        """Returns my speech cache, synthesizer, and pipeline."""
+        speech_cache = SpeechCache()
+        # Speak with gTTS, falling back to (or preferring, if it is much
+        #   faster) the offline eSpeak NG engine
+        synthesizer = Synthesizer(speech_cache, BackendSelector(
+            [GTTSBackend(), EspeakBackend()]
+        ))
+        # Synthesizes long responses a sentence at a time
+        return speech_cache, synthesizer, SpeechPipeline(synthesizer)
+
+    @staticmethod
+    def __set_up_network(location_coords, tracer):
+        """Returns my Brain, with everything it needs from the network."""
+        from brain import Brain
+        from httpclient import HttpClient
+        from jokes import JokeReservoir
+        # Every network call shares one client and its pooled connections
+        client = HttpClient()
+        return Brain(
+            location_coords, client=client,
+            jokes=JokeReservoir(session=client), tracer=tracer
+        )
 
     @staticmethod
     def get_commands():
-        """Returns a dict mapping all commands to their sensitivities."""
-        # Ask the decorator for what it recorded
-        return HomeCommand.get_commands()
+        """Returns a dict mapping all my commands to their sensitivities, as
+        they were defined (see registry for the ones I have now).
+        """
+        return HomeCommand.find(Body)
 
     def start(self):
         """Begin listening to spoken commands.
 
         Note: Control will stay within this object.
-        """
-        # Grab my callback methods, find the appropriate models, and set up the
-        #   sensitivities for each
-        callbacks = []
-        models = []
-        sensitivities = []
-        command_mapping = Body.get_commands()
-        for command, sensitivity in command_mapping.items():
-            callbacks.append(lambda: command(self))
-            models.append('models/{}.pmdl'.format(command.__name__))
-            sensitivities.append(sensitivity)
 
+        Each detected command is handed to my executor, so I go back to
+        listening right away no matter how long the command takes.
+
+        Raises:
+            Exception: Whatever unrecoverable exception a command threw, once
+                I have stopped listening because of it.
+        """
         # If I see an interrupt, then I need to stop running
         signal.signal(signal.SIGINT, self.stop)
-
-        detectors = snowboydecoder.HotwordDetector(
-            models, sensitivity=sensitivities
-        )
+        # If asked to, save what I last heard
+        signal.signal(signal.SIGUSR1, self.dump_audio)
+        # If asked to, reload any model that was recorded again
+        signal.signal(signal.SIGHUP, self.reload_models)
+
+        # Run commands asked for over HTTP the same way as heard ones, if
+        #   asked to. Its port is taken before anything else is started, so
+        #   a port already in use leaves nothing running
+        server = None
+        if self.command_port is not None:
+            from commandserver import CommandServer
+            server = CommandServer(self.registry, self.command_port)
+
+        # My detector was loaded while starting up, unless I already listened
+        #   (and terminated it) before
+        detectors, commands = self.__detectors, self.__detected
+        try:
+            if detectors is None:
+                commands = self.registry.entries()
+                detectors = Body.__load_detector(
+                    self.detector_shards, self.voice_gate, self.capture,
+                    commands
+                )
+            self.__detectors = None
+            # Keep it in step with my commands while I listen, starting with
+            #   whatever changed since it was loaded
+            callbacks = self.registry.attach(detectors, commands)
+        except Exception:
+            # Give the port back, since I won't be listening after all
+            if server:
+                server.stop()
+            raise
+
+        # Warm responses shortly before they are usually asked for, learning
+        #   when that is from my log history (so only if logging to a file)
+        prefetcher = None
+        if self.logger.path:
+            prefetcher = Prefetcher(
+                self.logger.path, self.__warmers(),
+                on_error=partial(Body.__prefetch_failed, self.logger)
+            )
+            prefetcher.start()
+
+        if server:
+            server.start()
+
+        # Fill the joke reservoir before anyone asks for a joke
+        self.brain.jokes.request_refill()
+        self.tracer.start()
 
         # Designate me as a running instance
         self.is_running = True
+        self.startup.finish()
 
         detectors.start(
             detected_callback=callbacks,
-            # If I should no longer be running, then interrupt me
-            interrupt_check=lambda: not self.is_running,
+            # If I should no longer be running, or a command threw an
+            #   unrecoverable exception, then interrupt me
+            interrupt_check=lambda: (
+                not self.is_running or self.executor.failure is not None
+            ),
             sleep_time=.03
         )
 
+        self.registry.detach()
         detectors.terminate()
+        self.capture.stop()
+        self.is_running = False
+        if server:
+            server.stop()
+        if prefetcher:
+            prefetcher.stop()
+        self.tracer.stop()
+
+        # Let the unrecoverable exception kill the program like it used to
+        if self.executor.failure is not None:
+            raise self.executor.failure
 
     def stop(self):
         """Stop listening to spoken commands."""
@@ -110,51 +328,146 @@ class Body:
         #   loop that it must terminate
         self.is_running = False
 
+    def dump_audio(self, *args):
+        """Save the last 5 seconds I heard to logs/audio, named after now.
+
+        Called when I receive SIGUSR1 while listening, so what I heard can be
+        checked whenever I mishear something.
+
+        Returns:
+            str: Path of the saved WAV file.
+        """
+        path = 'logs/audio/{}.wav'.format(
+            datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        )
+        self.capture.dump(path, seconds=5)
+        return path
+
+    def reload_models(self, *args):
+        """Reload the model of every command whose model file changed since
+        it was loaded, on a thread of its own.
+
+        Called when I receive SIGHUP while listening, so a command can be
+        recorded again without restarting me. I keep listening (with the
+        old model) while the new one loads, and no other model is reloaded.
+
+        Returns:
+            Thread: The thread reloading them.
+        """
+        thread = Thread(
+            target=Body.__reload, args=(self.registry, self.logger),
+            name='xavier-reload', daemon=True
+        )
+        thread.start()
+        return thread
+
     # Helpers #
+    @staticmethod
+    def __reload(registry, logger):
+        """Reload every changed model in registry, logging what happened."""
+        start = monotonic()
+        try:
+            names = registry.reload()
+        except Exception:
+            logger.log_warn('reload_models', format_exc(), monotonic() - start)
+        else:
+            logger.log_info(
+                'reload_models', ', '.join(names), monotonic() - start
+            )
+
+    @staticmethod
+    def __prefetch_failed(logger, name, error):
+        """Log why my prefetcher failed to warm name's response, or (if
+        name is None) to check what to warm.
+        """
+        logger.log_warn(
+            name or 'prefetch', ''.join(format_exception(error))
+        )
+
     def set_thinking(self, value):
-        """Sets the thinking pin to the given value.
+        """Holds the thinking pin on, or releases my hold on it.
 
-        Used by the HomeCommand decorator.
+        Used by the HomeCommand decorator. The pin stays on while any
+        command is thinking.
 
         Args:
-            value (bool): To set the pin to.
+            value (bool): Whether a command started (or finished) thinking.
         """
-        GPIO.output(self.thinking, value)
+        if value:
+            self.pins.hold(self.thinking)
+        else:
+            self.pins.release(self.thinking)
 
-    @staticmethod
-    def play_sound(desire):
+    def play_sound(self, desire, block=True):
         """Given the name of an mp3 (no extension/dir), plays the sound.
 
+        Plays it from my sound bank, on its own channel, if it is there, and
+        through my player otherwise.
+
+        If blocking, records how long it played as the playback phase of the
+        current command.
+
         Args:
             desire (str): MP3 to play with no extension/dir.
+            block (bool): Whether to wait for the sound to finish.
 
         Returns:
             str: The action I just performed.
         """
         # Ensure the mixer has been initialized
-        if not mixer.get_init():
+        if not self.mixer.get_init():
             return 'Mixer has not been initialized yet; create a new instance.'
-        music.load('sounds/{}.mp3'.format(desire))
-        music.play()
-        while music.get_busy():
-            continue
+        # Sounds in my bank are already decoded, so they start right away
+        if desire in self.sounds:
+            started_at = self.sounds.play(desire, block)
+            if block:
+                self.tracer.record('playback', monotonic() - started_at)
+            return "Played {}.".format(desire)
+        handle = self.play_file('sounds/{}.mp3'.format(desire), block)
+        if block and handle.started_at is not None:
+            self.tracer.record(
+                'playback', handle.finished_at - handle.started_at
+            )
         return "Played {}.".format(desire)
 
+    def play_file(self, path, block=True):
+        """Plays the mp3 at the given path.
+
+        Args:
+            path (str): Path to the mp3 to play.
+            block (bool): Whether to wait for the mp3 to finish.
+
+        Returns:
+            PlaybackHandle: Handle to wait on or cancel the playback with.
+        """
+        return self.player.play(path, block)
+
     def __say(self, desire):
         """Given a string of text, speak it.
 
+        Starts speaking as soon as the first sentence (or, for a single
+        sentence, its first part) is synthesized, playing straight from memory.
+
+        Records how long I waited for speech to start as the synthesis phase
+        of the current command, and how long it played as its playback.
+
         Args:
             desire (str): Text to speak.
         """
-        tts = gTTS(desire, 'en-uk')
-        tts.save('sounds/temp_voice.mp3')
-        self.play_sound('temp_voice')
-        # Load a different, constant sound to prevent IO errors
-        music.load('sounds/akuwhat.mp3')
+        queued_at = monotonic()
+        handle = self.player.play(self.pipeline.stream(desire))
+        if handle.started_at is not None:
+            self.tracer.record('synthesis', handle.started_at - queued_at)
+            self.tracer.record(
+                'playback', handle.finished_at - handle.started_at
+            )
 
     def call_say(self, func, *args, **kwargs):
         """Call the method, then say and return its output.
 
+        Long outputs are synthesized a sentence at a time by my pipeline, so
+        they start playing once their first sentence is ready.
+
         Args:
             func (callable): Method to execute.
             args (list): Args to call the method with.
@@ -167,6 +480,50 @@ class Body:
         self.__say(to_say)
         return to_say
 
+    def warm_speech(self, func, *args, **kwargs):
+        """Call the method, then synthesize its output without saying it.
+
+        Used by my prefetcher so that a later call_say with the same method
+        only has to play the cached clip.
+
+        Args:
+            func (callable): Method to execute.
+            args (list): Args to call the method with.
+            kwargs (dict): Keyword args to call the method with.
+
+        Returns:
+            str: The call's output.
+        """
+        to_say = func(*args, **kwargs)
+        self.pipeline.warm(to_say)
+        return to_say
+
+    def __warmers(self):
+        """Returns a dict mapping command names to callables warming them.
+
+        Only commands whose responses stay the same for a while can be warmed;
+        the time, for example, changes every second.
+        """
+        return {
+            'weather_today_full': partial(
+                self.warm_speech,
+                self.brain.get_full_broadcast, WeatherDay.TODAY
+            ),
+            'weather_tomorrow_full': partial(
+                self.warm_speech,
+                self.brain.get_full_broadcast, WeatherDay.TOMORROW
+            ),
+            'weather_today_brief': partial(
+                self.warm_speech,
+                self.brain.get_brief_broadcast, WeatherDay.TODAY
+            ),
+            'weather_tomorrow_brief': partial(
+                self.warm_speech,
+                self.brain.get_brief_broadcast, WeatherDay.TOMORROW
+            ),
+            'date': partial(self.warm_speech, self.brain.get_date),
+        }
+
     # Error Reporters #
     def report_warn(self, command_name, exception_name):
         """Proclaim I just encountered a recoverable exception.
@@ -200,23 +557,23 @@ class Body:
 
     # Command #
     ## IOT ##
-    @HomeCommand(0.5, 'akuwhat')
+    @HomeCommand(0.5, policy=CommandPolicy.IMMEDIATE)
     def toggle_lamp(self):
         """Toggles lamp pin.
 
         Returns a string depicting the action.
         """
-        GPIO.output(self.lamp, not GPIO.input(self.lamp))
+        self.pins.toggle(self.lamp)
         return "Toggled lamp."
 
-    @HomeCommand(0.5, 'akuwhat')
+    @HomeCommand(0.5, policy=CommandPolicy.IMMEDIATE)
     def blink_led(self):
         """Blink my thinking LED.
 
         Returns a string depicting the action.
         """
-        # Decorator takes care of this
-        sleep(2)
+        # Blinks for two seconds, without making me wait for it
+        self.pins.blink(self.thinking, times=5, period=0.4)
         return 'Blinked thinking LED.'
 
     ## Soundboard ##
@@ -306,15 +663,14 @@ class Body:
 if __name__ == "__main__":
     mapping = {'thinking': 10, 'lamp': 11}
     body = Body(mapping, logfile='coretesting.log')
-    commands = {func.__name__: func for func in Body.get_commands()}
 
     print('Console for testing purposes')
     while True:
         cmd = input('Enter/list/exit: ')
-        if cmd in commands:
-            commands[cmd](body)
+        if cmd in body.registry:
+            body.registry[cmd].function(body)
         elif cmd == 'list':
-            for opt in commands:
+            for opt in body.registry:
                 print(opt)
         elif cmd == 'exit':
             break
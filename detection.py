@@ -0,0 +1,680 @@
+import math
+import multiprocessing
+import os
+import struct
+from importlib import import_module
+from multiprocessing.connection import wait
+from threading import Event, Lock, Thread
+from time import monotonic
+from capture import Capture
+
+# Every chunk of audio sent to a shard starts with when it was captured
+STAMP = struct.Struct('<d')
+# Starts a message retuning one of a shard's models instead, since nothing
+#   is ever captured at NaN
+TUNE = STAMP.pack(math.nan)
+
+
+def load_models(engine, resource, models, sensitivity, audio_gain):
+    """Returns a SnowboyDetect with the given models loaded.
+
+    Args:
+        engine (str): Name of the module holding SnowboyDetect.
+        resource (str): Path of snowboy's resource file.
+        models (list): Paths of the models to detect.
+        sensitivity (list): Sensitivity of each model, or empty for their
+            defaults.
+        audio_gain (float): What to multiply the audio's volume by.
+    """
+    detector = import_module(engine).SnowboyDetect(
+        resource_filename=resource.encode(),
+        model_str=','.join(models).encode()
+    )
+    detector.SetAudioGain(audio_gain)
+    if sensitivity:
+        detector.SetSensitivity(
+            ','.join(str(value) for value in sensitivity).encode()
+        )
+    return detector
+
+
+def tune_model(detector, sensitivity, index, value):
+    """Set the sensitivity of one of a SnowboyDetect's models, leaving the
+    rest as they are.
+
+    Args:
+        detector (SnowboyDetect): Detector holding the model.
+        sensitivity (list): Sensitivity of each of its models, or empty if
+            they are their defaults (which are then asked for).
+        index (int): Which of its models to tune.
+        value (float): The model's new sensitivity.
+
+    Returns:
+        list: Sensitivity of each of its models now.
+    """
+    sensitivity = list(sensitivity)
+    if not sensitivity:
+        defaults = detector.GetSensitivity()
+        if isinstance(defaults, bytes):
+            defaults = defaults.decode()
+        sensitivity = [float(default) for default in defaults.split(',')]
+    sensitivity[index] = value
+    detector.SetSensitivity(
+        ','.join(str(value) for value in sensitivity).encode()
+    )
+    return sensitivity
+
+
+def check_models(decoder_model, sensitivity, resource):
+    """Returns the models, their sensitivities, and snowboy's resource file
+    as detectors take them, defaulting to the resource file snowboydecoder
+    uses.
+
+    Raises:
+        ValueError: If there isn't a sensitivity for every model.
+    """
+    if not isinstance(decoder_model, list):
+        decoder_model = [decoder_model]
+    sensitivity = list(sensitivity)
+    if sensitivity and len(sensitivity) != len(decoder_model):
+        raise ValueError('number of hotwords in decoder_model ({}) and '
+                         'sensitivity ({}) does not match'.format(
+                             len(decoder_model), len(sensitivity)))
+    if resource is None:
+        import snowboydecoder
+        resource = snowboydecoder.RESOURCE_FILE
+    return decoder_model, sensitivity, resource
+
+
+def detect_shard(engine, resource, models, sensitivity, audio_gain, offset,
+                 audio, results):
+    """Detect a shard's models in audio until the audio ends.
+
+    Runs in its own process, started by a ShardedDetector. Reports being
+    ready once its models are loaded, then reports each detection.
+
+    Args:
+        engine (str): Name of the module holding SnowboyDetect.
+        resource (str): Path of snowboy's resource file.
+        models (list): Paths of the models to detect.
+        sensitivity (list): Sensitivity of each model, or empty for their
+            defaults.
+        audio_gain (float): What to multiply the audio's volume by.
+        offset (int): Number of the shard's first model among every model.
+        audio (Connection): Receives chunks of audio, each starting with when
+            it was captured (see STAMP). A chunk with no audio means the
+            audio skipped ahead, and one starting with TUNE holds the index
+            of a model and its new sensitivity (like 1,0.5). Closed once
+            there is no more audio.
+        results (Connection): Where to send (None, offset, (rate, channels,
+            bits)) once ready, then (model number, when captured) per
+            detection.
+    """
+    detector = load_models(engine, resource, models, sensitivity, audio_gain)
+    results.send((None, offset, (
+        detector.SampleRate(), detector.NumChannels(),
+        detector.BitsPerSample()
+    )))
+
+    while True:
+        try:
+            chunk = audio.recv_bytes()
+        except EOFError:
+            return
+        if len(chunk) == STAMP.size:
+            # Don't let what was heard before the skip run into what's next
+            detector.Reset()
+            continue
+        if chunk.startswith(TUNE):
+            index, value = chunk[STAMP.size:].decode().split(',')
+            sensitivity = tune_model(
+                detector, sensitivity, int(index), float(value)
+            )
+            continue
+        captured_at, = STAMP.unpack_from(chunk)
+        answer = detector.RunDetection(chunk[STAMP.size:])
+        if answer > 0:
+            results.send((offset + answer - 1, captured_at))
+
+
+class ShardedDetector:
+    """Detects many hotwords at once, spread over several processes.
+
+    A single snowboy detector checks every model against every chunk of
+    audio, so its CPU use grows with the number of models until one core
+    can't keep up. Instead, the models are split into shards, each detected
+    by its own process (so its own core). Audio is still captured once (by a
+    Capture), then every chunk is handed to every shard along with when it
+    was captured.
+
+    Shards report detections back with the capture time of the chunk they
+    were heard in. Since one utterance can be heard by more than one shard
+    (or by one shard in consecutive chunks), detections are merged: the
+    earliest-captured detection within merge_window seconds of the first one
+    wins, and anything captured within refractory seconds after it is
+    dropped as the same utterance.
+
+    Models can be added, removed, and retuned while detecting, without
+    touching the audio or any other shard: an added model gets a shard of
+    its own, a removed one is ignored (and its shard ended once none of its
+    models are left), and a retuned one is retuned in its shard.
+
+    Works just like snowboydecoder.HotwordDetector: its models start loading
+    when created, and start runs a detection loop. Once terminated, it can't
+    be started again.
+
+    Args:
+        decoder_model (list): Paths of the models to detect, one per command.
+        resource (str): Path of snowboy's resource file. Defaults to the one
+            snowboydecoder uses.
+        audio_gain (float): What to multiply the audio's volume by.
+        sensitivity (list): Sensitivity of each model, or empty for their
+            defaults.
+        shards (int): Most processes to spread the models over. Defaults to
+            one per core.
+        merge_window (float): Seconds to wait for other shards to report the
+            same utterance. Not waited for with a single shard.
+        refractory (float): Seconds of audio after a detection to ignore.
+        engine (str): Name of the module holding SnowboyDetect, imported by
+            each shard.
+        timeout (float): Most seconds to wait for a shard to load.
+        gate (VoiceGate): Decides which audio is handed to the shards, so
+            they only detect while someone might be speaking. Every chunk is
+            handed to them if None.
+        capture (Capture): Where to read audio from, started (if it isn't
+            already) once I start detecting. Defaults to one of my own,
+            stopped once I'm terminated.
+
+    Raises:
+        RuntimeError: If a shard fails to load its models.
+    """
+
+    def __init__(self, decoder_model, resource=None, audio_gain=1,
+                 sensitivity=(), shards=None, merge_window=0.1,
+                 refractory=1.0, engine='snowboydetect', timeout=30,
+                 gate=None, capture=None):
+        decoder_model, sensitivity, resource = check_models(
+            decoder_model, sensitivity, resource
+        )
+        self.num_hotwords = len(decoder_model)
+        self.merge_window = merge_window
+        self.refractory = refractory
+        self.timeout = timeout
+        self.gate = gate
+
+        # Fresh processes, so they never inherit my threads (or their locks)
+        self.__context = multiprocessing.get_context('spawn')
+        self.__engine = (engine, resource, audio_gain)
+        # Every ready shard, as [process, audio pipe, results pipe, numbers
+        #   of its models (None once removed), lock held while sending on its
+        #   audio pipe]; it only changes while holding my lock, but shards are
+        #   sent to outside it, so a slow shard never holds up adding,
+        #   removing, or retuning models
+        self.__shards = []
+        self.__lock = Lock()
+        # Maps the number of every model I detect to its callback; numbers
+        #   count every model ever added, so none is ever reused
+        self.__callbacks = dict.fromkeys(range(self.num_hotwords))
+        self.__count = self.num_hotwords
+
+        count = max(1, min(shards or os.cpu_count() or 1, self.num_hotwords))
+        # Each shard gets a contiguous run of models, so detections can be
+        #   numbered by adding the shard's offset
+        size = -(-self.num_hotwords // count)
+        shards = [
+            self.__spawn(
+                decoder_model[offset:offset + size],
+                sensitivity[offset:offset + size], offset
+            )
+            for offset in range(0, self.num_hotwords, size)
+        ]
+        # A single shard never reports the same utterance twice in a chunk
+        if len(shards) == 1:
+            self.merge_window = 0.0
+        self.audio_format = self.__wait_until_ready(shards)
+        self.__shards.extend(shards)
+        self.__own_capture = capture is None
+        self.capture = capture or Capture(*self.audio_format)
+
+    @property
+    def pids(self):
+        """list: Process IDs of my shards."""
+        with self.__lock:
+            return [shard[0].pid for shard in self.__shards]
+
+    def start(self, detected_callback=None, interrupt_check=lambda: False,
+              sleep_time=0.03):
+        """Capture audio and detect hotwords in it until interrupted.
+
+        Args:
+            detected_callback (list): Callable to call when each model is
+                detected, in the same order as the models I was created
+                with. None skips one. Models added later bring their own.
+            interrupt_check (callable): Returns True once I should stop.
+            sleep_time (float): Most seconds to wait for a detection before
+                checking interrupt_check again.
+        """
+        if not isinstance(detected_callback, list):
+            detected_callback = [detected_callback] * self.num_hotwords
+        with self.__lock:
+            for number, callback in enumerate(detected_callback):
+                # Unless it was removed already
+                if number in self.__callbacks:
+                    self.__callbacks[number] = callback
+        if interrupt_check():
+            return
+        # Hand every chunk captured from now on to the shards as it comes
+        stopped = Event()
+        forwarder = Thread(
+            target=ShardedDetector.__forward, name='xavier-forwarder',
+            args=(self.capture.reader(), self.__shards, self.__lock,
+                  self.gate, stopped),
+            daemon=True
+        )
+        forwarder.start()
+        self.capture.start()
+
+        # The best detection waiting for other shards, as (when captured,
+        #   model number, when received), and when the last one I called
+        #   back for was captured
+        pending = None
+        last_captured = None
+        while not interrupt_check():
+            with self.__lock:
+                shards = {shard[2]: shard for shard in self.__shards}
+            ready = wait(list(shards), sleep_time)
+            now = monotonic()
+            for results in ready:
+                try:
+                    number, captured_at = results.recv()
+                except EOFError:
+                    # The shard died, so stop waiting on it
+                    with self.__lock:
+                        self.__drop(shards[results])
+                    self.__end([shards[results]])
+                    continue
+                if number not in self.__callbacks or (
+                        last_captured is not None and
+                        captured_at - last_captured < self.refractory):
+                    continue
+                if pending is None:
+                    pending = (captured_at, number, now)
+                else:
+                    pending = min(pending, (captured_at, number, pending[2]))
+
+            if pending and now - pending[2] >= self.merge_window:
+                last_captured, number, _ = pending
+                pending = None
+                callback = self.__callbacks.get(number)
+                if callback is not None:
+                    callback()
+        stopped.set()
+        forwarder.join()
+
+    def add_model(self, model, sensitivity=None, callback=None):
+        """Start detecting another model, in a shard of its own, without
+        stopping (or reloading) any other.
+
+        Args:
+            model (str): Path of the model.
+            sensitivity (float): Its sensitivity. Its default if None.
+            callback (callable): Called when it is detected.
+
+        Returns:
+            int: The model's number, to remove or retune it by.
+
+        Raises:
+            RuntimeError: If its shard fails to load it.
+        """
+        with self.__lock:
+            number = self.__count
+            self.__count += 1
+        shard = self.__spawn(
+            [model], [] if sensitivity is None else [sensitivity], number
+        )
+        self.__wait_until_ready([shard])
+        with self.__lock:
+            self.__callbacks[number] = callback
+            self.__shards.append(shard)
+        return number
+
+    def remove_model(self, number):
+        """Stop detecting a model, ending its shard if it has no others.
+
+        Raises:
+            KeyError: If I'm not detecting the model.
+        """
+        with self.__lock:
+            shard, index = self.__find(number)
+            del self.__callbacks[number]
+            shard[3][index] = None
+            if any(other is not None for other in shard[3]):
+                return
+            self.__drop(shard)
+        self.__end([shard])
+
+    def set_sensitivity(self, number, sensitivity):
+        """Retune a model in its shard, without reloading it.
+
+        Raises:
+            KeyError: If I'm not detecting the model.
+        """
+        with self.__lock:
+            shard, index = self.__find(number)
+        with shard[4]:
+            shard[1].send_bytes(
+                TUNE + '{},{}'.format(index, sensitivity).encode()
+            )
+
+    def terminate(self):
+        """Stop capturing audio (if I captured it) and end every shard."""
+        if self.__own_capture:
+            self.capture.stop()
+        with self.__lock:
+            shards = list(self.__shards)
+            for shard in shards:
+                self.__drop(shard)
+        self.__end(shards)
+
+    # Helpers #
+    def __spawn(self, models, sensitivity, offset):
+        """Returns a new shard detecting the given models, numbered from
+        offset, once it starts loading them.
+        """
+        engine, resource, audio_gain = self.__engine
+        receiver, sender = self.__context.Pipe(duplex=False)
+        results, reporter = self.__context.Pipe(duplex=False)
+        process = self.__context.Process(
+            target=detect_shard, name='xavier-detector-{}'.format(offset),
+            args=(engine, resource, models, sensitivity, audio_gain, offset,
+                  receiver, reporter),
+            daemon=True
+        )
+        process.start()
+        # Only the shard reads its audio and reports its results, so its
+        #   results end once it does
+        receiver.close()
+        reporter.close()
+        return [process, sender, results,
+                list(range(offset, offset + len(models))), Lock()]
+
+    def __find(self, number):
+        """Returns the shard detecting a model, and the model's index in it.
+
+        Note: Only call while holding my lock.
+
+        Raises:
+            KeyError: If no shard is detecting the model.
+        """
+        for shard in self.__shards:
+            if number in shard[3]:
+                return shard, shard[3].index(number)
+        raise KeyError(number)
+
+    def __drop(self, shard):
+        """Stop handing audio to a shard and calling back for its models.
+
+        Note: Only call while holding my lock.
+        """
+        if shard in self.__shards:
+            self.__shards.remove(shard)
+        for number in shard[3]:
+            self.__callbacks.pop(number, None)
+
+    @staticmethod
+    def __end(shards):
+        """End the given shards, killing any that doesn't end in time."""
+        # Shards return once their pipes close
+        for shard in shards:
+            with shard[4]:
+                shard[1].close()
+        for shard in shards:
+            shard[0].join(5)
+            if shard[0].is_alive():
+                shard[0].kill()
+
+    def __wait_until_ready(self, shards):
+        """Returns the audio format the given shards expect, once all are
+        ready.
+
+        Raises:
+            RuntimeError: If a shard died or took longer than my timeout.
+        """
+        deadline = monotonic() + self.timeout
+        formats = [
+            ShardedDetector.__ready(shard, deadline) for shard in shards
+        ]
+        if None in formats:
+            ShardedDetector.__end(shards)
+            raise RuntimeError('A detector shard failed to load its models')
+        return formats[0]
+
+    @staticmethod
+    def __ready(shard, deadline):
+        """Returns the audio format a shard expects once it is ready, or None
+        if it died or wasn't ready by deadline.
+        """
+        process, _, results = shard[:3]
+        while not results.poll(0.1):
+            if not process.is_alive() or monotonic() > deadline:
+                return None
+        try:
+            return results.recv()[2]
+        except EOFError:
+            return None
+
+    @staticmethod
+    def __forward(reader, shards, lock, gate, stopped):
+        """Hand every chunk reader reads to every shard until stopped."""
+        while not stopped.is_set():
+            chunk = reader.read(timeout=0.1)
+            if chunk is None:
+                continue
+            audio, captured_at = chunk
+            stamp = STAMP.pack(captured_at)
+            if gate is not None:
+                audio = gate.process(audio)
+                if not audio:
+                    continue
+            chunk = stamp + audio
+            with lock:
+                shards_now = list(shards)
+            opened = gate is not None and gate.opened
+            for shard in shards_now:
+                with shard[4]:
+                    try:
+                        if opened:
+                            shard[1].send_bytes(stamp)
+                        shard[1].send_bytes(chunk)
+                    except OSError:
+                        # It was ended (or died) since I copied the shards
+                        pass
+
+
+class LocalDetector:
+    """Detects hotwords in this process, in audio read from a Capture.
+
+    Does what snowboydecoder.HotwordDetector does, except that it doesn't
+    capture audio itself or check for more every sleep_time seconds: it
+    reads each chunk from a Capture as soon as it is captured, so anything
+    else in Xavier can listen to the same audio.
+
+    Models can be added, removed, and retuned while detecting, without
+    touching the audio or reloading any other model: each added model gets a
+    SnowboyDetect of its own, run on the same audio as the rest, while a
+    removed one is ignored (and its SnowboyDetect dropped once none of its
+    models are left).
+
+    Like HotwordDetector, its models are loaded when created. Once
+    terminated, it can't be started again.
+
+    Args:
+        decoder_model (list): Paths of the models to detect, one per command.
+        resource (str): Path of snowboy's resource file. Defaults to the one
+            snowboydecoder uses.
+        audio_gain (float): What to multiply the audio's volume by.
+        sensitivity (list): Sensitivity of each model, or empty for their
+            defaults.
+        capture (Capture): Where to read audio from, started (if it isn't
+            already) once I start detecting. Defaults to one of my own,
+            stopped once I'm terminated.
+        engine (str): Name of the module holding SnowboyDetect.
+        gate (VoiceGate): Decides which audio is detected in, so models only
+            run while someone might be speaking. Every chunk is if None.
+    """
+
+    def __init__(self, decoder_model, resource=None, audio_gain=1,
+                 sensitivity=(), capture=None, engine='snowboydetect',
+                 gate=None):
+        decoder_model, sensitivity, resource = check_models(
+            decoder_model, sensitivity, resource
+        )
+        detector = load_models(
+            engine, resource, decoder_model, sensitivity, audio_gain
+        )
+        self.num_hotwords = len(decoder_model)
+        self.audio_format = (
+            detector.SampleRate(), detector.NumChannels(),
+            detector.BitsPerSample()
+        )
+        self.gate = gate
+        self.__engine = (engine, resource, audio_gain)
+        # Every SnowboyDetect I run, as [detector, numbers of its models
+        #   (None once removed), their sensitivities]; only changed (and
+        #   run) while holding my lock
+        self.__banks = [
+            [detector, list(range(self.num_hotwords)), sensitivity]
+        ]
+        self.__lock = Lock()
+        # Maps the number of every model I detect to its callback; numbers
+        #   count every model ever added, so none is ever reused
+        self.__callbacks = dict.fromkeys(range(self.num_hotwords))
+        self.__count = self.num_hotwords
+        self.__own_capture = capture is None
+        self.capture = capture or Capture(*self.audio_format)
+
+    def start(self, detected_callback=None, interrupt_check=lambda: False,
+              sleep_time=0.03):
+        """Detect hotwords in captured audio until interrupted.
+
+        Args:
+            detected_callback (list): Callable to call when each model is
+                detected, in the same order as the models I was created
+                with. None skips one. Models added later bring their own.
+            interrupt_check (callable): Returns True once I should stop.
+            sleep_time (float): Most seconds to wait for audio before
+                checking interrupt_check again.
+        """
+        if not isinstance(detected_callback, list):
+            detected_callback = [detected_callback] * self.num_hotwords
+        with self.__lock:
+            for number, callback in enumerate(detected_callback):
+                # Unless it was removed already
+                if number in self.__callbacks:
+                    self.__callbacks[number] = callback
+        if interrupt_check():
+            return
+        reader = self.capture.reader()
+        self.capture.start()
+        while not interrupt_check():
+            chunk = reader.read(timeout=sleep_time)
+            if chunk is None:
+                continue
+            audio = chunk[0]
+            if self.gate is not None:
+                audio = self.gate.process(audio)
+                if not audio:
+                    continue
+            # snowboy only takes bytes, so this is where the chunk is copied
+            number = self.__detect(
+                bytes(audio), self.gate is not None and self.gate.opened
+            )
+            callback = self.__callbacks.get(number)
+            if callback is not None:
+                callback()
+
+    def add_model(self, model, sensitivity=None, callback=None):
+        """Start detecting another model, without reloading any other.
+
+        It is loaded on the calling thread, so detection goes on meanwhile.
+
+        Args:
+            model (str): Path of the model.
+            sensitivity (float): Its sensitivity. Its default if None.
+            callback (callable): Called when it is detected.
+
+        Returns:
+            int: The model's number, to remove or retune it by.
+        """
+        engine, resource, audio_gain = self.__engine
+        sensitivity = [] if sensitivity is None else [sensitivity]
+        detector = load_models(
+            engine, resource, [model], sensitivity, audio_gain
+        )
+        with self.__lock:
+            number = self.__count
+            self.__count += 1
+            self.__banks.append([detector, [number], sensitivity])
+            self.__callbacks[number] = callback
+        return number
+
+    def remove_model(self, number):
+        """Stop detecting a model.
+
+        Raises:
+            KeyError: If I'm not detecting the model.
+        """
+        with self.__lock:
+            bank, index = self.__find(number)
+            del self.__callbacks[number]
+            bank[1][index] = None
+            if all(other is None for other in bank[1]):
+                self.__banks.remove(bank)
+
+    def set_sensitivity(self, number, sensitivity):
+        """Retune a model, without reloading it.
+
+        Raises:
+            KeyError: If I'm not detecting the model.
+        """
+        with self.__lock:
+            bank, index = self.__find(number)
+            bank[2] = tune_model(bank[0], bank[2], index, sensitivity)
+
+    def terminate(self):
+        """Stop capturing audio, if I captured it."""
+        if self.__own_capture:
+            self.capture.stop()
+
+    # Helpers #
+    def __detect(self, audio, reset):
+        """Returns the number of the first model detected in a chunk of audio
+        (or None), running every SnowboyDetect on it.
+
+        Args:
+            audio (bytes): The chunk.
+            reset (bool): Whether the audio skipped ahead before the chunk.
+        """
+        detected = None
+        with self.__lock:
+            for detector, numbers, _ in self.__banks:
+                if reset:
+                    # Don't let what was heard before the skip run into it
+                    detector.Reset()
+                answer = detector.RunDetection(audio)
+                if answer > 0 and detected is None:
+                    detected = numbers[answer - 1]
+        return detected
+
+    def __find(self, number):
+        """Returns the bank detecting a model, and the model's index in it.
+
+        Note: Only call while holding my lock.
+
+        Raises:
+            KeyError: If no bank is detecting the model.
+        """
+        for bank in self.__banks:
+            if number in bank[1]:
+                return bank, bank[1].index(number)
+        raise KeyError(number)
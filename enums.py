@@ -6,3 +6,42 @@ class WeatherDay:
     """
     TODAY = 1
     TOMORROW = 2
+
+
+class CommandPolicy:
+    """Enum to represent how a command may run alongside other commands.
+
+    The Body hands detected commands to an executor, which uses this to decide
+    when each command may start:
+        * AUDIO: Command produces audio, so it runs strictly after every other
+            AUDIO command that was detected before it.
+        * IMMEDIATE: Command is silent, so it runs as soon as a worker is free,
+            even while an AUDIO command is playing.
+    """
+    AUDIO = 1
+    IMMEDIATE = 2
+
+
+class OverflowPolicy:
+    """Enum to represent what to do with a log record when the queue is full.
+
+    Used by the Logger when writing asynchronously:
+        * BLOCK: Wait for the writer to make room, so nothing is lost.
+        * DROP_OLDEST: Discard the oldest queued record to make room for the
+            new one, counting it as dropped.
+        * COUNT: Discard the new record, only counting it as dropped.
+    """
+    BLOCK = 1
+    DROP_OLDEST = 2
+    COUNT = 3
+
+
+class LogFormat:
+    """Enum to represent how the Logger writes its records.
+
+        * TEXT: Human-readable lines, as Xavier has always logged.
+        * JSON_LINES: One JSON object per line, for tools like logquery to
+            read back.
+    """
+    TEXT = 1
+    JSON_LINES = 2
@@ -0,0 +1,183 @@
+from collections import namedtuple
+from concurrent.futures import Future
+from queue import Queue, Full
+from threading import Lock, Thread
+from time import monotonic
+from enums import CommandPolicy
+
+# What a command returned, and how many seconds it waited to start and took
+#   to run
+Outcome = namedtuple('Outcome', 'result waited seconds')
+
+
+class CommandExecutor:
+    """Runs detected commands on worker threads so detection never waits.
+
+    Each CommandPolicy gets its own lane: a bounded queue drained by its own
+    workers. The AUDIO lane has a single worker, so audio-producing commands
+    play strictly in the order they were heard, while the IMMEDIATE lane's
+    workers run silent commands (like toggling the lamp) right away, even
+    while a long broadcast is playing. Submitting never blocks; if a lane's
+    queue is full, the command is dropped and counted instead.
+
+    Every command submitted gets a Future of its Outcome, so whoever asked
+    for it (like the CommandServer) can wait for what it returned. If a
+    command raises an exception (which the HomeCommand decorator only lets
+    through when it is unrecoverable), the exception is kept in failure for
+    whoever is listening to notice and re-raise.
+
+    Args:
+        immediate_workers (int): Number of workers running IMMEDIATE commands.
+        max_queued (int): Most commands each lane holds before dropping more.
+        tracer (Tracer): Where to record how long each command waited to
+            start, as its detection phase. May be None.
+    """
+
+    def __init__(self, immediate_workers=2, max_queued=8, tracer=None):
+        self.tracer = tracer
+        # Maps each policy to its queue
+        self.__lanes = {
+            CommandPolicy.AUDIO: Queue(max_queued),
+            CommandPolicy.IMMEDIATE: Queue(max_queued),
+        }
+        worker_counts = {
+            CommandPolicy.AUDIO: 1,
+            CommandPolicy.IMMEDIATE: immediate_workers,
+        }
+
+        # Set once a command throws an unrecoverable exception
+        self.failure = None
+
+        # Metrics, guarded by a lock since every worker updates them
+        self.__lock = Lock()
+        self.__max_depths = {policy: 0 for policy in self.__lanes}
+        self.__stats = dict()
+
+        self.__workers = []
+        for policy, count in worker_counts.items():
+            for i in range(count):
+                worker = Thread(
+                    target=self.__work, args=(self.__lanes[policy],),
+                    name='xavier-executor-{}-{}'.format(policy, i),
+                    daemon=True
+                )
+                worker.start()
+                self.__workers.append((worker, policy))
+
+    def submit(self, command, *args, **kwargs):
+        """Queue a command to be run as soon as its policy allows.
+
+        Never blocks.
+
+        Args:
+            command (callable): Command to run. Its policy attribute (set by
+                the HomeCommand decorator) picks its lane; commands without
+                one are treated as AUDIO.
+            args (list): Positional arguments to run the command with.
+            kwargs (dict): Keyword arguments to run the command with.
+
+        Returns:
+            Future: The command's Outcome once it has run (or the exception
+                it raised), or None if it was dropped. Cancelling it before
+                the command starts skips the command.
+        """
+        policy = getattr(command, 'policy', CommandPolicy.AUDIO)
+        lane = self.__lanes[policy]
+        stats = self.__stats_for(command.__name__)
+        future = Future()
+        try:
+            lane.put_nowait((command, args, kwargs, monotonic(), future))
+        except Full:
+            with self.__lock:
+                stats['dropped'] += 1
+            return None
+        with self.__lock:
+            stats['submitted'] += 1
+            self.__max_depths[policy] = max(
+                self.__max_depths[policy], lane.qsize()
+            )
+        return future
+
+    def shutdown(self, wait=True):
+        """Stop every worker once the commands already queued have run.
+
+        Args:
+            wait (bool): Whether to wait for the workers to finish.
+        """
+        for worker, policy in self.__workers:
+            # Each worker quits once it sees a sentinel
+            self.__lanes[policy].put(None)
+        if wait:
+            for worker, _ in self.__workers:
+                worker.join()
+
+    def get_metrics(self):
+        """Returns a dict describing my queues and how long commands waited.
+
+        Contains:
+            * depth: Maps each policy to how many commands are waiting in it.
+            * max_depth: Maps each policy to the most commands ever waiting.
+            * commands: Maps each command's name to how many times it was
+                submitted, dropped, and run, and the average and longest time
+                (in seconds) it waited between being heard and starting.
+        """
+        with self.__lock:
+            commands = dict()
+            for name, stats in self.__stats.items():
+                commands[name] = dict(stats)
+                commands[name]['avg_wait'] = (
+                    stats['total_wait'] / stats['runs'] if stats['runs']
+                    else 0.0
+                )
+            return {
+                'depth': {
+                    policy: lane.qsize()
+                    for policy, lane in self.__lanes.items()
+                },
+                'max_depth': dict(self.__max_depths),
+                'commands': commands,
+            }
+
+    # Helpers #
+    def __stats_for(self, name):
+        """Returns the (created if needed) stats dict of the named command."""
+        with self.__lock:
+            if name not in self.__stats:
+                self.__stats[name] = {
+                    'submitted': 0, 'dropped': 0, 'runs': 0,
+                    'total_wait': 0.0, 'max_wait': 0.0,
+                }
+            return self.__stats[name]
+
+    def __work(self, lane):
+        """Run commands from the given lane until I see a sentinel."""
+        while True:
+            item = lane.get()
+            if item is None:
+                return
+            command, args, kwargs, submitted_at, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            waited = monotonic() - submitted_at
+            stats = self.__stats_for(command.__name__)
+            with self.__lock:
+                stats['runs'] += 1
+                stats['total_wait'] += waited
+                stats['max_wait'] = max(stats['max_wait'], waited)
+            if self.tracer:
+                self.tracer.record('detection', waited, command.__name__)
+
+            started_at = monotonic()
+            try:
+                result = command(*args, **kwargs)
+            except Exception as e:
+                # The decorator already logged and reported it; just make sure
+                #   whoever is listening (and whoever asked for it) finds out
+                if self.failure is None:
+                    self.failure = e
+                future.set_exception(e)
+            else:
+                future.set_result(
+                    Outcome(result, waited, monotonic() - started_at)
+                )
@@ -0,0 +1,186 @@
+import json
+import os
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from threading import Lock
+from time import time
+import requests
+
+
+class ForecastCache:
+    """HTTP-aware cache of parsed forecast documents.
+
+    Follows the rules weather.gov gives in its response headers:
+        * While a document is fresh (according to Cache-Control's max-age, or
+            Expires if there is no max-age), it is returned without any
+            network I/O or JSON parsing.
+        * Once it is stale, it is revalidated with a conditional request using
+            its ETag and Last-Modified validators. If the server answers 304
+            Not Modified, the already-parsed document is reused.
+        * Documents marked no-store are never kept, and documents marked
+            no-cache are always revalidated.
+        * If a stale document can't be revalidated, because the network or
+            the server is down, it is returned anyway, since an old forecast
+            beats none at all.
+    Parsed documents and their validators are saved to a JSON file after each
+    change, so they survive restarts.
+
+    Args:
+        path (str): JSON file to persist the cache to. Created if it doesn't
+            exist. Nothing is persisted if None.
+        session (HttpClient): What to make requests with, such as the Brain's
+            HttpClient. Defaults to the requests module itself.
+    """
+
+    def __init__(self, path='cache/forecasts.json', session=None):
+        self.path = Path(path) if path else None
+        self.__session = session or requests
+
+        # Maps URLs to dicts holding a document, its validators, and when it
+        #   expires (in seconds since the epoch)
+        self.__entries = dict()
+        # Remember how useful I have been
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.stale = 0
+        # Commands may ask for the weather from more than one thread, though
+        #   never while another waits on the network
+        self.__lock = Lock()
+        self.__load()
+
+    def get(self, url):
+        """Returns the parsed JSON document at url, fetching it if necessary.
+
+        Args:
+            url (str): URL of the document.
+
+        Returns:
+            dict: The parsed document. Do not modify it; it is shared.
+
+        Raises:
+            requests.exceptions.HTTPError: If the server answered with an
+                error, such as 404 when a gridpoint no longer exists. Server
+                errors (5xx) are only raised if I have nothing stale to return.
+            requests.exceptions.RequestException: If the request failed and I
+                have nothing stale to return.
+        """
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry and time() < entry['expires']:
+                self.hits += 1
+                return entry['document']
+
+        # Ask the server to only send the document if it changed
+        headers = dict()
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.__session.get(url, headers=headers)
+            if entry and response.status_code >= 500:
+                response.raise_for_status()
+        except requests.exceptions.RequestException:
+            if not entry:
+                raise
+            with self.__lock:
+                self.stale += 1
+            return entry['document']
+
+        with self.__lock:
+            if entry and response.status_code == 304:
+                self.revalidations += 1
+                entry['expires'] = self.__expiry_of(response)
+                self.__save()
+                return entry['document']
+
+            self.misses += 1
+            response.raise_for_status()
+            document = response.json()
+            storable = not self.__forbids_store(response)
+            if response.status_code == 200 and storable:
+                self.__entries[url] = {
+                    'document': document,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'expires': self.__expiry_of(response),
+                }
+                self.__save()
+            return document
+
+    def clear(self):
+        """Forget every document."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__save()
+
+    # Helpers #
+    @staticmethod
+    def __cache_control(response):
+        """Returns the response's Cache-Control directives as a dict.
+
+        Directives without a value (like no-cache) map to None.
+        """
+        directives = dict()
+        header = response.headers.get('Cache-Control', '')
+        for directive in header.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"') or None
+        return directives
+
+    @staticmethod
+    def __forbids_store(response):
+        """Returns whether the response may not be cached at all."""
+        return 'no-store' in ForecastCache.__cache_control(response)
+
+    @staticmethod
+    def __expiry_of(response):
+        """Returns when a response stops being fresh, in seconds since epoch.
+
+        Prefers Cache-Control's max-age (minus the response's Age) over
+        Expires, as HTTP requires. Responses with neither, or with no-cache,
+        expire immediately, so they are always revalidated.
+        """
+        now = time()
+        directives = ForecastCache.__cache_control(response)
+        if 'no-cache' in directives:
+            return now
+        try:
+            if directives.get('max-age') is not None:
+                age = int(response.headers.get('Age', 0))
+                return now + int(directives['max-age']) - age
+            if 'Expires' in response.headers:
+                expires = parsedate_to_datetime(response.headers['Expires'])
+                # Measure against the server's clock, in case mine is off
+                if 'Date' in response.headers:
+                    date = parsedate_to_datetime(response.headers['Date'])
+                    return now + (expires - date).total_seconds()
+                return expires.timestamp()
+        except (TypeError, ValueError):
+            # A malformed header means the response is already stale
+            pass
+        return now
+
+    def __load(self):
+        """Read persisted entries, if there are any."""
+        if not self.path or not self.path.is_file():
+            return
+        try:
+            with open(self.path, 'r') as stream:
+                self.__entries = json.load(stream)
+        except ValueError:
+            # A corrupt cache is just an empty one
+            self.__entries = dict()
+
+    def __save(self):
+        """Persist my entries. Must be called while holding my lock."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never corrupts the cache
+        temp_path = self.path.with_suffix('.part')
+        with open(temp_path, 'w') as stream:
+            json.dump(self.__entries, stream)
+        os.replace(temp_path, self.path)
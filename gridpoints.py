@@ -0,0 +1,113 @@
+import json
+import os
+from pathlib import Path
+from threading import Lock
+import requests
+
+POINTS_URL = 'https://api.weather.gov/points/{x},{y}'
+
+
+class GridpointResolver:
+    """Remembers which weather.gov gridpoint forecasts cover each location.
+
+    weather.gov serves forecasts by office and grid square, so a forecast for
+    a pair of coordinates first has to be looked up (or redirected) through
+    the points endpoint. I do that lookup once per location and keep the
+    resulting daily and hourly forecast URLs on disk, so every later forecast
+    is a single request. A location is only looked up again once it is
+    invalidated, such as when its forecast URL stops existing.
+
+    Args:
+        path (str): JSON file to persist lookups to. Created if it doesn't
+            exist. Nothing is persisted if None.
+        session (HttpClient): What to make requests with, such as the Brain's
+            HttpClient. Defaults to the requests module itself.
+    """
+
+    def __init__(self, path='cache/gridpoints.json', session=None):
+        self.path = Path(path) if path else None
+        self.__session = session or requests
+        # Maps 'x,y' keys to dicts holding forecast and forecastHourly URLs
+        self.__gridpoints = dict()
+        self.__lock = Lock()
+        self.__load()
+
+    def resolve(self, location_coords):
+        """Returns the forecast URLs covering a location.
+
+        Args:
+            location_coords (dict): Coordinates with keys x and y.
+
+        Returns:
+            dict: Holds the daily (forecast) and hourly (forecastHourly)
+                forecast URLs.
+
+        Raises:
+            requests.exceptions.HTTPError: If weather.gov could not look up the
+                location.
+        """
+        key = self.__key(location_coords)
+        with self.__lock:
+            if key not in self.__gridpoints:
+                response = self.__session.get(
+                    POINTS_URL.format(**location_coords)
+                )
+                response.raise_for_status()
+                properties = response.json()['properties']
+                self.__gridpoints[key] = {
+                    'forecast': properties['forecast'],
+                    'forecastHourly': properties['forecastHourly'],
+                }
+                self.__save()
+            return self.__gridpoints[key]
+
+    def forecast_url(self, location_coords, hourly=False):
+        """Returns the URL of a location's daily or hourly forecast.
+
+        Args:
+            location_coords (dict): Coordinates with keys x and y.
+            hourly (bool): Whether to return the hourly forecast's URL.
+
+        Returns:
+            str: The forecast's URL.
+        """
+        urls = self.resolve(location_coords)
+        return urls['forecastHourly' if hourly else 'forecast']
+
+    def invalidate(self, location_coords):
+        """Forget a location's lookup, so it is looked up again next time.
+
+        Args:
+            location_coords (dict): Coordinates with keys x and y.
+        """
+        with self.__lock:
+            if self.__gridpoints.pop(self.__key(location_coords), None):
+                self.__save()
+
+    # Helpers #
+    @staticmethod
+    def __key(location_coords):
+        """Returns the key a location's lookup is stored under."""
+        return '{x},{y}'.format(**location_coords)
+
+    def __load(self):
+        """Read persisted lookups, if there are any."""
+        if not self.path or not self.path.is_file():
+            return
+        try:
+            with open(self.path, 'r') as stream:
+                self.__gridpoints = json.load(stream)
+        except ValueError:
+            # A corrupt file just means looking everything up again
+            self.__gridpoints = dict()
+
+    def __save(self):
+        """Persist my lookups. Must be called while holding my lock."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never corrupts it
+        temp_path = self.path.with_suffix('.part')
+        with open(temp_path, 'w') as stream:
+            json.dump(self.__gridpoints, stream)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,151 @@
+from threading import Lock, local
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class CountingPool:
+    """Mixin for urllib3's connection pools that counts, per thread, every
+    connection they open.
+
+    A request is made entirely on the thread that asked for it, so the
+    thread's count tells exactly how many connections that request opened,
+    no matter how many other threads are making requests at the same time.
+    """
+
+    opened = local()
+
+    @staticmethod
+    def reset():
+        """Start counting the current thread's connections from zero."""
+        CountingPool.opened.count = 0
+
+    @staticmethod
+    def count():
+        """Returns how many connections the current thread opened since it
+        last reset.
+        """
+        return getattr(CountingPool.opened, 'count', 0)
+
+    def _new_conn(self):
+        CountingPool.opened.count = CountingPool.count() + 1
+        return super()._new_conn()
+
+
+class CountingHTTPPool(CountingPool, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSPool(CountingPool, HTTPSConnectionPool):
+    pass
+
+
+class HttpClient:
+    """Shared HTTP client that every network call Xavier makes goes through.
+
+    Keeps connections alive in a pool per host, so only the first request to
+    a host pays for the TCP and TLS handshakes. Every request has connect and
+    read timeouts, so a hung server can only stall a command for so long. For
+    each host, counts requests, how many of them needed a new connection, and
+    their time-to-first-byte (how long until the response's headers arrived).
+
+    Hosts can be routed elsewhere with host_overrides, which lets tests and
+    benchmarks swap in a local stand-in server without changing any URLs.
+
+    Args:
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait between bytes of a response.
+        pool_size (int): Most connections to keep alive per host.
+        host_overrides (dict): Maps hosts (like 'api.weather.gov') to base
+            URLs (like 'http://127.0.0.1:8000') to send their requests to.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, pool_size=2,
+                 host_overrides=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.host_overrides = host_overrides or dict()
+
+        self.session = requests.Session()
+        self.__adapter = HTTPAdapter(
+            pool_connections=8, pool_maxsize=pool_size
+        )
+        # Count the connections each request opens as they are opened
+        self.__adapter.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPPool, 'https': CountingHTTPSPool,
+        }
+        self.session.mount('http://', self.__adapter)
+        self.session.mount('https://', self.__adapter)
+
+        # Maps hosts to their request stats
+        self.__stats = dict()
+        self.__lock = Lock()
+
+    def get(self, url, params=None, headers=None):
+        """Make a GET request.
+
+        Args:
+            url (str): URL to request.
+            params (dict): Query parameters to add to the URL.
+            headers (dict): Headers to send.
+
+        Returns:
+            requests.Response: The response.
+
+        Raises:
+            requests.exceptions.RequestException: If the request failed or
+                timed out.
+        """
+        host = urlsplit(url).netloc
+        url = self.__route(url)
+        CountingPool.reset()
+
+        response = self.session.get(
+            url, params=params, headers=headers, timeout=self.timeout
+        )
+
+        # The elapsed time stops as soon as the headers have been parsed
+        ttfb = response.elapsed.total_seconds()
+        with self.__lock:
+            stats = self.__stats.setdefault(host, {
+                'requests': 0, 'new_connections': 0,
+                'total_ttfb': 0.0, 'max_ttfb': 0.0,
+            })
+            stats['requests'] += 1
+            stats['new_connections'] += CountingPool.count()
+            stats['total_ttfb'] += ttfb
+            stats['max_ttfb'] = max(stats['max_ttfb'], ttfb)
+        return response
+
+    def get_stats(self):
+        """Returns a dict mapping each host to stats about its requests.
+
+        Each host's stats hold how many requests were made, how many needed a
+        new connection, how many reused one, and the average and longest
+        time-to-first-byte in seconds.
+        """
+        with self.__lock:
+            result = dict()
+            for host, stats in self.__stats.items():
+                result[host] = dict(stats)
+                result[host]['reused_connections'] = \
+                    stats['requests'] - stats['new_connections']
+                result[host]['avg_ttfb'] = \
+                    stats['total_ttfb'] / stats['requests']
+            return result
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+    # Helpers #
+    def __route(self, url):
+        """Returns url, sent to its host's override if it has one."""
+        parts = urlsplit(url)
+        override = self.host_overrides.get(parts.netloc)
+        if not override:
+            return url
+        target = urlsplit(override)
+        return urlunsplit(
+            (target.scheme, target.netloc) + tuple(parts[2:])
+        )
@@ -0,0 +1,185 @@
+from collections import deque
+from random import randint
+from threading import Condition, Thread
+from time import time
+import requests
+import toolbox
+
+SEARCH_URL = 'https://icanhazdadjoke.com/search'
+
+
+def clean_joke(text):
+    """Returns a joke ready to be spoken.
+
+    Replaces non-ascii characters (namely odd/malformed apostrophes) and turns
+    CR, LF, and tab characters into spaces.
+
+    Args:
+        text (str): Joke as the API returned it.
+
+    Returns:
+        str: The cleaned joke.
+    """
+    result = toolbox.repair_response(text)
+    return result.replace('\r\n', ' ').replace('\n', ' ').replace('\t', ' ')
+
+
+class JokeReservoir:
+    """Bounded buffer of dad jokes pulled in bulk from icanhazdadjoke.com.
+
+    Rather than fetching one joke per request, pulls whole pages of jokes from
+    the site's search endpoint, cleaning each one once as it arrives. Jokes are
+    remembered by ID once told, so they are not repeated until seen_days have
+    passed. Whenever the buffer drops below low_water jokes, a background
+    thread refills it, and it also hands the next few jokes to warm (if given)
+    so their speech is synthesized before they are asked for.
+
+    Args:
+        capacity (int): Most jokes to hold at once.
+        low_water (int): Refill once I hold fewer jokes than this.
+        page_size (int): Jokes to ask for per request (the API allows 30).
+        seen_days (float): Days before a told joke may be told again.
+        warm (callable): Called with each of the next few jokes, such as to
+            synthesize them. Failures are ignored. May be None.
+        num_warm (int): How many of the next jokes to warm.
+        session (HttpClient): What to make requests with, such as the Brain's
+            HttpClient. Defaults to the requests module itself.
+    """
+
+    def __init__(self, capacity=60, low_water=15, page_size=30, seen_days=30,
+                 warm=None, num_warm=3, session=None):
+        self.capacity = capacity
+        self.low_water = low_water
+        self.page_size = page_size
+        self.seen_seconds = seen_days * 24 * 60 * 60
+        self.warm = warm
+        self.num_warm = num_warm
+        self.__session = session or requests
+
+        # Cleaned (id, joke) pairs, next to be told first
+        self.__jokes = deque()
+        # Maps IDs of jokes I told (or hold) to when I told them
+        self.__seen = dict()
+        # IDs of the jokes already handed to warm
+        self.__warmed = set()
+        # Learned from the first page; lets me pick pages at random
+        self.__total_pages = 1
+
+        self.__condition = Condition()
+        self.__wanted = False
+        self.__thread = None
+
+    def take(self):
+        """Returns the next joke, or None if I have none right now.
+
+        Never touches the network; asks the background thread to refill and
+        warm as needed.
+        """
+        with self.__condition:
+            joke = None
+            if self.__jokes:
+                joke_id, joke = self.__jokes.popleft()
+                self.__seen[joke_id] = time()
+                self.__warmed.discard(joke_id)
+        self.request_refill()
+        return joke
+
+    def request_refill(self):
+        """Wake the background thread to refill and warm, if needed."""
+        with self.__condition:
+            if self.__thread is None:
+                self.__thread = Thread(
+                    target=self.__run, name='xavier-jokes', daemon=True
+                )
+                self.__thread.start()
+            self.__wanted = True
+            self.__condition.notify_all()
+
+    def refill(self):
+        """Fetch pages of jokes until I am full or have tried a few times.
+
+        Returns:
+            int: How many new jokes I added.
+        """
+        self.__expire_seen()
+        added = 0
+        # Give up eventually, in case every joke I find has been told lately
+        for _ in range(3):
+            if len(self) >= self.capacity:
+                break
+            added += self.__add_page(randint(1, self.__total_pages))
+        return added
+
+    def __len__(self):
+        with self.__condition:
+            return len(self.__jokes)
+
+    # Helpers #
+    def __add_page(self, page):
+        """Fetch a page of jokes and add the unseen ones.
+
+        Returns:
+            int: How many jokes were added.
+        """
+        response = self.__session.get(
+            SEARCH_URL,
+            params={'page': page, 'limit': self.page_size},
+            headers={'Accept': 'application/json'}
+        )
+        body = response.json()
+        self.__total_pages = max(1, body.get('total_pages', 1))
+
+        added = 0
+        with self.__condition:
+            for result in body['results']:
+                if len(self.__jokes) >= self.capacity:
+                    break
+                if result['id'] in self.__seen:
+                    continue
+                # Mark held jokes as seen so a later page cannot duplicate them
+                self.__seen[result['id']] = time()
+                self.__jokes.append((result['id'], clean_joke(result['joke'])))
+                added += 1
+        return added
+
+    def __expire_seen(self):
+        """Forget told jokes that are old enough to be told again."""
+        cutoff = time() - self.seen_seconds
+        with self.__condition:
+            held = {joke_id for joke_id, _ in self.__jokes}
+            self.__seen = {
+                joke_id: when for joke_id, when in self.__seen.items()
+                if when >= cutoff or joke_id in held
+            }
+
+    def __warm_next(self):
+        """Hand the next few jokes that have not been warmed yet to warm."""
+        if not self.warm:
+            return
+        with self.__condition:
+            upcoming = list(self.__jokes)[:self.num_warm]
+        for joke_id, joke in upcoming:
+            if joke_id in self.__warmed:
+                continue
+            try:
+                self.warm(joke)
+            except Exception:
+                # Warming is only an optimization
+                continue
+            self.__warmed.add(joke_id)
+
+    def __run(self):
+        """Refill and warm whenever asked to."""
+        while True:
+            with self.__condition:
+                while not self.__wanted:
+                    self.__condition.wait()
+                self.__wanted = False
+            try:
+                if len(self) < self.low_water:
+                    self.refill()
+            except (requests.exceptions.RequestException, KeyError,
+                    ValueError):
+                # Try again next time; get_joke can still fetch one directly
+                pass
+            self.__warm_next()
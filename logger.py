@@ -1,4 +1,234 @@
+import gzip
+import json
+import os
+import re
+import shutil
 from datetime import datetime
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+from time import monotonic, time
+from enums import OverflowPolicy, LogFormat
+
+
+def log_segments(path):
+    """Returns the paths of every segment of a log file, oldest first.
+
+    Rotated segments (see RotatingLogFile) come first, compressed or not,
+    followed by the current segment if it exists.
+
+    Args:
+        path (str): Path of the log file.
+
+    Returns:
+        list: Paths of the segments.
+    """
+    directory, name = os.path.split(path)
+    # Rotated segments are named after when they were rotated
+    pattern = re.compile(re.escape(name) + r'\.(\d{8}-\d{6}-\d{6})(\.gz)?$')
+    archives = dict()
+    try:
+        entries = os.listdir(directory or '.')
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        match = pattern.match(entry)
+        # Prefer the compressed copy while both exist
+        if match and (match.group(2) or match.group(1) not in archives):
+            archives[match.group(1)] = os.path.join(directory, entry)
+    segments = [archives[stamp] for stamp in sorted(archives)]
+    if os.path.isfile(path):
+        segments.append(path)
+    return segments
+
+
+def json_line(**fields):
+    """Returns fields as a line of JSON, as written in JSON_LINES format.
+
+    Anything that isn't JSON already (like datetimes) is written as a string.
+    """
+    return json.dumps(fields, default=str) + '\n'
+
+
+def open_segment(path):
+    """Returns a text stream reading a log segment, compressed or not."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    return open(path, 'r')
+
+
+class RotatingLogFile:
+    """A log file that is split into segments by size or age.
+
+    Writes are appended to the file at path until it holds at least max_bytes,
+    or was started at least max_age seconds ago (a segment left by an earlier
+    run counts from when it was last written). Then, before the next write,
+    the file is renamed after the time it was rotated, and a new one is
+    started in its place. Rotated segments are gzipped one at a time, in the
+    order they were rotated, on a background thread, and only the newest
+    backups of them are kept. Segments waiting to be gzipped are never
+    deleted, so for a moment more than backups may be kept.
+
+    Segments only ever end between writes, so no record is split. If a segment
+    ends in the middle of a Logger session, it is closed with a continuation
+    footer and the next one starts with a continuation header, so that every
+    segment is bracketed like a session is.
+
+    Args:
+        path (str): Path of the log file. Created if it doesn't exist.
+            Appended to if it already exists.
+        max_bytes (int): Size at which a segment is rotated, or None.
+        max_age (float): Age in seconds at which a segment is rotated, or None.
+        backups (int): Most rotated segments to keep.
+        structured (bool): Whether to write continuation headers and footers
+            as JSON lines.
+    """
+
+    def __init__(self, path, max_bytes=None, max_age=None, backups=5,
+                 structured=False):
+        self.path = path
+        self.structured = structured
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        # Rotated segments waiting to be compressed, in order, and (guarded
+        #   by the lock) the set of them, so they aren't deleted meanwhile
+        self.__archives = Queue()
+        self.__compressing = set()
+        self.__lock = Lock()
+        self.__compressor = None
+        self.__open()
+        if self.__size:
+            self.__started = os.path.getmtime(path)
+
+    def write(self, text):
+        """Write text to the current segment, rotating it first if it is due.
+
+        Args:
+            text (str): Text to write.
+        """
+        if self.__due():
+            self.__rotate()
+        self.__write(text)
+        self.__continuing = True
+
+    def flush(self):
+        """Flush the current segment."""
+        self.__stream.flush()
+
+    def close(self):
+        """Close the current segment and wait for rotated ones to compress."""
+        self.__stream.close()
+        if self.__compressor:
+            self.__archives.put(None)
+            self.__compressor.join()
+            self.__compressor = None
+
+    # Helpers #
+    def __open(self):
+        """Start writing to the file at my path."""
+        self.__stream = open(self.path, 'a')
+        self.__size = self.__stream.tell()
+        self.__started = time()
+        # Whether a session is in the middle of this segment
+        self.__continuing = False
+
+    def __write(self, text):
+        """Write text to the current segment, keeping track of its size."""
+        self.__stream.write(text)
+        self.__size += len(text.encode('utf-8'))
+
+    def __due(self):
+        """Returns whether the current segment should be rotated."""
+        if not self.__size:
+            return False
+        if self.max_bytes is not None and self.__size >= self.max_bytes:
+            return True
+        return (
+            self.max_age is not None and
+            time() - self.__started >= self.max_age
+        )
+
+    def __rotate(self):
+        """End the current segment, start a new one, and compress the old."""
+        continuing = self.__continuing
+        if continuing and self.structured:
+            self.__write(json_line(event='segment_end', time=datetime.now()))
+        elif continuing:
+            self.__write(
+                'Logger continued in next segment on {}.\n'.format(
+                    datetime.now()
+                ) + '-----------------\n'
+            )
+        self.__stream.close()
+        archive = '{}.{}'.format(
+            self.path, datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        )
+        os.replace(self.path, archive)
+
+        self.__open()
+        if continuing and self.structured:
+            self.__write(json_line(event='segment_start', time=datetime.now()))
+            self.__continuing = True
+        elif continuing:
+            self.__write(
+                '\n-----------------\n'
+                'Logger continued from previous segment on {}.\n'.format(
+                    datetime.now()
+                )
+            )
+            self.__continuing = True
+
+        with self.__lock:
+            self.__compressing.add(archive)
+        self.__archives.put(archive)
+        if self.__compressor is None:
+            # The thread must not hold on to me, or I would never be deleted
+            self.__compressor = Thread(
+                target=self.__compress_all,
+                args=(self.__archives, self.__compressing, self.__lock,
+                      self.path, self.backups),
+                name='xavier-log-compressor', daemon=True
+            )
+            self.__compressor.start()
+
+    @staticmethod
+    def __compress_all(archives, compressing, lock, path, backups):
+        """Gzip each rotated segment queued in archives, until it's None,
+        deleting segments beyond backups after each.
+        """
+        for archive in iter(archives.get, None):
+            try:
+                RotatingLogFile.__compress(archive)
+            except OSError:
+                # Keep it uncompressed rather than stop compressing the rest
+                pass
+            with lock:
+                compressing.discard(archive)
+                waiting = set(compressing)
+
+            # Everything but the current segment is a rotated one
+            rotated = [
+                segment for segment in log_segments(path) if segment != path
+            ]
+            for segment in rotated[:max(0, len(rotated) - backups)]:
+                if segment in waiting:
+                    continue
+                try:
+                    os.remove(segment)
+                except FileNotFoundError:
+                    # Someone else got to it first
+                    pass
+
+    @staticmethod
+    def __compress(archive):
+        """Gzip a rotated segment, replacing it."""
+        # Compress to a temporary file first so a crash never corrupts it
+        temp_path = archive + '.gz.part'
+        with open(archive, 'rb') as source:
+            with gzip.open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.replace(temp_path, archive + '.gz')
+        os.remove(archive)
 
 
 class Logger:
@@ -18,22 +248,65 @@ class Logger:
     When an instance is deleted, it reports how many commands it recorded in its
     lifetime and closes its output stream, if it made one.
 
+    A log file may be rotated by size or age, in which case older segments
+    are gzipped and only the newest backups are kept. A session that spans
+    several segments keeps its header in the first and its footer (with the
+    number of commands for the whole session) in the last.
+
+    Records may be written as JSON lines instead of text (see LogFormat),
+    which also record how long each command took, for tools like logquery.
+    Sessions, and their segments, start and stop with event records.
+
+    If asynchronous, logging a command only queues a small record. A writer
+    thread formats the records and writes them in batches of up to batch_size,
+    flushing at least every flush_interval seconds, so a command never waits
+    on the SD card. If the queue fills up, overflow decides what happens (see
+    OverflowPolicy); records that had to be discarded are counted in dropped.
+    Records the writer failed to write (such as once the SD card is full) are
+    counted in failed, and the writer carries on with the next batch.
+    Everything still queued is written when the instance is deleted.
+
     Args:
-        filename (str): Name of the file to log to WITH extension. Creates it if
-            it doesn't exist. Appends to it if it already exists. All log files
-            are written to the "logs" directory. Logs to the console if no file
-            is specified.
+        filename (str): Name of the file to log to WITH extension. Creates it
+            if it doesn't exist. Appends to it if it already exists. All log
+            files are written to the "logs" directory. Logs to the console if
+            no file is specified.
+        max_bytes (int): Size at which to rotate the log file, or None.
+        max_age (float): Age in seconds at which to rotate the log file, or
+            None. See RotatingLogFile.
+        backups (int): Most rotated (gzipped) log files to keep.
+        log_format (int): LogFormat to write records in. Defaults to
+            JSON_LINES if filename ends with .jsonl, otherwise TEXT.
+        asynchronous (bool): Whether to write records on a writer thread.
+        max_queued (int): Most records to queue before overflowing.
+        flush_interval (float): Most seconds a record waits to be written.
+        batch_size (int): Most records to write at once.
+        overflow (int): OverflowPolicy to follow when the queue is full.
     """
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, max_bytes=None, max_age=None, backups=5,
+                 log_format=None, asynchronous=False, max_queued=1024,
+                 flush_interval=1.0, batch_size=64,
+                 overflow=OverflowPolicy.BLOCK):
+        if log_format is None:
+            log_format = LogFormat.TEXT
+            if filename and filename.endswith('.jsonl'):
+                log_format = LogFormat.JSON_LINES
+        self.structured = log_format == LogFormat.JSON_LINES
+
         # If I was given a filename, create a stream to the file
         if filename:
-            # Hold the output stream
-            self.outstream = open('logs/' + filename, 'a')
+            # Remember where I log to, so others can read my history
+            self.path = 'logs/' + filename
+            # Hold the output stream, split into segments if asked to
+            self.outstream = RotatingLogFile(
+                self.path, max_bytes, max_age, backups, self.structured
+            )
             # Hold the callable to log with
             self.writer = self.outstream.write
         # Otherwise, just log to console
         else:
+            self.path = None
             # We do not need a new output stream
             self.outstream = None
             # Hold the callable to log with
@@ -41,17 +314,65 @@ class Logger:
 
         # Remembers how many commands have been run since I've started
         self.num_commands = 0
+        # Guards the count, dropping the oldest record, and writing, against
+        #   other commands
+        self.__lock = Lock()
 
         # Write beginning log information
-        to_write = '\n-----------------\n' \
-            'Logger initialized on {}.\n'.format(datetime.now())
+        if self.structured:
+            to_write = json_line(event='start', time=datetime.now())
+        else:
+            to_write = '\n-----------------\n' \
+                'Logger initialized on {}.\n'.format(datetime.now())
         self.writer(to_write)
 
+        # Remembers how many records were discarded because I was overwhelmed
+        self.dropped = 0
+        # Counts the records my writer failed to write, shared with it
+        self.__failed = [0]
+        self.overflow = overflow
+        self.__queue = None
+        self.__writer_thread = None
+        if asynchronous:
+            self.__queue = Queue(max_queued)
+            # The thread must not hold on to me, or I would never be deleted
+            self.__writer_thread = Thread(
+                target=self.__write_batches,
+                args=(self.__queue, self.writer, self.outstream,
+                      self.structured, batch_size, flush_interval,
+                      self.__failed),
+                name='xavier-logger', daemon=True
+            )
+            self.__writer_thread.start()
+
+    @property
+    def failed(self):
+        """int: How many records my writer thread failed to write."""
+        return self.__failed[0]
+
     def __del__(self):
-        """Append ending statement and close the file, if I opened one."""
-        to_write = 'Logger closed on {}, ran {} commands.\n'.format(
-            datetime.now(), self.num_commands
-        ) + '-----------------\n'
+        """Append ending statement and close the file, if I opened one.
+
+        If asynchronous, waits for every queued record to be written first.
+        """
+        if self.__writer_thread:
+            # Always wait for room; the end of the queue must never be dropped.
+            #   Unless the writer died, since then nothing will make room
+            while self.__writer_thread.is_alive():
+                try:
+                    self.__queue.put(None, timeout=0.1)
+                    break
+                except Full:
+                    pass
+            self.__writer_thread.join()
+        if self.structured:
+            to_write = json_line(
+                event='stop', time=datetime.now(), commands=self.num_commands
+            )
+        else:
+            to_write = 'Logger closed on {}, ran {} commands.\n'.format(
+                datetime.now(), self.num_commands
+            ) + '-----------------\n'
         self.writer(to_write)
         if self.outstream:
             self.outstream.close()
@@ -69,31 +390,131 @@ class Logger:
             command, stacktrace
         ).replace('\n', '\n    ') + '\n'
 
-    # Log Levels #
-    def log_info(self, command, output):
-        """Log a successful command and its generated output."""
-        to_write = '[INFO : {}] Ran {} command, output: {}\n'.format(
-            datetime.now(), command, output
+    @staticmethod
+    def __format(record, structured):
+        """Helper method to turn a record into the text to write.
+
+        Args:
+            record (tuple): Log level, when it happened, the command's name,
+                its output or stacktrace, and how many seconds it took (or
+                None if unknown).
+            structured (bool): Whether to format it as a JSON line.
+
+        Returns:
+            str: The formatted record.
+        """
+        level, when, command, detail, duration = record
+        if structured:
+            return json_line(
+                time=when, level=level, command=command,
+                duration=duration,
+                **{'output' if level == 'INFO' else 'stacktrace': detail}
+            )
+        if level == 'INFO':
+            return '[INFO : {}] Ran {} command, output: {}\n'.format(
+                when, command, detail
+            )
+        return '[{:<5}: {}] {}'.format(
+            level, when, Logger.__format_issue(command, detail)
         )
-        self.writer(to_write)
-        self.num_commands += 1
 
-    def log_warn(self, command, stacktrace):
+    def __log(self, level, command, detail, duration):
+        """Write a record right away, or queue it if I am asynchronous."""
+        record = (level, datetime.now(), command, detail, duration)
+        if self.__queue is None:
+            with self.__lock:
+                self.writer(self.__format(record, self.structured))
+        elif self.overflow == OverflowPolicy.BLOCK:
+            self.__queue.put(record)
+        elif self.overflow == OverflowPolicy.DROP_OLDEST:
+            with self.__lock:
+                while True:
+                    try:
+                        self.__queue.put_nowait(record)
+                        break
+                    except Full:
+                        pass
+                    try:
+                        self.__queue.get_nowait()
+                        self.dropped += 1
+                    except Empty:
+                        # The writer made room in the meantime
+                        pass
+        else:
+            try:
+                self.__queue.put_nowait(record)
+            except Full:
+                with self.__lock:
+                    self.dropped += 1
+
+    @staticmethod
+    def __write_batches(queue, writer, outstream, structured, batch_size,
+                        flush_interval, failed):
+        """Write queued records in batches until the queue ends with None.
+
+        A batch is written once it holds batch_size records, or once its
+        oldest record has waited flush_interval seconds. A batch that fails
+        to be written is counted in failed[0] and given up on, so the queue
+        keeps draining.
+        """
+        batch = []
+        flush_at = None
+        stopping = False
+        while not stopping:
+            timeout = None
+            if flush_at is not None:
+                timeout = max(0.0, flush_at - monotonic())
+            try:
+                record = queue.get(timeout=timeout)
+            except Empty:
+                # The oldest record has waited long enough
+                pass
+            else:
+                stopping = record is None
+                if not stopping:
+                    if not batch:
+                        flush_at = monotonic() + flush_interval
+                    batch.append(Logger.__format(record, structured))
+                    if len(batch) < batch_size:
+                        continue
+
+            try:
+                if outstream:
+                    writer(''.join(batch))
+                    outstream.flush()
+                else:
+                    for to_write in batch:
+                        writer(to_write)
+            except Exception:
+                failed[0] += len(batch)
+            batch = []
+            flush_at = None
+
+    # Log Levels #
+    def log_info(self, command, output, duration=None):
+        """Log a successful command and its generated output.
+
+        Args:
+            command (str): Name of the command.
+            output (str): What the command returned.
+            duration (float): Seconds the command took, if known. Only written
+                in JSON_LINES format.
+        """
+        self.__log('INFO', command, output, duration)
+        with self.__lock:
+            self.num_commands += 1
+
+    def log_warn(self, command, stacktrace, duration=None):
         """Log an unsuccessful command and its exception's stacktrace.
 
-        For use when the exception was recoverable.
+        For use when the exception was recoverable. See log_info for the args.
         """
-        to_write = '[WARN : {}] {}'.format(
-            datetime.now(), self.__format_issue(command, stacktrace)
-        )
-        self.writer(to_write)
+        self.__log('WARN', command, stacktrace, duration)
 
-    def log_error(self, command, stacktrace):
+    def log_error(self, command, stacktrace, duration=None):
         """Log an unsuccessful command and its exception's stacktrace.
 
-        For use when the exception was not recoverable.
+        For use when the exception was not recoverable. See log_info for the
+        args.
         """
-        to_write = '[ERROR: {}] {}'.format(
-            datetime.now(), self.__format_issue(command, stacktrace)
-        )
-        self.writer(to_write)
+        self.__log('ERROR', command, stacktrace, duration)
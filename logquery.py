@@ -0,0 +1,357 @@
+"""Answers questions about Xavier's command history from its JSON Lines logs.
+
+Run from the root directory to print stats for every command, for example:
+    python logquery.py logs/xavier.jsonl --since 2018-11-01
+"""
+import argparse
+import gzip
+import json
+import math
+import mmap
+import os
+import struct
+from datetime import date
+from logger import log_segments
+
+# Levels a record may have, in the order they are stored in the index
+LEVELS = ('INFO', 'WARN', 'ERROR')
+# Levels that mean a command failed
+FAILED_LEVELS = ('WARN', 'ERROR')
+# Each indexed record: its offset in the segment, its day (as an ordinal),
+#   its command's number, its level's number, and its duration (NaN if
+#   unknown)
+ROW = struct.Struct('<QiHBd')
+
+
+def percentile(values, percent):
+    """Returns a percentile of values using the nearest rank, or None.
+
+    Args:
+        values (list): Numbers to take the percentile of.
+        percent (float): Percentile to return, from 0 to 100.
+
+    Returns:
+        float: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[round(percent / 100 * (len(ordered) - 1))]
+
+
+class LogQuery:
+    """Counts, error rates, and latencies of commands from JSON Lines logs.
+
+    Keeps a sidecar index directory next to the log, with an index for each
+    of the log's segments (see RotatingLogFile). Each index is a file of
+    fixed-size rows, one per record, holding where the record starts, its day,
+    command, level, and duration, plus a small metadata file remembering how
+    much of the segment was indexed and which rows belong to each day.
+
+    Refreshing only reads what was appended to a segment since the last
+    refresh, through a memory map, and only appends rows; rotated segments
+    are only ever indexed once, since they never change. Queries only read
+    the rows of the days they ask about (again through a memory map), and
+    full records are read by jumping to their offsets, so they stay fast no
+    matter how long the history grows.
+
+    Args:
+        path (str): Path of the log file, as written by a Logger in
+            JSON_LINES format (like logs/xavier.jsonl).
+        index_path (str): Directory to keep the index in. Defaults to the
+            log's path with .idx appended.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + '.idx'
+        os.makedirs(self.index_path, exist_ok=True)
+
+    def refresh(self):
+        """Index everything logged since my last refresh."""
+        names = set()
+        for segment in log_segments(self.path):
+            name = os.path.basename(segment)
+            names.add(name)
+            stat = os.stat(segment)
+            meta = self.__load_meta(name)
+            # A segment that was replaced or shrank has to be indexed again
+            if (meta is None or meta['inode'] != stat.st_ino or
+                    meta['size'] > stat.st_size):
+                meta = {
+                    'inode': stat.st_ino, 'size': 0, 'rows': 0,
+                    'commands': [], 'days': dict(), 'last_day': None,
+                }
+                # Nothing may be left of the old index, even if there is
+                #   nothing new to index yet
+                for path in (self.__meta_path(name), self.__rows_path(name)):
+                    if os.path.isfile(path):
+                        os.remove(path)
+            if meta['size'] < stat.st_size:
+                self.__index(segment, meta, stat.st_size)
+
+        # Forget segments that were deleted for being too old
+        for entry in os.listdir(self.index_path):
+            if os.path.splitext(entry)[0] not in names:
+                os.remove(os.path.join(self.index_path, entry))
+
+    def stats(self, command=None, since=None, until=None):
+        """Returns how each command has been doing, from my index alone.
+
+        Args:
+            command (str): Only include this command, if given.
+            since (str): First day to include, as YYYY-MM-DD, if given.
+            until (str): Last day to include, as YYYY-MM-DD, if given.
+
+        Returns:
+            dict: Maps command names to dicts holding how many times each ran
+                (count), how many of those failed (errors), the fraction that
+                failed (error_rate), and the median (p50) and 95th percentile
+                (p95) seconds it took, or None if never timed.
+        """
+        failed = {LEVELS.index(level) for level in FAILED_LEVELS}
+        runs = dict()
+        for _, name, _, level, duration in self.__rows(command, since, until):
+            counts = runs.setdefault(name, [0, 0, []])
+            counts[0] += 1
+            counts[1] += level in failed
+            if not math.isnan(duration):
+                counts[2].append(duration)
+
+        return {
+            name: {
+                'count': count,
+                'errors': errors,
+                'error_rate': errors / count,
+                'p50': percentile(durations, 50),
+                'p95': percentile(durations, 95),
+            }
+            for name, (count, errors, durations) in runs.items()
+        }
+
+    def records(self, command, since=None, until=None):
+        """Returns the full records of a command, oldest first.
+
+        Only reads the records themselves, jumping straight to them. Refreshes
+        first, since the offsets are only good for segments as they were
+        indexed; a segment that is replaced before it's read (by rotating it
+        at that very moment) is skipped.
+
+        Args:
+            command (str): Name of the command.
+            since (str): First day to include, as YYYY-MM-DD, if given.
+            until (str): Last day to include, as YYYY-MM-DD, if given.
+
+        Returns:
+            list: Dicts of each record, as the Logger wrote them.
+        """
+        self.refresh()
+        records = []
+        for segment in log_segments(self.path):
+            name = os.path.basename(segment)
+            meta = self.__load_meta(name)
+            offsets = [
+                row[0] for row in self.__segment_rows(
+                    name, command, since, until, meta
+                )
+            ]
+            if not offsets:
+                continue
+            try:
+                stream = open(segment, 'rb')
+            except FileNotFoundError:
+                # It was deleted for being too old while I got to it
+                continue
+            with stream:
+                stat = os.fstat(stream.fileno())
+                if (stat.st_ino != meta['inode'] or
+                        stat.st_size < meta['size']):
+                    continue
+                if segment.endswith('.gz'):
+                    with gzip.GzipFile(fileobj=stream) as data:
+                        records.extend(self.__read(data.read(), offsets))
+                else:
+                    with mmap.mmap(
+                        stream.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as data:
+                        records.extend(self.__read(data, offsets))
+        return records
+
+    # Helpers #
+    def __meta_path(self, name):
+        """Returns the path of a segment's metadata file."""
+        return os.path.join(self.index_path, name + '.meta')
+
+    def __rows_path(self, name):
+        """Returns the path of a segment's rows file."""
+        return os.path.join(self.index_path, name + '.rows')
+
+    def __load_meta(self, name):
+        """Returns a segment's metadata, or None if it isn't indexed."""
+        try:
+            with open(self.__meta_path(name), 'r') as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            # A missing or corrupt index just means indexing it again
+            return None
+
+    def __index(self, segment, meta, size):
+        """Index what was appended to a segment, then save its metadata."""
+        name = os.path.basename(segment)
+        rows_path = self.__rows_path(name)
+        mode = 'r+b' if meta['rows'] and os.path.isfile(rows_path) else 'wb'
+        with open(rows_path, mode) as rows:
+            # Drop rows from a refresh that crashed before saving its metadata
+            rows.truncate(meta['rows'] * ROW.size)
+            rows.seek(0, os.SEEK_END)
+            if segment.endswith('.gz'):
+                # Rotated segments never change, so index them all at once
+                with gzip.open(segment, 'rb') as stream:
+                    self.__scan(stream.read(), meta, rows)
+                meta['size'] = size
+            else:
+                with open(segment, 'rb') as stream:
+                    with mmap.mmap(
+                        stream.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as data:
+                        meta['size'] = self.__scan(data, meta, rows)
+
+        # Write to a temporary file first so a crash never corrupts it
+        temp_path = self.__meta_path(name) + '.part'
+        with open(temp_path, 'w') as stream:
+            json.dump(meta, stream)
+        os.replace(temp_path, self.__meta_path(name))
+
+    @staticmethod
+    def __scan(data, meta, rows):
+        """Index each complete line of data after what meta has indexed.
+
+        Args:
+            data (bytes or mmap): The segment's (uncompressed) contents.
+            meta (dict): The segment's metadata, updated as lines are indexed.
+            rows (file): The segment's rows file, to append rows to.
+
+        Returns:
+            int: Offset just past the last complete line, where the next scan
+                should start.
+        """
+        commands = {name: number for number, name in
+                    enumerate(meta['commands'])}
+        position = meta['size']
+        while True:
+            end = data.find(b'\n', position)
+            # A line without its newline is still being written
+            if end == -1:
+                return position
+            if data[position:position + 1] == b'{':
+                try:
+                    record = json.loads(data[position:end])
+                    command = record.get('command')
+                    if command is not None:
+                        day = record['time'][:10]
+                        duration = record.get('duration')
+                        row = ROW.pack(
+                            position, date.fromisoformat(day).toordinal(),
+                            commands.get(command, len(meta['commands'])),
+                            LEVELS.index(record['level']),
+                            math.nan if duration is None else duration
+                        )
+                except (KeyError, TypeError, ValueError, struct.error):
+                    # Skip lines that aren't JSON, or records missing what I
+                    #   need, rather than give up on the rest
+                    command = None
+                if command is not None:
+                    if command not in commands:
+                        commands[command] = len(meta['commands'])
+                        meta['commands'].append(command)
+                    rows.write(row)
+
+                    # Days are kept as runs of consecutive rows, which is
+                    #   usually a single run per day
+                    runs = meta['days'].setdefault(day, [])
+                    if meta['last_day'] == day:
+                        runs[-1][1] += 1
+                    else:
+                        runs.append([meta['rows'], meta['rows'] + 1])
+                    meta['last_day'] = day
+                    meta['rows'] += 1
+            position = end + 1
+
+    def __segment_rows(self, name, command, since, until, meta=None):
+        """Yield a segment's rows within range, resolving command names.
+
+        Yields tuples of offset, command name, day ordinal, level number, and
+        duration. Loads the segment's metadata unless given.
+        """
+        if meta is None:
+            meta = self.__load_meta(name)
+        if meta is None or not meta['rows']:
+            return
+        wanted = None
+        if command is not None:
+            if command not in meta['commands']:
+                return
+            wanted = meta['commands'].index(command)
+        runs = sorted(
+            run for day, day_runs in meta['days'].items()
+            if (since is None or day >= since) and
+            (until is None or day <= until)
+            for run in day_runs
+        )
+        if not runs:
+            return
+        with open(self.__rows_path(name), 'rb') as stream:
+            with mmap.mmap(
+                stream.fileno(), 0, access=mmap.ACCESS_READ
+            ) as data:
+                for start, end in runs:
+                    for offset, day, number, level, duration in (
+                        ROW.iter_unpack(data[start * ROW.size:end * ROW.size])
+                    ):
+                        if wanted is None or number == wanted:
+                            yield (offset, meta['commands'][number], day,
+                                   level, duration)
+
+    def __rows(self, command, since, until):
+        """Yield the rows within range from every segment."""
+        for segment in log_segments(self.path):
+            yield from self.__segment_rows(
+                os.path.basename(segment), command, since, until
+            )
+
+    @staticmethod
+    def __read(data, offsets):
+        """Returns the records starting at each offset of data."""
+        records = []
+        for offset in offsets:
+            end = data.find(b'\n', offset)
+            records.append(json.loads(data[offset:end]))
+        return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print stats for each command in Xavier's JSON Lines log."
+    )
+    parser.add_argument('path', help='log file, like logs/xavier.jsonl')
+    parser.add_argument('--command', help='only this command')
+    parser.add_argument('--since', help='first day to include (YYYY-MM-DD)')
+    parser.add_argument('--until', help='last day to include (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    query = LogQuery(args.path)
+    query.refresh()
+    stats = query.stats(args.command, args.since, args.until)
+    print('{:<24} {:>7} {:>7} {:>7} {:>8} {:>8}'.format(
+        'command', 'runs', 'errors', 'rate', 'p50', 'p95'
+    ))
+    for name, stat in sorted(stats.items()):
+        print('{:<24} {:>7} {:>7} {:>6.1%} {:>8} {:>8}'.format(
+            name, stat['count'], stat['errors'], stat['error_rate'],
+            *('-' if stat[p] is None else '{:.3f}s'.format(stat[p])
+              for p in ('p50', 'p95'))
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
+from time import monotonic
+# Count everything from here on as starting up, including imports
+started_at = monotonic()
+
 import json
-from core import Body
+from startup import Startup
 
+startup = Startup(started_at, 'logs/startup.json')
+with startup.step('imports'):
+    from core import Body
 
 with open('settings.json') as f:
     settings = json.load(f)
@@ -10,7 +17,21 @@ location_coords = settings.get('location_coords')
 logfile = settings.get('logfile')
 # Use indexing for pin mapping since we need it (may throw a KeyError)
 pin_mapping = settings['pin_mapping']
-body = Body(pin_mapping, location_coords, logfile)
+# Print where startup's time went once listening, if asked to
+startup.echo = settings.get('startup_report', False)
+# Profiling is off unless asked for
+body = Body(
+    pin_mapping, location_coords, logfile,
+    profile_every=settings.get('profile_every', 0),
+    profile_threshold=settings.get('profile_threshold'),
+    startup=startup,
+    # Detect in this process unless asked to spread detection over others
+    detector_shards=settings.get('detector_shards', 0),
+    # Run the hotword models on everything heard unless asked to gate them
+    voice_gate=settings.get('voice_gate', False),
+    # Only run commands that were heard unless asked to take them over HTTP
+    command_port=settings.get('command_port')
+)
 
 # Control will be given to the body until it sees an interrupt signal
 body.start()
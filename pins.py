@@ -0,0 +1,204 @@
+from threading import Condition, Thread
+from time import monotonic
+
+
+class PinManager:
+    """Owns the GPIO output pins, so nothing else ever waits on them.
+
+    Commands only post what a pin should do and return right away; a timer
+    thread does the writing. Each pin has a state (see set, toggle, and
+    hold), remembered here so it never has to be read back from the pin, and
+    may have an effect (see blink and pulse) playing over it, after which it
+    goes back to its state.
+
+    Whenever something is posted or an effect's next step is due, the
+    thread works out what every pin should be and writes only the pins that
+    changed, all at once. Posts that come faster than that are batched: a pin
+    flipped twice in between is never written at all.
+
+    Args:
+        gpio (module): RPi.GPIO (or a stand-in), with pins already set up as
+            outputs.
+        pins (list): Numbers of the pins to manage.
+        min_hold (float): Fewest seconds a held pin stays on for, so even
+            commands that finish at once visibly light it.
+    """
+
+    def __init__(self, gpio, pins, min_hold=0.05):
+        self.gpio = gpio
+        self.min_hold = min_hold
+        # Read each pin once; after that, I know what it is
+        self.__states = {pin: bool(gpio.input(pin)) for pin in pins}
+        self.__written = dict(self.__states)
+        # How many are holding each pin on
+        self.__holds = {pin: 0 for pin in pins}
+        # Maps pins to their effect: the steps left (as an iterator of
+        #   (value, seconds)), the current value, and when the next step is
+        #   due
+        self.__effects = dict()
+        self.__changed = Condition()
+        # Posts made, how many of them have been written, and whether I'm
+        #   closing
+        self.__progress = {'posted': 0, 'applied': 0, 'closed': False}
+        # Nothing the thread runs refers to me, so I can be deleted
+        self.__thread = Thread(
+            target=PinManager.__run, name='xavier-pins', daemon=True,
+            args=(gpio, self.__states, self.__written, self.__effects,
+                  self.__changed, self.__progress)
+        )
+        self.__thread.start()
+
+    def get(self, pin):
+        """Returns the state of a pin (ignoring any effect playing on it)."""
+        with self.__changed:
+            return self.__states[pin]
+
+    def set(self, pin, value):
+        """Post a pin's new state."""
+        with self.__changed:
+            self.__states[pin] = bool(value)
+            self.__post()
+
+    def toggle(self, pin):
+        """Post flipping a pin's state.
+
+        Returns:
+            bool: The pin's new state.
+        """
+        with self.__changed:
+            value = self.__states[pin] = not self.__states[pin]
+            self.__post()
+            return value
+
+    def hold(self, pin):
+        """Turn a pin on until every hold on it is released.
+
+        Used for the thinking LED, which stays on while any command runs.
+        """
+        with self.__changed:
+            self.__holds[pin] += 1
+            if self.__holds[pin] == 1:
+                self.__states[pin] = True
+                # Stay lit for at least min_hold, unless some effect plays
+                self.__start(pin, [(True, self.min_hold)])
+            self.__post()
+
+    def release(self, pin):
+        """Release a hold on a pin, turning it off once none are left."""
+        with self.__changed:
+            self.__holds[pin] = max(0, self.__holds[pin] - 1)
+            if not self.__holds[pin]:
+                self.__states[pin] = False
+            self.__post()
+
+    def blink(self, pin, times=5, period=0.4):
+        """Play blinking on a pin, replacing any effect playing on it.
+
+        Args:
+            pin (int): Pin to blink.
+            times (int): Times to turn it on.
+            period (float): Seconds between turning it on each time.
+        """
+        with self.__changed:
+            self.__start(pin, [(True, period / 2), (False, period / 2)] *
+                         times)
+            self.__post()
+
+    def pulse(self, pin, seconds):
+        """Turn a pin on for the given seconds, then back to its state,
+        replacing any effect playing on it.
+        """
+        with self.__changed:
+            self.__start(pin, [(True, seconds)])
+            self.__post()
+
+    def flush(self, timeout=None):
+        """Wait until everything posted so far has been written.
+
+        Returns:
+            bool: False if timeout seconds passed first.
+        """
+        progress = self.__progress
+        with self.__changed:
+            posted = progress['posted']
+            return self.__changed.wait_for(
+                lambda: progress['applied'] >= posted, timeout
+            )
+
+    def close(self):
+        """Stop every effect and write every pin's state, then stop my
+        thread.
+        """
+        with self.__changed:
+            self.__progress['closed'] = True
+            self.__changed.notify_all()
+        self.__thread.join()
+
+    # Helpers #
+    def __start(self, pin, steps):
+        """Start an effect of the given (value, seconds) steps on a pin.
+
+        Note: Only call while holding my lock.
+        """
+        self.__effects[pin] = [iter(steps), None, monotonic()]
+
+    def __post(self):
+        """Wake my thread to write what was posted.
+
+        Note: Only call while holding my lock.
+        """
+        self.__progress['posted'] += 1
+        self.__changed.notify_all()
+
+    @staticmethod
+    def __run(gpio, states, written, effects, changed, progress):
+        """Write pins whenever something is posted or an effect steps on,
+        until closed.
+        """
+        with changed:
+            while True:
+                posted, closed = progress['posted'], progress['closed']
+                if closed:
+                    effects.clear()
+                # Step every effect that's due, dropping those that are done
+                now = monotonic()
+                for pin, effect in list(effects.items()):
+                    steps, _, due = effect
+                    while due <= now:
+                        step = next(steps, None)
+                        if step is None:
+                            del effects[pin]
+                            break
+                        effect[1], seconds = step
+                        due += seconds
+                    effect[2] = due
+
+                # Write every pin that isn't what it should be, at once
+                desired = {
+                    pin: effects[pin][1] if pin in effects else value
+                    for pin, value in states.items()
+                }
+                pins = [pin for pin, value in desired.items()
+                        if written[pin] != value]
+                if pins:
+                    # Let posts keep coming while writing
+                    changed.release()
+                    try:
+                        gpio.output(pins, [desired[pin] for pin in pins])
+                    finally:
+                        changed.acquire()
+                    written.update((pin, desired[pin]) for pin in pins)
+                progress['applied'] = posted
+                changed.notify_all()
+                if closed:
+                    return
+
+                # Sleep until something is posted or the next step is due
+                due = min(
+                    (effect[2] for effect in effects.values()), default=None
+                )
+                changed.wait_for(
+                    lambda: progress['posted'] > posted or
+                    progress['closed'],
+                    None if due is None else max(0.0, due - monotonic())
+                )
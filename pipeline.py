@@ -0,0 +1,126 @@
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Sentences end with punctuation followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text):
+    """Splits text into its sentences, keeping their punctuation.
+
+    Example:
+        >>> split_sentences("Tonight, it's cool! It's a nice day, too!")
+        ["Tonight, it's cool!", "It's a nice day, too!"]
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        list: The sentences, in order. Empty if text is blank.
+    """
+    return [
+        sentence for sentence in SENTENCE_END.split(text.strip()) if sentence
+    ]
+
+
+class SpeechPipeline:
+    """Synthesizes long responses a sentence at a time, concurrently.
+
+    Splits text into sentences and has a small pool of workers synthesize
+    them at the same time, while the sentences are yielded strictly in order
+    as each becomes ready. So a long response (like a full broadcast) starts
+    playing once its first sentence is synthesized, and the rest are usually
+    ready by the time they are needed. At most lookahead sentences are
+    synthesized ahead of the one being played, bounding how much audio is
+    held in memory. Single sentences are streamed part by part instead (see
+    Synthesizer.stream).
+
+    Each sentence is cached on its own, so sentences shared between responses
+    (like "Be sure to dress for the weather!") are only synthesized once.
+
+    Args:
+        synthesizer (Synthesizer): What synthesizes each sentence.
+        workers (int): How many sentences may be synthesized at once.
+        lookahead (int): Most sentences to synthesize ahead of the one being
+            played.
+    """
+
+    def __init__(self, synthesizer, workers=3, lookahead=3):
+        self.synthesizer = synthesizer
+        self.lookahead = lookahead
+        self.__pool = ThreadPoolExecutor(
+            workers, thread_name_prefix='xavier-pipeline'
+        )
+
+    def stream(self, text):
+        """Returns an iterable of clips speaking the given text, in order.
+
+        Args:
+            text (str): Text to speak.
+
+        Returns:
+            iterable: Paths or bytes of encoded (mp3) clips, as taken by
+                Player.play. Raises whatever synthesis raised once it reaches
+                the failed sentence.
+        """
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            return self.synthesizer.stream(text)
+        return self.__pipeline(sentences)
+
+    def warm(self, text):
+        """Synthesize and cache the given text without saying it.
+
+        Caches it exactly as stream would split it, so that a later stream of
+        the same text only plays cached clips.
+
+        Args:
+            text (str): Text to synthesize.
+        """
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            self.synthesizer.synthesize(text)
+            return
+        for sentence in sentences:
+            self.synthesizer.synthesize(sentence)
+
+    def shutdown(self):
+        """Stop the workers once they finish their sentences."""
+        self.__pool.shutdown(wait=False)
+
+    # Helpers #
+    def __pipeline(self, sentences):
+        """Start synthesizing sentences, returning an iterable of their clips.
+
+        Synthesis starts right away rather than once the iterable is first
+        used, since the player may still be busy with something else.
+        """
+        remaining = iter(sentences)
+        pending = deque()
+
+        def submit_next():
+            sentence = next(remaining, None)
+            if sentence is not None:
+                pending.append(
+                    self.__pool.submit(self.synthesizer.render, sentence)
+                )
+
+        # One sentence to play first, plus the ones to synthesize ahead of it
+        for _ in range(self.lookahead + 1):
+            submit_next()
+        return self.__drain(pending, submit_next)
+
+    @staticmethod
+    def __drain(pending, submit_next):
+        """Yield each pending clip in order, submitting more as they play."""
+        try:
+            while pending:
+                clip = pending.popleft().result()
+                yield clip
+                # That clip finished playing, so there is room for one more
+                submit_next()
+        finally:
+            # If playing was cancelled, don't bother with the rest
+            for future in pending:
+                future.cancel()
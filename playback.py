@@ -0,0 +1,230 @@
+from collections import deque
+from io import BytesIO
+from threading import Condition, Event, Thread
+from time import monotonic
+
+
+class PlaybackHandle:
+    """Tracks a single source given to a Player.
+
+    Returned by Player.play so callers can wait for the source to finish or
+    cancel it, whether or not it has started playing yet. If the source
+    raised an exception while being played, it is kept in error.
+
+    When its first clip started playing and when it was done are kept in
+    started_at and finished_at (in monotonic seconds), or None until then.
+
+    Args:
+        player (Player): Player the source was given to.
+        source (str or iterable): What is being played; see Player.play.
+    """
+
+    def __init__(self, player, source):
+        self.source = source
+        self.cancelled = False
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.__player = player
+        self.__finished = Event()
+
+    def wait(self, timeout=None):
+        """Block until the clip finishes or is cancelled.
+
+        Args:
+            timeout (float): Most seconds to wait, or None to wait forever.
+
+        Returns:
+            bool: Whether the clip is done.
+        """
+        return self.__finished.wait(timeout)
+
+    def cancel(self):
+        """Stop the clip if it is playing, or skip it if it is still queued."""
+        self.__player.cancel(self)
+
+    @property
+    def done(self):
+        """bool: Whether the clip finished playing or was cancelled."""
+        return self.__finished.is_set()
+
+    def _finish(self):
+        """Mark the clip as done and wake everyone waiting on it.
+
+        Used by the Player.
+        """
+        self.finished_at = monotonic()
+        self.__finished.set()
+
+
+class Player:
+    """Plays clips one at a time on a background thread without busy-waiting.
+
+    Clips are queued and played in order by a single thread, which owns the
+    music stream so that nobody else has to touch it. A clip can be a file or
+    encoded audio held in memory, and a single play can be a stream of clips
+    that are still being made, which are played back to back as they arrive.
+
+    While a clip plays, the thread sleeps on a condition variable that is
+    woken by cancellation, and otherwise checks whether the clip is still
+    playing every tick seconds, which costs next to nothing compared to
+    spinning. pygame only posts end-of-track events to its event queue, which
+    needs a display that Xavier never has, so polling get_busy is the only way
+    to tell a clip ended.
+
+    Args:
+        music (module): The music stream to play clips on, such as
+            pygame.mixer.music. Only load, play, stop, and get_busy are used.
+            load must accept file objects (with a type hint), as pygame 2
+            does.
+        idle_path (str): Clip to load once each clip finishes, releasing the
+            finished clip's file so it can be replaced or deleted. May be None.
+        tick (float): Most seconds to sleep before checking on a clip.
+    """
+
+    def __init__(self, music, idle_path=None, tick=0.05):
+        self.__music = music
+        self.idle_path = idle_path
+        self.tick = tick
+
+        # Handles waiting to be played, oldest first
+        self.__queue = deque()
+        self.__current = None
+        self.__condition = Condition()
+        self.__running = True
+
+        self.__thread = Thread(
+            target=self.__run, name='xavier-player', daemon=True
+        )
+        self.__thread.start()
+
+    def play(self, source, block=True):
+        """Queue a clip, or a stream of clips, to be played.
+
+        Args:
+            source (str or iterable): Path to a clip, or an iterable of clips
+                to play back to back. Each clip in an iterable is either a
+                path or bytes holding an encoded (mp3 or wav) clip. The
+                iterable may block while its next clip is still being made;
+                playing starts as soon as the first one is ready.
+            block (bool): Whether to return only once the source is done.
+
+        Returns:
+            PlaybackHandle: Handle to wait on or cancel the source with.
+
+        Raises:
+            Exception: Whatever the source raised while being played, if
+                blocking. Otherwise, it is kept in the handle's error.
+        """
+        handle = PlaybackHandle(self, source)
+        with self.__condition:
+            if not self.__running:
+                # Nobody will ever play it, so don't make anyone wait on it
+                handle.cancelled = True
+                handle._finish()
+                return handle
+            self.__queue.append(handle)
+            self.__condition.notify_all()
+        if block:
+            handle.wait()
+            if handle.error is not None:
+                raise handle.error
+        return handle
+
+    def cancel(self, handle):
+        """Cancel a clip, stopping it if it is already playing.
+
+        Args:
+            handle (PlaybackHandle): Handle of the clip to cancel.
+        """
+        with self.__condition:
+            if handle.done:
+                return
+            handle.cancelled = True
+            if handle is not self.__current:
+                # Still queued; skip it entirely
+                self.__queue.remove(handle)
+                handle._finish()
+            self.__condition.notify_all()
+
+    @property
+    def busy(self):
+        """bool: Whether a clip is playing or waiting to be played."""
+        with self.__condition:
+            return self.__current is not None or bool(self.__queue)
+
+    def stop(self):
+        """Cancel every clip and end the playing thread."""
+        with self.__condition:
+            self.__running = False
+            if self.__current:
+                self.__current.cancelled = True
+            while self.__queue:
+                handle = self.__queue.popleft()
+                handle.cancelled = True
+                handle._finish()
+            self.__condition.notify_all()
+        self.__thread.join()
+
+    # Helpers #
+    def __play_clip(self, handle, clip):
+        """Play a single clip, returning once it ends or is cancelled.
+
+        Args:
+            handle (PlaybackHandle): Handle the clip belongs to.
+            clip (str or bytes): Path to the clip, or the encoded clip itself.
+        """
+        if isinstance(clip, bytes):
+            # Never touches the disk; WAV clips start with a RIFF header
+            namehint = 'wav' if clip.startswith(b'RIFF') else 'mp3'
+            self.__music.load(BytesIO(clip), namehint)
+        else:
+            self.__music.load(clip)
+        if handle.started_at is None:
+            handle.started_at = monotonic()
+        self.__music.play()
+
+        with self.__condition:
+            # Sleep until the clip ends or someone gives up on it
+            while not handle.cancelled and self.__music.get_busy():
+                self.__condition.wait(self.tick)
+            if handle.cancelled:
+                self.__music.stop()
+
+    def __run(self):
+        """Play queued sources until I am stopped."""
+        while True:
+            with self.__condition:
+                while self.__running and not self.__queue:
+                    self.__condition.wait()
+                if not self.__running:
+                    return
+                handle = self.__queue.popleft()
+                self.__current = handle
+
+            clips = handle.source
+            if isinstance(clips, str):
+                clips = [clips]
+            try:
+                # May block while the next clip is still being made
+                for clip in clips:
+                    if handle.cancelled:
+                        break
+                    self.__play_clip(handle, clip)
+            except Exception as e:
+                # Hand the problem to whoever is waiting on the source
+                handle.error = e
+            finally:
+                # Let a cancelled stream know it can stop making clips
+                if hasattr(clips, 'close'):
+                    clips.close()
+                with self.__condition:
+                    self.__current = None
+                # Whatever happens, nobody waiting on the source may hang
+                try:
+                    if self.idle_path:
+                        self.__music.load(self.idle_path)
+                except Exception as e:
+                    if handle.error is None:
+                        handle.error = e
+                handle._finish()
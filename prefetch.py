@@ -0,0 +1,304 @@
+import json
+import re
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from time import monotonic
+from logger import log_segments, open_segment
+from logquery import LogQuery
+
+# Matches the first line of every command the Logger recorded, capturing when
+#   it ran and the command's name
+LOG_LINE = re.compile(
+    r'^\[(?:INFO |WARN |ERROR): (\d+-\d+-\d+ \d+:\d+:\d+(?:\.\d+)?)\] '
+    r'(?:Ran (\w+) command|Command (\w+) threw)'
+)
+
+
+class UsageProfile:
+    """Learns when each command tends to be asked for.
+
+    Splits each day into slots of slot_minutes, keeping weekdays and weekends
+    apart, and counts how often each command was asked for in each slot. The
+    chance a command is asked for in a slot is how many days it was asked for
+    in that slot out of how many days of that kind I have seen.
+
+    Args:
+        slot_minutes (int): Length of each slot of the day, in minutes.
+    """
+
+    def __init__(self, slot_minutes=15):
+        self.slot_minutes = slot_minutes
+        # Maps commands to dicts mapping (is_weekend, slot) to sets of dates
+        self.__usage = defaultdict(lambda: defaultdict(set))
+        # Dates seen, split by whether they were weekends
+        self.__days = {False: set(), True: set()}
+
+    @staticmethod
+    def from_log(path, slot_minutes=15):
+        """Build a profile from a log file written by the Logger.
+
+        Reads every segment the log file was rotated into, too, in either of
+        the Logger's formats.
+
+        Args:
+            path (str): Path to the log file.
+            slot_minutes (int): Length of each slot of the day, in minutes.
+
+        Returns:
+            UsageProfile: The profile. Empty if the file doesn't exist.
+        """
+        profile = UsageProfile(slot_minutes)
+        for segment in log_segments(path):
+            try:
+                with open_segment(segment) as stream:
+                    for line in stream:
+                        command, when = UsageProfile.__parse(line)
+                        if command:
+                            profile.record(command, when)
+            except FileNotFoundError:
+                # It was deleted for being too old while I got to it
+                pass
+        return profile
+
+    @staticmethod
+    def from_index(query, slot_minutes=15):
+        """Build a profile from a JSON Lines log, through its index.
+
+        Only what was logged since the index was last refreshed is read from
+        the log itself, and only command records are read after that.
+
+        Args:
+            query (LogQuery): Index of the log file.
+            slot_minutes (int): Length of each slot of the day, in minutes.
+
+        Returns:
+            UsageProfile: The profile. Empty if the file doesn't exist.
+        """
+        profile = UsageProfile(slot_minutes)
+        query.refresh()
+        for command in query.stats():
+            for record in query.records(command):
+                profile.record(command, datetime.fromisoformat(record['time']))
+        return profile
+
+    @staticmethod
+    def __parse(line):
+        """Returns the command a log line records and when, or (None, None).
+
+        Understands both of the Logger's formats.
+        """
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return None, None
+            if 'command' not in record:
+                return None, None
+            return record['command'], datetime.fromisoformat(record['time'])
+        match = LOG_LINE.match(line)
+        if not match:
+            return None, None
+        return (
+            match.group(2) or match.group(3),
+            datetime.fromisoformat(match.group(1))
+        )
+
+    def __key(self, when):
+        """Returns whether when is a weekend, and its slot of the day."""
+        minutes = when.hour * 60 + when.minute
+        return when.weekday() >= 5, minutes // self.slot_minutes
+
+    def record(self, command, when):
+        """Remember the named command was asked for at the given time.
+
+        Args:
+            command (str): Name of the command.
+            when (datetime): When it was asked for.
+        """
+        is_weekend, slot = self.__key(when)
+        self.__usage[command][(is_weekend, slot)].add(when.date())
+        self.__days[is_weekend].add(when.date())
+
+    def likelihood(self, command, when):
+        """Returns the chance the command is asked for in the slot of when.
+
+        Args:
+            command (str): Name of the command.
+            when (datetime): Any time within the slot.
+
+        Returns:
+            float: Between 0 and 1.
+        """
+        is_weekend, slot = self.__key(when)
+        days = len(self.__days[is_weekend])
+        if not days:
+            return 0.0
+        return len(self.__usage[command].get((is_weekend, slot), ())) / days
+
+    @property
+    def commands(self):
+        """list: Names of every command I have seen."""
+        return list(self.__usage)
+
+
+class Prefetcher:
+    """Warms responses shortly before they are usually asked for.
+
+    Learns when commands are asked for from the Logger's log file (through
+    its LogQuery index, if it's in JSON Lines format), on my thread rather
+    than whoever made me, relearning every relearn_hours. Every
+    check_interval seconds, looks lead_minutes
+    ahead and asks the learned profile which commands are likely (at least
+    threshold) to be asked for then. Each likely command with a warmer has it
+    run once per slot, which should fetch its data and synthesize its speech
+    so that answering later is local. No more than max_per_hour warmers run in
+    any hour.
+
+    Args:
+        log_path (str): Path to the log file the Logger writes.
+        warmers (dict): Maps command names to callables (taking no arguments)
+            that warm their responses.
+        lead_minutes (int): How far ahead of a slot to warm it.
+        threshold (float): Smallest likelihood worth warming for.
+        max_per_hour (int): Budget of warmers that may run in any hour.
+        check_interval (float): Seconds between checks.
+        relearn_hours (float): Hours between rereading the log file.
+        slot_minutes (int): Length of each slot of the day, in minutes.
+        on_error (callable): Called with the command's name and the exception
+            when a warmer fails, or with None and the exception when learning
+            or checking fails. Warming is best-effort, so failures are
+            otherwise ignored, and I keep checking.
+    """
+
+    def __init__(self, log_path, warmers, lead_minutes=10, threshold=0.3,
+                 max_per_hour=12, check_interval=60, relearn_hours=24,
+                 slot_minutes=15, on_error=None):
+        self.log_path = log_path
+        self.warmers = warmers
+        self.lead = timedelta(minutes=lead_minutes)
+        self.threshold = threshold
+        self.max_per_hour = max_per_hour
+        self.check_interval = check_interval
+        self.relearn_interval = relearn_hours * 3600
+        self.slot_minutes = slot_minutes
+        self.on_error = on_error
+
+        # Learned once checking starts, so making me never reads the log
+        self.profile = None
+        self.__learned_at = None
+        self.__query = None
+        if log_path.endswith('.jsonl'):
+            self.__query = LogQuery(log_path)
+
+        # When (in monotonic seconds) each of the last hour's warmers ran
+        self.__spent = deque()
+        # (command, date, slot) of everything already warmed
+        self.__warmed = set()
+        self.__stopped = Event()
+        self.__thread = None
+
+    def start(self):
+        """Start checking in the background."""
+        self.__stopped.clear()
+        self.__thread = Thread(
+            target=self.__run, name='xavier-prefetcher', daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        """Stop checking, waiting for any running warmer to finish."""
+        self.__stopped.set()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+    def relearn(self):
+        """Rebuild my profile from the log file."""
+        if self.__query is not None:
+            self.profile = UsageProfile.from_index(
+                self.__query, self.slot_minutes
+            )
+        else:
+            self.profile = UsageProfile.from_log(
+                self.log_path, self.slot_minutes
+            )
+        self.__learned_at = monotonic()
+
+    def check(self, now=None):
+        """Run the warmers of every command likely to be asked for soon.
+
+        Learns my profile first, if I haven't yet.
+
+        Args:
+            now (datetime): Time to check from. Defaults to the current time.
+
+        Returns:
+            list: Names of the commands that were warmed.
+        """
+        if self.profile is None:
+            self.relearn()
+        now = now or datetime.now()
+        upcoming = now + self.lead
+        slot = (upcoming.hour * 60 + upcoming.minute) // self.slot_minutes
+        # Forget what I warmed on previous days
+        self.__warmed = {
+            key for key in self.__warmed if key[1] >= upcoming.date()
+        }
+
+        # Most likely first, so the budget goes to the best guesses
+        candidates = sorted(
+            (
+                (self.profile.likelihood(name, upcoming), name)
+                for name in self.warmers
+            ),
+            reverse=True
+        )
+        warmed = []
+        for likelihood, name in candidates:
+            if likelihood < self.threshold:
+                break
+            key = (name, upcoming.date(), slot)
+            if key in self.__warmed:
+                continue
+            if not self.__spend():
+                break
+            self.__warmed.add(key)
+            try:
+                self.warmers[name]()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(name, e)
+            else:
+                warmed.append(name)
+        return warmed
+
+    # Helpers #
+    def __spend(self):
+        """Take one warmer from the hourly budget.
+
+        Returns:
+            bool: Whether the budget allowed it.
+        """
+        now = monotonic()
+        while self.__spent and now - self.__spent[0] >= 3600:
+            self.__spent.popleft()
+        if len(self.__spent) >= self.max_per_hour:
+            return False
+        self.__spent.append(now)
+        return True
+
+    def __run(self):
+        """Check until I am stopped, whatever goes wrong along the way."""
+        while not self.__stopped.is_set():
+            try:
+                if self.__learned_at is None or \
+                        monotonic() - self.__learned_at >= \
+                        self.relearn_interval:
+                    self.relearn()
+                self.check()
+            except Exception as e:
+                # A bad log or index must not end prefetching for good
+                if self.on_error:
+                    self.on_error(None, e)
+            self.__stopped.wait(self.check_interval)
@@ -0,0 +1,154 @@
+import cProfile
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Lock, Thread, get_ident
+from time import monotonic
+
+
+class StackSampler:
+    """Sampling profiler for a single thread.
+
+    Every interval seconds, a background thread looks at what the profiled
+    thread is running and counts its whole stack. Since the profiled thread
+    is never interrupted, its overhead is a small, fixed cost per sample
+    rather than per function call.
+
+    Args:
+        ident (int): Identifier of the thread to sample (see get_ident).
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, ident, interval=0.005):
+        self.ident = ident
+        self.interval = interval
+        # Maps stacks (outermost call first) to how many samples they were in
+        self.samples = Counter()
+        self.__stopped = Event()
+        self.__thread = None
+
+    def start(self):
+        """Begin sampling."""
+        self.__thread = Thread(
+            target=self.__run, name='xavier-sampler', daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        """Stop sampling, returning once the last sample is counted."""
+        self.__stopped.set()
+        self.__thread.join()
+
+    def folded(self):
+        """Returns my samples as folded stacks, one per line.
+
+        Each line is a stack's frames, outermost first, separated by
+        semicolons, then how many samples were in it; flame graph tools (like
+        flamegraph.pl or speedscope) read this format.
+        """
+        return ''.join(
+            '{} {}\n'.format(';'.join(stack), count)
+            for stack, count in self.samples.most_common()
+        )
+
+    # Helpers #
+    def __run(self):
+        """Take a sample every interval until I am stopped."""
+        while not self.__stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(
+                    code.co_name, Path(code.co_filename).name,
+                    frame.f_lineno
+                ))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+
+class CommandProfiler:
+    """Profiles commands now and then, saving where their time went.
+
+    There are two ways for a command to be profiled:
+        * Every every-th time it runs, it runs under cProfile, a deterministic
+            profiler that counts every call. The profile is saved as a .prof
+            file, which pstats (or a viewer like snakeviz) can read.
+        * If threshold is set, every time it runs it is sampled by a
+            StackSampler. If it took at least threshold seconds, its samples
+            are saved as a .folded file of folded stacks.
+    Profiles are saved as <command>-<timestamp> in directory, even if the
+    command raised an exception. Both ways are off by default, in which case
+    enabled is False and commands shouldn't be run through me at all.
+
+    Args:
+        every (int): Profile every every-th run of each command. Never if 0.
+        threshold (float): Seconds a sampled run must take to be saved. Runs
+            aren't sampled if None.
+        directory (str): Directory to save profiles in. Created if it doesn't
+            exist.
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, every=0, threshold=None, directory='logs/profiles',
+                 interval=0.005):
+        self.every = every
+        self.threshold = threshold
+        self.directory = Path(directory)
+        self.interval = interval
+        # Counts how many times each command has run through me
+        self.__runs = defaultdict(int)
+        self.__lock = Lock()
+
+    @property
+    def enabled(self):
+        """bool: Whether any command will ever be profiled."""
+        return bool(self.every) or self.threshold is not None
+
+    def call(self, name, func, *args, **kwargs):
+        """Run a command, profiling it if it is due.
+
+        Args:
+            name (str): Name of the command, used to name its profiles.
+            func (callable): Command to run.
+            args (list): Positional arguments to run it with.
+            kwargs (dict): Keyword arguments to run it with.
+
+        Returns:
+            object: Whatever the command returned. Whatever it raised is
+                raised again once its profile is saved.
+        """
+        with self.__lock:
+            self.__runs[name] += 1
+            runs = self.__runs[name]
+
+        if self.every and runs % self.every == 0:
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                profile.dump_stats(str(self.__path_for(name, 'prof')))
+
+        if self.threshold is not None:
+            sampler = StackSampler(get_ident(), self.interval)
+            sampler.start()
+            start = monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sampler.stop()
+                if monotonic() - start >= self.threshold:
+                    with open(self.__path_for(name, 'folded'), 'w') as stream:
+                        stream.write(sampler.folded())
+
+        return func(*args, **kwargs)
+
+    # Helpers #
+    def __path_for(self, name, extension):
+        """Returns a new path for a profile of the named command."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / '{}-{}.{}'.format(
+            name, datetime.now().strftime('%Y%m%d-%H%M%S-%f'), extension
+        )
@@ -0,0 +1,261 @@
+import os
+import weakref
+from collections import namedtuple
+from functools import partial
+from threading import Lock
+from command import HomeCommand
+
+# A command: its name, its method (decorated with HomeCommand), its
+#   sensitivity, and the path of its model
+Command = namedtuple('Command', 'name function sensitivity model')
+# What a detector has loaded for a command: the number of its model in the
+#   detector, and the model, sensitivity, and modification time (of the
+#   model's file) it was loaded with
+Loaded = namedtuple('Loaded', 'number model sensitivity stamp')
+
+
+class CommandRegistry:
+    """Holds a Body's commands by name, keeping its detector in step.
+
+    Every Body has a registry of its own, so its commands are bound to it
+    alone: each model's callback looks its command up by name (in constant
+    time) once the model is heard, then hands it to the Body's executor.
+
+    Commands can be added, removed, retuned, and have their models reloaded
+    at any time. While a detector is attached (see attach), only the model
+    of the command that changed is loaded into, removed from, or retuned in
+    it, so the audio and every other model are left alone. A command's new
+    model is loaded before its old one is removed, so it is listened for
+    throughout, and a model that fails to load leaves the old one in place.
+
+    Args:
+        body (Body): Body to run the commands on, with its executor. Only
+            referred to weakly, so the body can still be deleted.
+        commands (dict): Commands (decorated with HomeCommand) mapped to
+            their sensitivities, in the order their models are loaded.
+        models (str): Directory holding each command's model, named after
+            the command.
+    """
+
+    def __init__(self, body, commands=None, models='models'):
+        self.models = models
+        self.__body = weakref.ref(body)
+        # Maps names to Commands, and (while a detector is attached) to
+        #   what it has Loaded for them
+        self.__commands = dict()
+        self.__loaded = dict()
+        self.__detector = None
+        # Changes one command at a time, so the detector never loses track
+        self.__lock = Lock()
+        for function, sensitivity in (commands or dict()).items():
+            self.__commands[function.__name__] = self.__command(
+                function.__name__, function, sensitivity
+            )
+
+    def __contains__(self, name):
+        return name in self.__commands
+
+    def __getitem__(self, name):
+        """Returns the Command with the given name.
+
+        Raises:
+            KeyError: If I have no such command.
+        """
+        return self.__commands[name]
+
+    def __iter__(self):
+        return iter(list(self.__commands))
+
+    def __len__(self):
+        return len(self.__commands)
+
+    def entries(self):
+        """Returns every Command I have, in the order they were added."""
+        with self.__lock:
+            return list(self.__commands.values())
+
+    def run(self, name):
+        """Hand a command to my body's executor, just like hearing it does.
+
+        Returns:
+            Future: The command's Outcome once it has run, or None if it was
+                dropped (see CommandExecutor.submit) or my body was deleted.
+
+        Raises:
+            KeyError: If I have no such command.
+        """
+        command = self.__commands[name]
+        body = self.__body()
+        if body is None:
+            # A detector or server outlived the body; nobody to run it on
+            return None
+        return body.executor.submit(command.function, body)
+
+    def add(self, function, sensitivity=None, name=None, model=None):
+        """Add a command, or replace the one with the same name.
+
+        Args:
+            function (callable): The command, decorated with HomeCommand.
+            sensitivity (float): Its sensitivity. Defaults to the one it was
+                decorated with.
+            name (str): Name to run it by. Defaults to the function's name.
+            model (str): Path of its model. Defaults to the model in my
+                models directory named after it.
+
+        Raises:
+            FileNotFoundError: If the command's sound does not exist.
+            RuntimeError: If the attached detector fails to load its model.
+        """
+        HomeCommand.check_sounds([function])
+        name = name or function.__name__
+        if sensitivity is None:
+            sensitivity = function.sensitivity
+        command = self.__command(name, function, sensitivity, model)
+        with self.__lock:
+            previous = self.__commands.get(name)
+            self.__commands[name] = command
+            try:
+                self.__sync(name)
+            except Exception:
+                # Keep listening for what was there before
+                if previous is None:
+                    del self.__commands[name]
+                else:
+                    self.__commands[name] = previous
+                raise
+
+    def remove(self, name):
+        """Remove a command, and its model from the attached detector.
+
+        Raises:
+            KeyError: If I have no such command.
+        """
+        with self.__lock:
+            del self.__commands[name]
+            self.__sync(name)
+
+    def retune(self, name, sensitivity):
+        """Change a command's sensitivity, without reloading its model.
+
+        Raises:
+            KeyError: If I have no such command.
+        """
+        with self.__lock:
+            self.__commands[name] = \
+                self.__commands[name]._replace(sensitivity=sensitivity)
+            self.__sync(name)
+
+    def reload(self, name=None):
+        """Reload a command's model in the attached detector, or (if no name
+        is given) every model whose file changed since it was loaded.
+
+        Returns:
+            list: Names of the commands whose models were reloaded.
+
+        Raises:
+            KeyError: If I have no command with the given name.
+            RuntimeError: If the detector fails to load a model; the models
+                reloaded before it stay reloaded.
+        """
+        with self.__lock:
+            if name is not None:
+                if name not in self.__commands:
+                    raise KeyError(name)
+                names = [name]
+            else:
+                names = [
+                    name for name, loaded in self.__loaded.items()
+                    if name in self.__commands and
+                    loaded.stamp != CommandRegistry.__stamp(loaded.model)
+                ]
+            if self.__detector is None:
+                return []
+            for name in names:
+                self.__sync(name, force=True)
+            return names
+
+    def attach(self, detector, commands):
+        """Keep a detector in step with me until detached, catching it up
+        with whatever changed since it was loaded.
+
+        Args:
+            detector (LocalDetector): The detector (or a ShardedDetector),
+                not started yet.
+            commands (list): The Commands (see entries) whose models the
+                detector was loaded with, in order.
+
+        Returns:
+            list: Callbacks to start the detector with, one per model.
+        """
+        with self.__lock:
+            self.__detector = detector
+            self.__loaded = {
+                command.name: Loaded(
+                    number, command.model, command.sensitivity,
+                    CommandRegistry.__stamp(command.model)
+                )
+                for number, command in enumerate(commands)
+            }
+            names = list(self.__loaded)
+            names += [name for name in self.__commands if name not in names]
+            for name in names:
+                self.__sync(name)
+        return [partial(self.run, command.name) for command in commands]
+
+    def detach(self):
+        """Stop keeping the attached detector in step with me."""
+        with self.__lock:
+            self.__detector = None
+            self.__loaded = dict()
+
+    # Helpers #
+    def __command(self, name, function, sensitivity, model=None):
+        """Returns a Command, with its model in my models directory unless
+        given.
+        """
+        if model is None:
+            model = os.path.join(self.models, '{}.pmdl'.format(name))
+        return Command(name, function, sensitivity, model)
+
+    def __sync(self, name, force=False):
+        """Bring the attached detector's model for a command in line with
+        the command, reloading it if force is True.
+
+        Note: Only call while holding my lock.
+        """
+        detector = self.__detector
+        if detector is None:
+            return
+        command = self.__commands.get(name)
+        loaded = self.__loaded.get(name)
+        if command is None:
+            if loaded is not None:
+                detector.remove_model(loaded.number)
+                del self.__loaded[name]
+            return
+
+        stamp = CommandRegistry.__stamp(command.model)
+        if force or loaded is None or loaded.model != command.model or \
+                loaded.stamp != stamp:
+            number = detector.add_model(
+                command.model, command.sensitivity, partial(self.run, name)
+            )
+            self.__loaded[name] = Loaded(
+                number, command.model, command.sensitivity, stamp
+            )
+            # Only once the new model is listening
+            if loaded is not None:
+                detector.remove_model(loaded.number)
+        elif loaded.sensitivity != command.sensitivity:
+            detector.set_sensitivity(loaded.number, command.sensitivity)
+            self.__loaded[name] = loaded._replace(
+                sensitivity=command.sensitivity
+            )
+
+    @staticmethod
+    def __stamp(path):
+        """Returns when a file was last modified, or None if it's missing."""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,139 @@
+import json
+import os
+from pathlib import Path
+from time import monotonic, sleep
+
+
+class SoundBank:
+    """Keeps every sound effect decoded in memory, each on its own channel.
+
+    Decoding an mp3 (and resampling it to the mixer's rate) every time it is
+    played is what makes sounds slow to start, so each sound in directory is
+    decoded only once, into the mixer's own PCM format, and kept in memory as
+    a ready-to-play Sound. The decoded samples are also kept in
+    cache_directory, so later runs skip decoding entirely for as long as the
+    sound (and the mixer's format) stays the same.
+
+    Every sound gets a mixer channel reserved for it alone, so a sound never
+    has to wait for a free channel, cuts off another sound, or touches the
+    music stream speech is played on.
+
+    Sounds that cannot be decoded are left out, so whoever plays sounds
+    should fall back to playing their files (see __contains__).
+
+    Args:
+        mixer (module): An initialized mixer, such as pygame.mixer. Only
+            Sound, Channel, get_init, get_num_channels, set_num_channels, and
+            set_reserved are used.
+        directory (str): Directory holding the sounds, as mp3s.
+        cache_directory (str): Directory to keep decoded samples in. Created
+            if it doesn't exist.
+        tick (float): Most seconds to sleep before checking whether a sound
+            being waited on is done.
+    """
+
+    def __init__(self, mixer, directory='sounds',
+                 cache_directory='cache/sounds', tick=0.005):
+        self.directory = Path(directory)
+        self.cache_directory = Path(cache_directory)
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        self.tick = tick
+        self.__mixer = mixer
+        # Remember how much decoding I saved
+        self.decoded = 0
+        self.reused = 0
+
+        # Maps each sound's name to its Sound and its channel
+        self.__sounds = dict()
+        self.__channels = dict()
+        self.__load()
+
+    def __contains__(self, name):
+        return name in self.__sounds
+
+    def names(self):
+        """Returns the names of every sound I can play, sorted."""
+        return sorted(self.__sounds)
+
+    def play(self, name, block=True):
+        """Play a sound on its channel, starting it over if it is playing.
+
+        Args:
+            name (str): Name of the sound (without path or extension).
+            block (bool): Whether to wait for the sound to finish.
+
+        Returns:
+            float: When the sound started playing (in monotonic seconds).
+
+        Raises:
+            KeyError: If I don't have the sound.
+        """
+        sound = self.__sounds[name]
+        channel = self.__channels[name]
+        started_at = monotonic()
+        channel.play(sound)
+        if block:
+            # Sleep through most of the sound, then check on it closely
+            sleep(max(0.0, sound.get_length() - self.tick))
+            while channel.get_busy():
+                sleep(self.tick)
+        return started_at
+
+    def stop(self):
+        """Stop every sound."""
+        for channel in self.__channels.values():
+            channel.stop()
+
+    # Helpers #
+    def __load(self):
+        """Load every sound, then give each a channel of its own."""
+        for path in sorted(self.directory.glob('*.mp3')):
+            try:
+                self.__sounds[path.stem] = self.__sound_for(path)
+            except Exception:
+                # pygame raises its own error for files it can't decode; the
+                #   sound can still be played from its file
+                continue
+
+        # Reserved channels are never picked for anything else
+        count = len(self.__sounds)
+        if count > self.__mixer.get_num_channels():
+            self.__mixer.set_num_channels(count)
+        self.__mixer.set_reserved(count)
+        for number, name in enumerate(self.names()):
+            self.__channels[name] = self.__mixer.Channel(number)
+
+    def __sound_for(self, path):
+        """Returns a Sound of the given file, decoding it only if needed."""
+        stat = path.stat()
+        # Decoded samples only fit a mixer with the same format
+        identity = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'format': list(self.__mixer.get_init()),
+        }
+        samples_path = self.cache_directory / (path.stem + '.pcm')
+        meta_path = self.cache_directory / (path.stem + '.json')
+        try:
+            with open(meta_path, 'r') as stream:
+                if json.load(stream) == identity:
+                    with open(samples_path, 'rb') as samples:
+                        self.reused += 1
+                        return self.__mixer.Sound(buffer=samples.read())
+        except (FileNotFoundError, ValueError):
+            # A missing or corrupt entry just means decoding it again
+            pass
+
+        sound = self.__mixer.Sound(file=str(path))
+        self.decoded += 1
+        # Write the samples before the entry vouching for them, each to a
+        #   temporary file first, so a crash never leaves a bad entry behind
+        for target, data, mode in (
+            (samples_path, sound.get_raw(), 'wb'),
+            (meta_path, json.dumps(identity), 'w'),
+        ):
+            temp_path = target.with_suffix(target.suffix + '.part')
+            with open(temp_path, mode) as stream:
+                stream.write(data)
+            os.replace(temp_path, target)
+        return sound
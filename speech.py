@@ -0,0 +1,409 @@
+import subprocess
+from collections import deque
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
+
+# Voice every spoken response is synthesized with by gTTS
+SPEECH_LANG = 'en-uk'
+
+
+class SpeechBackend:
+    """Something that can turn text into encoded speech.
+
+    Subclasses set name, lang, and fmt, and implement stream.
+
+    Attributes:
+        name (str): Name clips from me are cached under.
+        lang (str): Language or voice I speak in.
+        fmt (str): Format (extension) of the clips I make, such as mp3.
+    """
+
+    name = None
+    lang = None
+    fmt = None
+
+    def stream(self, text):
+        """Synthesize text, yielding encoded parts as they are made.
+
+        Each part must be playable on its own, and all of them joined together
+        must make up the whole clip.
+
+        Args:
+            text (str): Text to speak.
+
+        Returns:
+            iterable: Bytes of each encoded part, in order.
+        """
+        raise NotImplementedError
+
+
+class GTTSBackend(SpeechBackend):
+    """Synthesizes speech with Google Translate's text-to-speech API (gTTS).
+
+    Sounds the best, but needs the network, and every part is a request.
+
+    Args:
+        lang (str): Language to speak in.
+    """
+
+    name = 'gtts'
+    fmt = 'mp3'
+
+    def __init__(self, lang=SPEECH_LANG):
+        # Only needed once I am actually used
+        from gtts import gTTS
+        self.__gtts = gTTS
+        self.lang = lang
+
+    def stream(self, text):
+        return self.__gtts(text, self.lang).stream()
+
+
+class EspeakBackend(SpeechBackend):
+    """Synthesizes speech offline with the eSpeak NG engine.
+
+    Sounds robotic, but never needs the network and is usually done well
+    before gTTS has answered. The whole clip is made as a single WAV part.
+
+    Args:
+        voice (str): eSpeak NG voice to speak with.
+        executable (str): eSpeak NG program to run.
+        timeout (float): Most seconds to let it run for.
+    """
+
+    name = 'espeak'
+    fmt = 'wav'
+
+    def __init__(self, voice='en-gb', executable='espeak-ng', timeout=10):
+        self.lang = voice
+        self.executable = executable
+        self.timeout = timeout
+
+    def stream(self, text):
+        # Raises FileNotFoundError if eSpeak NG isn't installed. The text is
+        #   read from stdin, so text starting with - is never an option
+        result = subprocess.run(
+            [self.executable, '-v', self.lang, '--stdout', '--stdin'],
+            input=text.encode('utf-8'), stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, timeout=self.timeout, check=True
+        )
+        return [result.stdout]
+
+
+class BackendStats:
+    """Rolling latency and health of a single speech backend.
+
+    Args:
+        window (int): How many of the latest latencies to remember.
+    """
+
+    def __init__(self, window):
+        # Seconds until the first part arrived, oldest first
+        self.latencies = deque(maxlen=window)
+        self.failures = 0
+        # When a failed backend may be tried again, in monotonic seconds
+        self.retry_at = 0.0
+
+    def percentile(self, percent):
+        """Returns a percentile of my latencies, or 0 if I have none.
+
+        Args:
+            percent (float): Percentile to return, from 0 to 100.
+
+        Returns:
+            float: The latency in seconds, using the nearest rank.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = round(percent / 100 * (len(ordered) - 1))
+        return ordered[rank]
+
+
+class BackendSelector:
+    """Chooses which speech backend to synthesize each utterance with.
+
+    Tracks each backend's rolling p50 and p95 latency (until its first part
+    arrived) and routes to the fastest healthy backend, where a backend that
+    fails is unhealthy for cooldown seconds. A backend listed earlier is
+    preferred unless another is faster by more than slack seconds, so a
+    better-sounding backend isn't dropped over a few milliseconds. Backends
+    that haven't been measured yet count as instant, so each gets tried.
+
+    Args:
+        backends (list): SpeechBackends to choose from, most preferred first.
+        window (int): How many of each backend's latest latencies to remember.
+        cooldown (float): Seconds a failed backend is avoided for.
+        slack (float): Seconds a preferred backend may be slower by.
+
+    Raises:
+        ValueError: If there are no backends.
+    """
+
+    def __init__(self, backends, window=50, cooldown=60, slack=0.5):
+        if not backends:
+            raise ValueError('At least one speech backend is needed.')
+        self.backends = list(backends)
+        self.cooldown = cooldown
+        self.slack = slack
+        self.__stats = {
+            backend.name: BackendStats(window) for backend in self.backends
+        }
+        self.__lock = Lock()
+
+    def rank(self):
+        """Returns every backend, in the order they should be tried.
+
+        The chosen backend comes first, then the other healthy backends from
+        fastest to slowest, then the unhealthy ones, soonest retried first.
+
+        Returns:
+            list: The SpeechBackends.
+        """
+        now = monotonic()
+        with self.__lock:
+            healthy = [
+                backend for backend in self.backends
+                if self.__stats[backend.name].retry_at <= now
+            ]
+            unhealthy = sorted(
+                (b for b in self.backends if b not in healthy),
+                key=lambda b: self.__stats[b.name].retry_at
+            )
+            if not healthy:
+                return unhealthy
+
+            # Sorting is stable, so ties keep my order of preference
+            healthy.sort(key=lambda b: self.__stats[b.name].percentile(50))
+            fastest = self.__stats[healthy[0].name].percentile(50)
+            chosen = next(
+                backend for backend in self.backends
+                if backend in healthy and
+                self.__stats[backend.name].percentile(50)
+                <= fastest + self.slack
+            )
+            healthy.remove(chosen)
+            return [chosen] + healthy + unhealthy
+
+    def record(self, backend, seconds):
+        """Remember how long a backend took, which also makes it healthy.
+
+        Args:
+            backend (SpeechBackend): Backend that synthesized something.
+            seconds (float): How long until its first part arrived.
+        """
+        with self.__lock:
+            stats = self.__stats[backend.name]
+            stats.latencies.append(seconds)
+            stats.retry_at = 0.0
+
+    def fail(self, backend):
+        """Remember that a backend failed, avoiding it for a while.
+
+        Args:
+            backend (SpeechBackend): Backend that failed.
+        """
+        with self.__lock:
+            stats = self.__stats[backend.name]
+            stats.failures += 1
+            stats.retry_at = monotonic() + self.cooldown
+
+    def get_stats(self):
+        """Returns a dict mapping backend names to how they have been doing."""
+        now = monotonic()
+        with self.__lock:
+            return {
+                name: {
+                    'samples': len(stats.latencies),
+                    'p50': stats.percentile(50),
+                    'p95': stats.percentile(95),
+                    'failures': stats.failures,
+                    'healthy': stats.retry_at <= now,
+                }
+                for name, stats in self.__stats.items()
+            }
+
+
+class Synthesizer:
+    """Turns text into speech clips, reusing cached clips whenever it can.
+
+    Kept apart from the Body so that background helpers (like the prefetcher
+    or the Brain's joke reservoir) can synthesize speech ahead of time without
+    holding on to the Body.
+
+    Each utterance is synthesized by whichever backend my selector picks. If
+    that backend fails before making anything, the next one is tried, so I
+    keep talking even when the network is down.
+
+    Args:
+        cache (SpeechCache): Where synthesized clips are stored.
+        selector (BackendSelector): Chooses the backend for each utterance.
+            Defaults to only using gTTS.
+    """
+
+    def __init__(self, cache, selector=None):
+        self.cache = cache
+        self.selector = selector or BackendSelector([GTTSBackend()])
+
+    def synthesize(self, desire):
+        """Returns the path of a clip speaking the given text.
+
+        Reuses a cached clip if I have said this before; otherwise synthesizes
+        it and caches the result.
+
+        Args:
+            desire (str): Text to speak.
+
+        Returns:
+            str: Path to the clip.
+
+        Raises:
+            Exception: Whatever the last backend raised, if every one failed.
+        """
+        path = self.__cached(desire)
+        if path is None:
+            backend, clip = self.__synthesize_whole(desire)
+            path = self.cache.put(
+                desire, backend.lang, backend.name, clip, backend.fmt
+            )
+        return path
+
+    def render(self, desire):
+        """Returns a clip speaking the given text, synthesized all at once.
+
+        Reuses a cached clip if I have said this before; otherwise synthesizes
+        it and caches the result, returning it straight from memory.
+
+        Args:
+            desire (str): Text to speak.
+
+        Returns:
+            str or bytes: The cached clip's path, or the newly synthesized
+                encoded clip.
+
+        Raises:
+            Exception: Whatever the last backend raised, if every one failed.
+        """
+        path = self.__cached(desire)
+        if path is not None:
+            return path
+        backend, clip = self.__synthesize_whole(desire)
+        self.cache.put(desire, backend.lang, backend.name, clip, backend.fmt)
+        return clip
+
+    def stream(self, desire):
+        """Returns an iterable of clips speaking the given text, in order.
+
+        If I have said this before, the iterable only holds the cached clip's
+        path. Otherwise, the chosen backend synthesizes the text on a
+        background thread one part (a sentence or so) at a time, and the
+        iterable yields each part as bytes as soon as it arrives, so it can be
+        played while the rest is still being synthesized. Every part that
+        arrived while the one before was playing is joined into a single clip,
+        so they play without a gap between each. Nothing is written to disk
+        until every part has arrived, when the whole clip is cached.
+
+        Args:
+            desire (str): Text to speak.
+
+        Returns:
+            iterable: Paths or bytes of encoded clips. Raises whatever
+                synthesis raised once it reaches the failed part.
+        """
+        path = self.__cached(desire)
+        if path is not None:
+            return [path]
+        parts = Queue()
+        Thread(
+            target=self.__produce, args=(desire, parts),
+            name='xavier-synthesizer', daemon=True
+        ).start()
+        return self.__consume(parts)
+
+    # Helpers #
+    def __cached(self, desire):
+        """Returns the path of a clip of desire from any backend, or None."""
+        return self.cache.find(desire, [
+            (backend.lang, backend.name, backend.fmt)
+            for backend in self.selector.rank()
+        ])
+
+    def __timed(self, backend, desire):
+        """Yield backend's parts of desire, telling my selector how it went."""
+        start = monotonic()
+        first = True
+        try:
+            for part in backend.stream(desire):
+                if first:
+                    self.selector.record(backend, monotonic() - start)
+                    first = False
+                yield part
+        except Exception:
+            self.selector.fail(backend)
+            raise
+
+    def __synthesize_whole(self, desire):
+        """Returns the backend that synthesized desire and the whole clip."""
+        error = None
+        for backend in self.selector.rank():
+            try:
+                return backend, b''.join(self.__timed(backend, desire))
+            except Exception as e:
+                error = e
+        raise error
+
+    def __produce(self, desire, parts):
+        """Synthesize desire part by part into the queue, then cache it.
+
+        Ends the queue with None, or with the exception that stopped it.
+        """
+        error = None
+        for backend in self.selector.rank():
+            synthesized = []
+            try:
+                for part in self.__timed(backend, desire):
+                    parts.put(part)
+                    synthesized.append(part)
+            except Exception as e:
+                error = e
+                if synthesized:
+                    # Some of it was already played; too late to switch voices
+                    break
+                continue
+            # Cache it before ending the stream, so asking again once it has
+            #   played always finds it (but end the stream regardless)
+            try:
+                self.cache.put(
+                    desire, backend.lang, backend.name,
+                    b''.join(synthesized), backend.fmt
+                )
+            finally:
+                parts.put(None)
+            return
+        parts.put(error)
+
+    @staticmethod
+    def __consume(parts):
+        """Yield parts from the queue until it ends, raising its exception.
+
+        Waits for a part only if none are ready; otherwise yields every ready
+        part joined together, which backends guarantee is still playable.
+        """
+        while True:
+            ready = [parts.get()]
+            while isinstance(ready[-1], bytes):
+                try:
+                    ready.append(parts.get_nowait())
+                except Empty:
+                    break
+            # Only the last one can have ended the queue
+            end = ready[-1]
+            if not isinstance(end, bytes):
+                ready.pop()
+            if ready:
+                yield b''.join(ready)
+            if end is None:
+                return
+            if isinstance(end, Exception):
+                raise end
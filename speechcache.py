@@ -0,0 +1,198 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+
+class SpeechCache:
+    """Content-addressed, size-bounded store of synthesized speech.
+
+    Each clip is keyed by the text that was spoken, the language it was spoken
+    in, and the backend that synthesized it, so the same sentence is only ever
+    synthesized once. Clips keep the extension of their format (like mp3 or
+    wav), since different backends encode them differently. Clips are kept on
+    disk so they survive restarts, while an in-memory index remembers their
+    sizes in least-recently-used order. Once the clips take up more than
+    max_bytes, the least recently used ones are deleted until they fit again.
+
+    Args:
+        directory (str): Directory to store clips in. Created if it doesn't
+            exist. Clips already in it are reused.
+        max_bytes (int): Most bytes all stored clips may take up together.
+    """
+
+    def __init__(self, directory='cache/speech', max_bytes=50 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        # Remember how useful I have been
+        self.hits = 0
+        self.misses = 0
+
+        # Maps clip file names to their sizes, least recently used first
+        self.__index = OrderedDict()
+        self.total_bytes = 0
+        # Commands may speak from more than one thread
+        self.__lock = Lock()
+        self.__load_index()
+
+    def __load_index(self):
+        """Rebuild my index from the clips already on disk.
+
+        Uses each clip's modification time as its last use, since hits touch
+        the file.
+        """
+        clips = []
+        for path in self.directory.iterdir():
+            # Skip half-written clips and anything that isn't mine
+            if path.suffix == '.part' or path.name.startswith('.'):
+                continue
+            stat = path.stat()
+            clips.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(clips):
+            self.__index[name] = size
+            self.total_bytes += size
+        self.__evict()
+
+    # Helpers #
+    @staticmethod
+    def make_key(text, lang, backend):
+        """Returns the key a clip is stored under.
+
+        Args:
+            text (str): Text that was spoken.
+            lang (str): Language it was spoken in.
+            backend (str): Name of the backend that synthesized it.
+
+        Returns:
+            str: Hex digest identifying the clip.
+        """
+        # Separate the fields with a character none of them can contain
+        identity = '\0'.join((backend, lang, text))
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def __name_for(self, text, lang, backend, fmt):
+        """Returns the file name of a clip."""
+        return '{}.{}'.format(self.make_key(text, lang, backend), fmt)
+
+    def __evict(self):
+        """Delete least recently used clips until I fit in max_bytes.
+
+        Never evicts the most recently used clip, since it is about to be
+        played. Must be called while holding my lock (or during init).
+        """
+        while self.total_bytes > self.max_bytes and len(self.__index) > 1:
+            name, size = self.__index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.directory / name)
+            except FileNotFoundError:
+                pass
+
+    # Lookups #
+    def get(self, text, lang, backend, fmt='mp3'):
+        """Returns the path of a cached clip, or None if I don't have it.
+
+        Args:
+            text (str): Text that was spoken.
+            lang (str): Language it was spoken in.
+            backend (str): Name of the backend that synthesized it.
+            fmt (str): Format (extension) the backend encodes clips in.
+
+        Returns:
+            str: Path to the clip, or None on a miss.
+        """
+        return self.find(text, [(lang, backend, fmt)])
+
+    def find(self, text, sources):
+        """Returns the path of the first cached clip of text from any of the
+        given sources, or None if I have none of them.
+
+        Counts as a single hit or miss, however many sources are checked.
+
+        Args:
+            text (str): Text that was spoken.
+            sources (iterable): (lang, backend, fmt) tuples, as passed to
+                get, to check in order.
+
+        Returns:
+            str: Path to the clip, or None on a miss.
+        """
+        names = [
+            self.__name_for(text, lang, backend, fmt)
+            for lang, backend, fmt in sources
+        ]
+        with self.__lock:
+            for name in names:
+                path = self.__touch(name)
+                if path is not None:
+                    self.hits += 1
+                    return str(path)
+            self.misses += 1
+        return None
+
+    def __touch(self, name):
+        """Returns the path of a clip, marking it as just used, or None if I
+        don't have it. Must be called while holding my lock.
+        """
+        if name not in self.__index:
+            return None
+        path = self.directory / name
+        try:
+            # Touch the clip so its last use survives a restart
+            os.utime(path)
+        except FileNotFoundError:
+            # Someone removed it behind my back; forget about it
+            self.total_bytes -= self.__index.pop(name)
+            return None
+        self.__index.move_to_end(name)
+        return path
+
+    def put(self, text, lang, backend, data, fmt='mp3'):
+        """Store a synthesized clip and return its path.
+
+        Args:
+            text (str): Text that was spoken.
+            lang (str): Language it was spoken in.
+            backend (str): Name of the backend that synthesized it.
+            data (bytes): The encoded clip.
+            fmt (str): Format (extension) data is encoded in.
+
+        Returns:
+            str: Path to the stored clip.
+        """
+        name = self.__name_for(text, lang, backend, fmt)
+        path = self.directory / name
+        # Write to a temporary file first so a crash never leaves half a clip.
+        #   Each writer gets its own, since the same text may be stored from
+        #   several threads at once (such as warming while streaming it)
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=self.directory, prefix=name + '.', suffix='.part'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as stream:
+                stream.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        with self.__lock:
+            self.total_bytes -= self.__index.pop(name, 0)
+            self.__index[name] = len(data)
+            self.total_bytes += len(data)
+            self.__evict()
+        return str(path)
+
+    def get_stats(self):
+        """Returns a dict describing how well I have been doing."""
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'clips': len(self.__index),
+                'bytes': self.total_bytes,
+            }
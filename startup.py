@@ -0,0 +1,135 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from threading import Lock, current_thread
+from time import monotonic
+
+
+class Startup:
+    """Times each step of starting up, running independent steps at once.
+
+    Steps handed to run together each get their own thread, so together they
+    take as long as the slowest of them rather than all of them added up.
+    Every step, whether timed with step or run, is recorded with when it
+    started (in seconds since startup began) and how long it took, so report
+    shows where startup's time went. Once startup is finished, the timings are
+    dumped to a JSON file and, if asked for, the report is printed.
+
+    Args:
+        started_at (float): When startup began, as given by time.monotonic.
+            Defaults to now, but passing when the program itself started
+            counts its imports too.
+        path (str): JSON file to dump timings to once finished. Nothing is
+            dumped if None.
+        echo (bool): Whether to print the report once finished.
+    """
+
+    def __init__(self, started_at=None, path=None, echo=False):
+        self.started_at = monotonic() if started_at is None else started_at
+        self.path = Path(path) if path else None
+        self.echo = echo
+        # Dicts holding each step's name, start, seconds, and thread
+        self.__timings = []
+        self.__lock = Lock()
+
+    @contextmanager
+    def step(self, name):
+        """Record how long this takes as a step of startup.
+
+        Args:
+            name (str): Name of the step.
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.__record(name, start, monotonic() - start)
+
+    def run(self, **steps):
+        """Run independent steps at once, each on its own thread.
+
+        Args:
+            steps (dict): Maps each step's name to a callable taking no
+                arguments that performs it.
+
+        Returns:
+            dict: Maps each step's name to what its callable returned.
+
+        Raises:
+            Exception: Whatever the first failed step (in the order given)
+                raised, once every step is done.
+        """
+        def timed(name, func):
+            with self.step(name):
+                return func()
+
+        with ThreadPoolExecutor(
+            len(steps), thread_name_prefix='xavier-startup'
+        ) as pool:
+            futures = {
+                name: pool.submit(timed, name, func)
+                for name, func in steps.items()
+            }
+        return {name: future.result() for name, future in futures.items()}
+
+    def finish(self, name='listening'):
+        """Mark startup as finished, then dump and print my timings.
+
+        Args:
+            name (str): What startup finished with.
+        """
+        self.__record(name, monotonic(), 0.0)
+        self.dump()
+        if self.echo:
+            print(self.report())
+
+    def timings(self):
+        """Returns a list of dicts holding each step's name, start, seconds,
+        and thread, in the order they started.
+        """
+        with self.__lock:
+            return sorted(
+                (dict(timing) for timing in self.__timings),
+                key=lambda timing: timing['start']
+            )
+
+    def report(self):
+        """Returns a table of when each step started and how long it took."""
+        lines = ['{:<12} {:>8} {:>8}  {}'.format(
+            'step', 'start', 'seconds', 'thread'
+        )]
+        for timing in self.timings():
+            lines.append('{:<12} {:>7.3f}s {:>7.3f}s  {}'.format(
+                timing['name'], timing['start'], timing['seconds'],
+                timing['thread']
+            ))
+        return '\n'.join(lines)
+
+    def dump(self):
+        """Write my timings to my file, if I have one."""
+        if not self.path:
+            return
+        document = {
+            'dumped_on': str(datetime.now()),
+            'steps': self.timings(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never corrupts it
+        temp_path = self.path.with_suffix('.part')
+        with open(temp_path, 'w') as stream:
+            json.dump(document, stream, indent=2)
+        os.replace(temp_path, self.path)
+
+    # Helpers #
+    def __record(self, name, start, seconds):
+        """Record a step that started at start (from monotonic)."""
+        with self.__lock:
+            self.__timings.append({
+                'name': name,
+                'start': start - self.started_at,
+                'seconds': seconds,
+                'thread': current_thread().name,
+            })
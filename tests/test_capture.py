@@ -0,0 +1,92 @@
+import unittest
+import os
+import wave
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep
+from capture import AudioRing, Capture
+
+
+class TestAudioRing(unittest.TestCase):
+    """Runs tests on the AudioRing and its readers."""
+
+    def test_readers(self):
+        """Tests that every reader reads every chunk, in order."""
+        _ring = AudioRing(64)
+        _first, _second = _ring.reader(), _ring.reader()
+        for _chunk in (b'one', b'two', b'three'):
+            _ring.write(_chunk, captured_at=len(_chunk))
+        for _reader in (_first, _second):
+            self.assertEqual(
+                [(b'one', 3), (b'two', 3), (b'three', 5)],
+                [(bytes(_data), _at) for _data, _at in (
+                    _reader.read(0) for _ in range(3)
+                )]
+            )
+            self.assertIsNone(_reader.read(0))
+        # A new reader only reads what is written from then on
+        self.assertIsNone(_ring.reader().read(0))
+
+    def test_views(self):
+        """Tests that readers get views of the buffer, with chunks kept
+        whole when they would run past its end.
+        """
+        _ring = AudioRing(8)
+        _reader = _ring.reader()
+        _ring.write(b'abcde')
+        _data, _ = _reader.read(0)
+        self.assertIsInstance(_data, memoryview)
+        # Doesn't fit after abcde, so it starts over at the beginning
+        _ring.write(b'wxyz')
+        _view, _ = _reader.read(0)
+        self.assertEqual(b'wxyz', bytes(_view))
+        self.assertEqual(b'wxyze', bytes(_data))
+
+    def test_lapped(self):
+        """Tests that a reader left behind skips to the oldest chunk kept."""
+        _ring = AudioRing(8)
+        _reader = _ring.reader()
+        for _chunk in (b'aaaa', b'bbbb', b'cccc', b'dddd'):
+            _ring.write(_chunk)
+        self.assertEqual(b'cccc', bytes(_reader.read(0)[0]))
+        self.assertEqual(2, _reader.dropped)
+        self.assertEqual([b'cccc', b'dddd'],
+                         [bytes(_view) for _view in _ring.latest(5)])
+
+    def test_wakes(self):
+        """Tests that a waiting reader wakes as soon as a chunk is written."""
+        _ring = AudioRing(64)
+        _reader = _ring.reader()
+        _writer = Thread(target=lambda: (sleep(0.05), _ring.write(b'hi')))
+        _writer.start()
+        self.assertEqual(b'hi', bytes(_reader.read(5)[0]))
+        _writer.join()
+
+    def test_too_big(self):
+        """Tests that a chunk bigger than the buffer is refused."""
+        with self.assertRaises(ValueError):
+            AudioRing(4).write(b'hello')
+
+
+class TestCapture(unittest.TestCase):
+    """Runs tests on the Capture."""
+
+    def test_dump(self):
+        """Tests that the last few seconds captured can be saved."""
+        _capture = Capture(rate=100, seconds=10)
+        for _second in range(8):
+            _capture.ring.write(bytes([_second]) * 200)
+        with TemporaryDirectory() as _directory:
+            _path = os.path.join(_directory, 'audio', 'last.wav')
+            _capture.dump(_path, seconds=5)
+            with wave.open(_path, 'rb') as _stream:
+                self.assertEqual(100, _stream.getframerate())
+                self.assertEqual(2, _stream.getsampwidth())
+                _frames = _stream.readframes(_stream.getnframes())
+        self.assertEqual(b''.join(
+            bytes([_second]) * 200 for _second in range(3, 8)
+        ), _frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
+from unittest.mock import MagicMock, call, patch
 from core import Body
-from command import HomeCommand
+from command import HomeCommand, announce
+from enums import CommandPolicy
 
 
 class TestCommand(unittest.TestCase):
@@ -11,13 +13,97 @@ class TestCommand(unittest.TestCase):
 
         May fail if changes are made to the default version of this project.
         """
-        _pin_mapping = {"thinking": 10, "lamp": 11}
-        _result = HomeCommand.get_commands()
+        _result = HomeCommand.find(Body)
         self.assertIn(Body.joke, _result)
         self.assertEqual(_result[Body.joke], 0.5)
         self.assertIn(Body.weather_tomorrow_brief, _result)
         self.assertEqual(_result[Body.weather_tomorrow_brief], 0.5)
 
+    def test_find_per_class(self):
+        """Tests that commands are found per class, with overrides replacing
+        what they override, rather than recorded globally.
+        """
+        class _Base:
+            @HomeCommand(0.4)
+            def lamp(self):
+                pass
+
+            @HomeCommand(0.5)
+            def time(self):
+                pass
+
+        class _Child(_Base):
+            @HomeCommand(0.6)
+            def time(self):
+                pass
+
+        _result = HomeCommand.find(_Child)
+        self.assertEqual([_Base.lamp, _Child.time], list(_result))
+        self.assertEqual([0.4, 0.6], list(_result.values()))
+        self.assertNotIn(_Base.lamp, HomeCommand.find(Body))
+
+    @patch('command.randint', return_value=1)
+    def test_failure_releases_led(self, _randint):
+        """Tests that a command failing unrecoverably still releases its
+        hold on the thinking LED.
+        """
+        @HomeCommand(0.5)
+        def _broken(body):
+            raise KeyError('periods')
+
+        @HomeCommand(0.5, sound='akuwhat')
+        def _broken_sound(body):
+            raise KeyError('periods')
+
+        for _command in (_broken, _broken_sound):
+            _body = MagicMock()
+            _body.profiler.enabled = False
+            with self.assertRaises(KeyError):
+                _command(_body)
+            self.assertEqual(
+                [call(True), call(False)], _body.set_thinking.call_args_list
+            )
+
+    def test_immediate_is_silent(self):
+        """Tests that IMMEDIATE commands can't play sounds, and that their
+        failures are proclaimed from the AUDIO lane.
+        """
+        with self.assertRaises(ValueError):
+            HomeCommand(0.5, 'akuwhat', CommandPolicy.IMMEDIATE)
+        for _command in HomeCommand.find(Body):
+            if _command.policy == CommandPolicy.IMMEDIATE:
+                self.assertIsNone(_command.sound)
+
+        @HomeCommand(0.5, policy=CommandPolicy.IMMEDIATE)
+        def _broken(body):
+            raise KeyError('periods')
+
+        _body = MagicMock()
+        _body.profiler.enabled = False
+        with self.assertRaises(KeyError):
+            _broken(_body)
+        _body.report_error.assert_not_called()
+        _announce, _proclaim = _body.executor.submit.call_args[0]
+        self.assertIs(announce, _announce)
+        _proclaim()
+        _body.report_error.assert_called_once_with('_broken', 'Key Error')
+
+    def test_prefetch_failed(self):
+        """Tests that prefetch failures are logged under the command being
+        warmed, with their own traceback.
+        """
+        _logger = MagicMock()
+        try:
+            raise ConnectionError('offline')
+        except ConnectionError as e:
+            _error = e
+        Body._Body__prefetch_failed(_logger, 'joke', _error)
+        Body._Body__prefetch_failed(_logger, None, _error)
+        (_first, _trace), _ = _logger.log_warn.call_args_list[0]
+        self.assertEqual('joke', _first)
+        self.assertIn('ConnectionError: offline', _trace)
+        self.assertEqual('prefetch', _logger.log_warn.call_args_list[1][0][0])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,158 @@
+import json
+import unittest
+from http.client import HTTPConnection
+from threading import Barrier, Event, Thread
+from time import sleep
+from commandserver import CommandServer
+from enums import CommandPolicy
+from executor import CommandExecutor
+from registry import CommandRegistry
+
+
+def make_command(name, policy, action):
+    """Returns a command with the given name and policy that runs action."""
+    def command(body):
+        return action()
+    command.__name__ = name
+    command.policy = policy
+    command.sensitivity = 0.5
+    return command
+
+
+class FakeBody:
+    """Stands in for a Body, with a real executor."""
+
+    def __init__(self):
+        self.executor = CommandExecutor(immediate_workers=2, max_queued=2)
+
+
+class TestCommandServer(unittest.TestCase):
+    """Runs tests on the CommandServer."""
+
+    def setUp(self):
+        """Serve a few commands on any free port."""
+        self.release = Event()
+        self.barrier = Barrier(2, timeout=5)
+        self.body = FakeBody()
+        _commands = [
+            make_command('time', CommandPolicy.AUDIO, lambda: 'noon'),
+            make_command(
+                'weather', CommandPolicy.AUDIO, lambda: self.release.wait(5)
+            ),
+            make_command('lamp', CommandPolicy.IMMEDIATE, self.barrier.wait),
+            make_command(
+                'broken', CommandPolicy.IMMEDIATE, lambda: {}['periods']
+            ),
+        ]
+        self.registry = CommandRegistry(
+            self.body, {_command: 0.5 for _command in _commands}
+        )
+        self.server = CommandServer(self.registry, port=0, timeout=5)
+        self.server.start()
+        self.addCleanup(self.body.executor.shutdown)
+        self.addCleanup(self.release.set)
+        self.addCleanup(self.server.stop)
+
+    def request(self, method, path, connection=None):
+        """Returns the status and JSON content of the answer to a request."""
+        _connection = connection or HTTPConnection(*self.server.address)
+        _connection.request(method, path)
+        _response = _connection.getresponse()
+        _content = json.loads(_response.read())
+        if connection is None:
+            _connection.close()
+        return _response.status, _content
+
+    def test_run(self):
+        """Tests that a command's result and timing are answered with, over
+        one connection.
+        """
+        _connection = HTTPConnection(*self.server.address)
+        self.addCleanup(_connection.close)
+        for _ in range(2):
+            _status, _content = self.request(
+                'POST', '/commands/time', _connection
+            )
+            self.assertEqual(200, _status)
+            self.assertEqual('noon', _content['result'])
+            self.assertLessEqual(
+                _content['waited'] + _content['seconds'], _content['total']
+            )
+        _metrics = self.body.executor.get_metrics()
+        self.assertEqual(2, _metrics['commands']['time']['runs'])
+
+    def test_list(self):
+        """Tests that every command is listed, and unknown ones aren't
+        found.
+        """
+        self.assertEqual(
+            (200, {'commands': ['time', 'weather', 'lamp', 'broken']}),
+            self.request('GET', '/commands')
+        )
+        self.assertEqual(404, self.request('POST', '/commands/neat')[0])
+        self.assertEqual(404, self.request('GET', '/neat')[0])
+
+    def test_concurrent(self):
+        """Tests that requests are answered at once, not one at a time."""
+        _answers = []
+        _threads = [
+            Thread(target=lambda: _answers.append(
+                self.request('POST', '/commands/lamp')[0]
+            ))
+            for _ in range(2)
+        ]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+        # Each lamp command only finishes once the other is running too
+        self.assertEqual([200, 200], _answers)
+
+    def test_queued(self):
+        """Tests answering once queued, and that full lanes drop commands."""
+        self.assertEqual(
+            202, self.request('POST', '/commands/weather?wait=0')[0]
+        )
+        # Once the first weather is running, two more fit in its lane, and
+        #   then there is no room
+        while not self.body.executor.get_metrics()['commands']['weather'][
+                'runs']:
+            sleep(0.01)
+        for _ in range(2):
+            self.assertEqual(
+                202, self.request('POST', '/commands/weather?wait=0')[0]
+            )
+        self.assertEqual(503, self.request('POST', '/commands/time')[0])
+        self.release.set()
+        # There is room again once the queued weathers have run
+        while self.body.executor.get_metrics()['commands']['weather'][
+                'runs'] < 3:
+            sleep(0.01)
+        self.assertEqual(200, self.request('POST', '/commands/time')[0])
+
+    def test_bad_length(self):
+        """Tests that a request with an invalid Content-Length is refused,
+        and the server keeps answering.
+        """
+        _connection = HTTPConnection(*self.server.address)
+        self.addCleanup(_connection.close)
+        for _length in ('many', '-1'):
+            _connection.putrequest('POST', '/commands/time')
+            _connection.putheader('Content-Length', _length)
+            _connection.endheaders()
+            _response = _connection.getresponse()
+            _response.read()
+            self.assertEqual(400, _response.status)
+            _connection.close()
+        self.assertEqual(200, self.request('POST', '/commands/time')[0])
+
+    def test_failure(self):
+        """Tests that a command's unrecoverable exception is answered with."""
+        _status, _content = self.request('POST', '/commands/broken')
+        self.assertEqual(500, _status)
+        self.assertIn('KeyError', _content['error'])
+        self.assertIsInstance(self.body.executor.failure, KeyError)
+
+
+if __name__ == '__main__':
+    unittest.main()
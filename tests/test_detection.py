@@ -0,0 +1,357 @@
+import unittest
+import sys
+from pathlib import Path
+from threading import Event, Thread
+from types import ModuleType
+from time import monotonic, sleep
+from detection import LocalDetector, ShardedDetector
+
+
+class SnowboyDetect:
+    """Stands in for snowboydetect.SnowboyDetect in each shard's process.
+
+    Hears every one of its models named in a chunk starting with HOTWORD and
+    a comma-separated list of names, answering with the first, unless its
+    sensitivity is 0. Stalls for a while on a chunk starting with STALL and
+    one of its models' names. Fails to load a model named broken.
+    """
+
+    def __init__(self, resource_filename, model_str):
+        self.models = [
+            Path(model).stem for model in model_str.decode().split(',')
+        ]
+        if 'broken' in self.models:
+            raise RuntimeError('Invalid model file')
+        self.sensitivity = [0.5] * len(self.models)
+
+    def SetAudioGain(self, gain):
+        pass
+
+    def SetSensitivity(self, sensitivity_str):
+        self.sensitivity = [
+            float(value) for value in sensitivity_str.decode().split(',')
+        ]
+
+    def GetSensitivity(self):
+        return ','.join(str(value) for value in self.sensitivity)
+
+    def SampleRate(self):
+        return 16000
+
+    def NumChannels(self):
+        return 1
+
+    def NumHotwords(self):
+        return len(self.models)
+
+    def BitsPerSample(self):
+        return 16
+
+    def Reset(self):
+        pass
+
+    def RunDetection(self, data):
+        if data.startswith(b'STALL:') and data[6:].decode() in self.models:
+            sleep(2)
+        if not data.startswith(b'HOTWORD:'):
+            return 0
+        for name in data[8:].decode().split(','):
+            if name in self.models:
+                index = self.models.index(name)
+                if self.sensitivity[index]:
+                    return index + 1
+        return 0
+
+
+class FakeGate:
+    """Stands in for a VoiceGate, passing on only chunks with hotwords."""
+
+    def __init__(self):
+        self.opened = False
+        self.dropped = 0
+
+    def process(self, data):
+        # Every hotword is its own utterance, so the gate opens for each
+        data = bytes(data)
+        self.opened = data.startswith(b'HOTWORD:')
+        if not self.opened:
+            self.dropped += 1
+            return b''
+        return data
+
+
+class FakeStream:
+    """Stands in for a pyaudio stream; say and hush capture chunks."""
+
+    def __init__(self, stream_callback, **kwargs):
+        self.callback = stream_callback
+
+    def say(self, *names):
+        chunk = 'HOTWORD:{}'.format(','.join(names)).encode()
+        self.callback(chunk, len(chunk) // 2, dict(), 0)
+
+    def stall(self, name):
+        chunk = 'STALL:{}'.format(name).encode()
+        self.callback(chunk, len(chunk) // 2, dict(), 0)
+
+    def hush(self, size=64):
+        chunk = bytes(size)
+        self.callback(chunk, len(chunk) // 2, dict(), 0)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePyAudio:
+    """Stands in for pyaudio.PyAudio, remembering the last stream opened."""
+
+    stream = None
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, **kwargs):
+        FakePyAudio.stream = FakeStream(**kwargs)
+        return FakePyAudio.stream
+
+    def terminate(self):
+        pass
+
+
+class TestShardedDetector(unittest.TestCase):
+    """Runs tests on the ShardedDetector, with this module as its engine."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Stand in for pyaudio."""
+        cls.pyaudio = sys.modules.get('pyaudio')
+        _module = ModuleType('pyaudio')
+        _module.PyAudio = FakePyAudio
+        _module.paContinue = 0
+        sys.modules['pyaudio'] = _module
+
+    @classmethod
+    def tearDownClass(cls):
+        """Put pyaudio back, if it was there."""
+        if cls.pyaudio is None:
+            del sys.modules['pyaudio']
+        else:
+            sys.modules['pyaudio'] = cls.pyaudio
+
+    def listen(self, names, **kwargs):
+        """Start detecting the named models on a thread.
+
+        Returns:
+            tuple: The detector, a list its detections are appended to, and
+                an event set on each detection.
+        """
+        _detector = ShardedDetector(
+            ['models/{}.pmdl'.format(_name) for _name in names],
+            resource='common.res', engine='test_detection', **kwargs
+        )
+        _heard = []
+        _woken = Event()
+        _stopped = Event()
+
+        def _hear(name):
+            _heard.append(name)
+            _woken.set()
+
+        _callbacks = [lambda name=_name: _hear(name) for _name in names]
+        _thread = Thread(target=_detector.start, kwargs={
+            'detected_callback': _callbacks,
+            'interrupt_check': _stopped.is_set, 'sleep_time': 0.01,
+        })
+        _thread.start()
+
+        def _stop():
+            _stopped.set()
+            _thread.join()
+            _detector.terminate()
+        self.addCleanup(_stop)
+        # Wait for it to start capturing
+        while FakePyAudio.stream is None:
+            sleep(0.01)
+        return _detector, _heard, _woken
+
+    def setUp(self):
+        """Forget the last stream opened."""
+        FakePyAudio.stream = None
+
+    def test_shards(self):
+        """Tests that models are spread over shards and all detected."""
+        _detector, _heard, _woken = self.listen(
+            ['a', 'b', 'c', 'd'], shards=2, refractory=0.0, merge_window=0.05
+        )
+        self.assertEqual(2, len(_detector.pids))
+        self.assertEqual((16000, 1, 16), _detector.audio_format)
+        for _name in ('d', 'a', 'c'):
+            _woken.clear()
+            FakePyAudio.stream.say(_name)
+            self.assertTrue(_woken.wait(5))
+        self.assertEqual(['d', 'a', 'c'], _heard)
+
+    def test_merge(self):
+        """Tests that one utterance heard by several shards is merged."""
+        _detector, _heard, _woken = self.listen(
+            ['a', 'b', 'c', 'd'], shards=2, merge_window=0.2
+        )
+        # Heard by both shards; the earlier model wins
+        FakePyAudio.stream.say('d', 'b')
+        self.assertTrue(_woken.wait(5))
+        _woken.clear()
+        # Captured too soon after to be a new utterance
+        FakePyAudio.stream.say('c')
+        self.assertFalse(_woken.wait(0.5))
+        self.assertEqual(['b'], _heard)
+
+    def test_gate(self):
+        """Tests that only audio the gate passes on reaches the shards."""
+        _gate = FakeGate()
+        _detector, _heard, _woken = self.listen(
+            ['a', 'b'], shards=2, refractory=0.0, gate=_gate
+        )
+        for _name in ('b', 'a'):
+            FakePyAudio.stream.hush()
+            _woken.clear()
+            FakePyAudio.stream.say(_name)
+            self.assertTrue(_woken.wait(5))
+        self.assertEqual(['b', 'a'], _heard)
+        self.assertEqual(2, _gate.dropped)
+
+    def test_hot_swap(self):
+        """Tests that models are added, retuned, and removed while
+        detecting, leaving the other shards alone.
+        """
+        _detector, _heard, _woken = self.listen(
+            ['a', 'b'], shards=1, refractory=0.0
+        )
+        _pids = _detector.pids
+        self.assertEqual(2, _detector.add_model(
+            'models/c.pmdl', callback=lambda: (_heard.append('c'),
+                                               _woken.set())
+        ))
+        self.assertEqual(_pids, _detector.pids[:1])
+        self.assertEqual(2, len(_detector.pids))
+        _detector.set_sensitivity(0, 0.0)
+        _detector.remove_model(1)
+        for _name in ('a', 'b', 'c'):
+            FakePyAudio.stream.say(_name)
+        self.assertTrue(_woken.wait(5))
+        # Give any wrong detection time to come in
+        sleep(0.3)
+        self.assertEqual(['c'], _heard)
+        # The first shard ends once none of its models are left
+        _detector.remove_model(0)
+        self.assertEqual(1, len(_detector.pids))
+        with self.assertRaises(KeyError):
+            _detector.remove_model(0)
+
+    def test_slow_shard(self):
+        """Tests that a shard slow to take its audio doesn't hold up
+        retuning the others.
+        """
+        _detector, _heard, _woken = self.listen(
+            ['a', 'b'], shards=2, refractory=0.0
+        )
+        FakePyAudio.stream.stall('a')
+        # More than its pipe holds, so handing it over waits for the shard
+        FakePyAudio.stream.hush(1 << 18)
+        sleep(0.3)
+        _started = monotonic()
+        _detector.set_sensitivity(1, 0.0)
+        self.assertEqual(2, len(_detector.pids))
+        self.assertLess(monotonic() - _started, 1.0)
+
+    def test_failed_shard(self):
+        """Tests that a shard failing to load its models is reported."""
+        with self.assertRaises(RuntimeError):
+            ShardedDetector(
+                ['models/a.pmdl', 'models/broken.pmdl'],
+                resource='common.res', engine='test_detection', shards=2,
+                timeout=10
+            )
+
+
+class TestLocalDetector(unittest.TestCase):
+    """Runs tests on the LocalDetector, with this module as its engine."""
+
+    setUpClass = TestShardedDetector.setUpClass
+    tearDownClass = TestShardedDetector.tearDownClass
+
+    def listen(self, names):
+        """Start detecting the named models on a thread.
+
+        Returns:
+            tuple: The detector, a list its detections are appended to, and
+                an event set on each detection.
+        """
+        FakePyAudio.stream = None
+        _detector = LocalDetector(
+            ['models/{}.pmdl'.format(_name) for _name in names],
+            resource='common.res', engine='test_detection'
+        )
+        _heard = []
+        _woken = Event()
+        _stopped = Event()
+        _thread = Thread(target=_detector.start, kwargs={
+            'detected_callback': [
+                lambda name=_name: (_heard.append(name), _woken.set())
+                for _name in names
+            ],
+            'interrupt_check': _stopped.is_set,
+            # Never check for audio again on my own
+            'sleep_time': 60,
+        })
+        _thread.start()
+
+        def _stop():
+            _stopped.set()
+            # Wake it up to see it should stop
+            FakePyAudio.stream.hush()
+            _thread.join()
+            _detector.terminate()
+        self.addCleanup(_stop)
+        while FakePyAudio.stream is None:
+            sleep(0.01)
+        return _detector, _heard, _woken
+
+    def test_detect(self):
+        """Tests that hotwords are detected as soon as they are captured."""
+        _detector, _heard, _woken = self.listen(['a', 'b'])
+        self.assertEqual((16000, 1, 16), _detector.audio_format)
+        FakePyAudio.stream.hush()
+        FakePyAudio.stream.say('b')
+        self.assertTrue(_woken.wait(5))
+        self.assertEqual(['b'], _heard)
+
+    def test_hot_swap(self):
+        """Tests that models are added, retuned, and removed while
+        detecting.
+        """
+        _detector, _heard, _woken = self.listen(['a', 'b'])
+        self.assertEqual(2, _detector.add_model(
+            'models/c.pmdl', callback=lambda: (_heard.append('c'),
+                                               _woken.set())
+        ))
+        _detector.set_sensitivity(0, 0.0)
+        _detector.remove_model(1)
+        for _name in ('a', 'b', 'c'):
+            FakePyAudio.stream.say(_name)
+        self.assertTrue(_woken.wait(5))
+        self.assertEqual(['c'], _heard)
+        # Every model is still heard together with the others
+        _detector.set_sensitivity(0, 0.5)
+        _woken.clear()
+        FakePyAudio.stream.say('a', 'c')
+        self.assertTrue(_woken.wait(5))
+        self.assertEqual(['c', 'a'], _heard)
+        with self.assertRaises(KeyError):
+            _detector.set_sensitivity(1, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+from threading import Event
+from executor import CommandExecutor
+from enums import CommandPolicy
+from tracing import Tracer
+
+
+def make_command(name, policy, action):
+    """Returns a command with the given name and policy that runs action."""
+    def command(*args, **kwargs):
+        return action(*args, **kwargs)
+    command.__name__ = name
+    command.policy = policy
+    return command
+
+
+class TestCommandExecutor(unittest.TestCase):
+    """Runs tests on the CommandExecutor."""
+
+    def setUp(self):
+        """Create a new executor for each test."""
+        self.executor = CommandExecutor(immediate_workers=2, max_queued=2)
+        # Set by tests to let blocked commands finish
+        self.release = Event()
+
+    def tearDown(self):
+        """Release any blocked commands and stop the workers."""
+        self.release.set()
+        self.executor.shutdown()
+
+    def test_immediate_runs_during_audio(self):
+        """Tests that an IMMEDIATE command is not stuck behind an AUDIO one."""
+        _started = Event()
+        _toggled = Event()
+
+        def _broadcast():
+            _started.set()
+            self.release.wait(5)
+        _weather = make_command('weather', CommandPolicy.AUDIO, _broadcast)
+        _lamp = make_command('lamp', CommandPolicy.IMMEDIATE, _toggled.set)
+
+        self.assertTrue(self.executor.submit(_weather))
+        self.assertTrue(_started.wait(1))
+        self.assertTrue(self.executor.submit(_lamp))
+        self.assertTrue(_toggled.wait(1))
+
+    def test_audio_is_serialized(self):
+        """Tests that AUDIO commands run one at a time, in order."""
+        _order = []
+        _started = Event()
+        _done = Event()
+
+        def _say(word):
+            _started.set()
+            self.release.wait(5)
+            _order.append(word)
+            if len(_order) == 3:
+                _done.set()
+        _say_command = make_command('say', CommandPolicy.AUDIO, _say)
+
+        # Submitting never blocks, even though the first command is stuck
+        self.assertTrue(self.executor.submit(_say_command, 'one'))
+        self.assertTrue(_started.wait(1))
+        for word in ('two', 'three'):
+            self.assertTrue(self.executor.submit(_say_command, word))
+        self.release.set()
+        self.assertTrue(_done.wait(1))
+        self.assertEqual(['one', 'two', 'three'], _order)
+
+    def test_drops_and_metrics(self):
+        """Tests that a full lane drops commands and the metrics count it."""
+        _started = Event()
+
+        def _block():
+            _started.set()
+            self.release.wait(5)
+        _joke = make_command('joke', CommandPolicy.AUDIO, _block)
+
+        self.executor.submit(_joke)
+        self.assertTrue(_started.wait(1))
+        # One is running, so two more fill the lane and the fourth is dropped
+        self.assertTrue(self.executor.submit(_joke))
+        self.assertTrue(self.executor.submit(_joke))
+        self.assertFalse(self.executor.submit(_joke))
+
+        _metrics = self.executor.get_metrics()
+        self.assertEqual(2, _metrics['depth'][CommandPolicy.AUDIO])
+        self.assertEqual(2, _metrics['max_depth'][CommandPolicy.AUDIO])
+        self.assertEqual(3, _metrics['commands']['joke']['submitted'])
+        self.assertEqual(1, _metrics['commands']['joke']['dropped'])
+        self.assertEqual(1, _metrics['commands']['joke']['runs'])
+
+    def test_failure(self):
+        """Tests that an escaping exception is kept for the listener."""
+        _done = Event()
+
+        def _explode():
+            _done.set()
+            raise KeyError('periods')
+        _weather = make_command('weather', CommandPolicy.AUDIO, _explode)
+
+        self.executor.submit(_weather)
+        self.assertTrue(_done.wait(1))
+        self.executor.shutdown()
+        self.assertIsInstance(self.executor.failure, KeyError)
+
+    def test_outcome(self):
+        """Tests that each command's future holds what it returned and how
+        long it took, or what it raised, and that cancelling skips it.
+        """
+        _started = Event()
+        _weather = make_command(
+            'weather', CommandPolicy.AUDIO,
+            lambda: _started.set() or self.release.wait(5)
+        )
+        _joke = make_command('joke', CommandPolicy.AUDIO, lambda: 'a joke')
+        _blocked = self.executor.submit(_weather)
+        # So both jokes fit in the lane behind it
+        self.assertTrue(_started.wait(5))
+        _cancelled = self.executor.submit(_joke)
+        self.assertTrue(_cancelled.cancel())
+        _future = self.executor.submit(_joke)
+        self.release.set()
+        _outcome = _future.result(5)
+        self.assertEqual('a joke', _outcome.result)
+        self.assertGreater(_outcome.waited, 0)
+        self.assertGreaterEqual(_outcome.seconds, 0)
+        self.assertTrue(_blocked.result(5).result)
+        self.assertEqual(
+            1, self.executor.get_metrics()['commands']['joke']['runs']
+        )
+
+        _failing = self.executor.submit(make_command(
+            'time', CommandPolicy.IMMEDIATE, lambda: {}['periods']
+        ))
+        with self.assertRaises(KeyError):
+            _failing.result(5)
+
+    def test_traces_detection(self):
+        """Tests that each command's wait to start is traced."""
+        _tracer = Tracer()
+        _executor = CommandExecutor(tracer=_tracer)
+        _ran = Event()
+        _executor.submit(make_command('neat', CommandPolicy.AUDIO, _ran.set))
+        _ran.wait(5)
+        _executor.shutdown()
+        self.assertEqual(
+            1, _tracer.snapshot()['neat']['detection']['count']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+import os
+from email.utils import formatdate
+from tempfile import TemporaryDirectory
+from threading import Thread
+import requests.exceptions
+from requests.structures import CaseInsensitiveDict
+from forecastcache import ForecastCache
+
+URL = 'https://api.weather.gov/points/37.232191,-80.423165/forecast'
+
+
+class FakeResponse:
+    """Stands in for a requests.Response."""
+
+    def __init__(self, status_code, headers, document=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.document = document
+        # Counts how many times the body was parsed
+        self.parses = 0
+
+    def json(self):
+        self.parses += 1
+        return self.document
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class FakeSession:
+    """Stands in for requests, answering with queued responses, or raising
+    queued exceptions. Calls during, if set, while answering.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.during = None
+
+    def get(self, url, headers=None):
+        self.requests.append((url, headers))
+        if self.during:
+            self.during()
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestForecastCache(unittest.TestCase):
+    """Runs tests on the ForecastCache."""
+
+    def setUp(self):
+        """Give each test its own persistence file."""
+        self.tempdir = TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'forecasts.json')
+
+    def tearDown(self):
+        """Delete the persistence file."""
+        self.tempdir.cleanup()
+
+    def test_fresh_hit(self):
+        """Tests that a fresh document is reused without any requests."""
+        _response = FakeResponse(
+            200, {'Cache-Control': 'public, max-age=600'}, {'periods': []}
+        )
+        _session = FakeSession(_response)
+        _cache = ForecastCache(self.path, _session)
+
+        _first = _cache.get(URL)
+        _second = _cache.get(URL)
+        self.assertIs(_first, _second)
+        self.assertEqual(1, len(_session.requests))
+        self.assertEqual(1, _response.parses)
+        self.assertEqual(1, _cache.hits)
+
+    def test_revalidation(self):
+        """Tests that a stale document is revalidated with its validators."""
+        _modified = formatdate(usegmt=True)
+        _session = FakeSession(
+            FakeResponse(200, {
+                'Cache-Control': 'max-age=0',
+                'ETag': '"abc"',
+                'Last-Modified': _modified,
+            }, {'periods': ['today']}),
+            FakeResponse(304, {'Cache-Control': 'max-age=600'}),
+        )
+        _cache = ForecastCache(self.path, _session)
+
+        _first = _cache.get(URL)
+        _second = _cache.get(URL)
+        self.assertIs(_first, _second)
+        _, _headers = _session.requests[1]
+        self.assertEqual('"abc"', _headers['If-None-Match'])
+        self.assertEqual(_modified, _headers['If-Modified-Since'])
+        self.assertEqual(1, _cache.revalidations)
+
+        # The 304 made the document fresh again
+        _cache.get(URL)
+        self.assertEqual(2, len(_session.requests))
+
+    def test_expires(self):
+        """Tests that Expires is honored relative to the server's Date."""
+        _session = FakeSession(FakeResponse(200, {
+            'Date': 'Mon, 17 Dec 2018 12:00:00 GMT',
+            'Expires': 'Mon, 17 Dec 2018 12:10:00 GMT',
+        }, {'periods': []}))
+        _cache = ForecastCache(self.path, _session)
+
+        _cache.get(URL)
+        _cache.get(URL)
+        self.assertEqual(1, len(_session.requests))
+
+    def test_no_store(self):
+        """Tests that no-store documents are never kept."""
+        _session = FakeSession(
+            FakeResponse(200, {'Cache-Control': 'no-store'}, {'a': 1}),
+            FakeResponse(200, {'Cache-Control': 'no-store'}, {'a': 2}),
+        )
+        _cache = ForecastCache(self.path, _session)
+
+        self.assertEqual({'a': 1}, _cache.get(URL))
+        self.assertEqual({'a': 2}, _cache.get(URL))
+        _, _headers = _session.requests[1]
+        self.assertNotIn('If-None-Match', _headers)
+
+    def test_error(self):
+        """Tests that errors are raised instead of cached."""
+        _session = FakeSession(FakeResponse(
+            404, {'Cache-Control': 'max-age=600'}, {'status': 404}
+        ))
+        _cache = ForecastCache(self.path, _session)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _cache.get(URL)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_on_failure(self):
+        """Tests that a stale document is returned when it can't be
+        revalidated, but not when a request says it is gone.
+        """
+        _session = FakeSession(
+            FakeResponse(200, {'Cache-Control': 'max-age=0'}, {'a': 1}),
+            requests.exceptions.ConnectionError(),
+            FakeResponse(503, {}, {'status': 503}),
+            FakeResponse(404, {}, {'status': 404}),
+        )
+        _cache = ForecastCache(self.path, _session)
+
+        _document = _cache.get(URL)
+        self.assertIs(_document, _cache.get(URL))
+        self.assertIs(_document, _cache.get(URL))
+        self.assertEqual(2, _cache.stale)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _cache.get(URL)
+
+    def test_unlocked_fetch(self):
+        """Tests that fresh documents are returned while another is being
+        fetched.
+        """
+        _session = FakeSession(
+            FakeResponse(200, {'Cache-Control': 'max-age=600'}, {'a': 1}),
+            FakeResponse(200, {'Cache-Control': 'max-age=600'}, {'b': 2}),
+        )
+        _cache = ForecastCache(self.path, _session)
+        _cache.get(URL)
+        _results = []
+
+        def _during():
+            _session.during = None
+            _thread = Thread(target=lambda: _results.append(_cache.get(URL)))
+            _thread.start()
+            _thread.join(1)
+        _session.during = _during
+        self.assertEqual({'b': 2}, _cache.get(URL + '/hourly'))
+        self.assertEqual([{'a': 1}], _results)
+
+    def test_persistence(self):
+        """Tests that a new cache reuses the documents an old one saved."""
+        _session = FakeSession(FakeResponse(
+            200, {'Cache-Control': 'max-age=600'}, {'periods': ['today']}
+        ))
+        ForecastCache(self.path, _session).get(URL)
+
+        _cache = ForecastCache(self.path, FakeSession())
+        self.assertEqual({'periods': ['today']}, _cache.get(URL))
+        self.assertEqual(1, _cache.hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
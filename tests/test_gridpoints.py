@@ -0,0 +1,89 @@
+import unittest
+import os
+from tempfile import TemporaryDirectory
+from gridpoints import GridpointResolver
+
+COORDS = {'x': '37.232191', 'y': '-80.423165'}
+
+
+class FakeResponse:
+    """Stands in for a successful requests.Response."""
+
+    def __init__(self, document):
+        self.document = document
+
+    def json(self):
+        return self.document
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Stands in for requests, answering every lookup with a new gridpoint."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url):
+        self.requests.append(url)
+        base = 'https://api.weather.gov/gridpoints/RNK/{}'.format(
+            len(self.requests)
+        )
+        return FakeResponse({'properties': {
+            'forecast': base + '/forecast',
+            'forecastHourly': base + '/forecast/hourly',
+        }})
+
+
+class TestGridpointResolver(unittest.TestCase):
+    """Runs tests on the GridpointResolver."""
+
+    def setUp(self):
+        """Give each test its own persistence file."""
+        self.tempdir = TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'gridpoints.json')
+
+    def tearDown(self):
+        """Delete the persistence file."""
+        self.tempdir.cleanup()
+
+    def test_resolve_once(self):
+        """Tests that a location is only looked up once."""
+        _session = FakeSession()
+        _resolver = GridpointResolver(self.path, _session)
+
+        _url = _resolver.forecast_url(COORDS)
+        self.assertEqual('https://api.weather.gov/gridpoints/RNK/1/forecast',
+                         _url)
+        self.assertEqual(_url, _resolver.forecast_url(COORDS))
+        self.assertTrue(
+            _resolver.forecast_url(COORDS, hourly=True).endswith('/hourly')
+        )
+        self.assertEqual(
+            ['https://api.weather.gov/points/37.232191,-80.423165'],
+            _session.requests
+        )
+
+    def test_persistence(self):
+        """Tests that a new resolver reuses an old one's lookups."""
+        GridpointResolver(self.path, FakeSession()).resolve(COORDS)
+
+        _session = FakeSession()
+        _resolver = GridpointResolver(self.path, _session)
+        self.assertIn('/RNK/1/', _resolver.forecast_url(COORDS))
+        self.assertEqual([], _session.requests)
+
+    def test_invalidate(self):
+        """Tests that an invalidated location is looked up again."""
+        _session = FakeSession()
+        _resolver = GridpointResolver(self.path, _session)
+
+        _resolver.resolve(COORDS)
+        _resolver.invalidate(COORDS)
+        self.assertIn('/RNK/2/', _resolver.forecast_url(COORDS))
+        self.assertEqual(2, len(_session.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+import json
+import os
+from tempfile import TemporaryDirectory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Barrier, Thread
+from time import sleep
+import requests.exceptions
+from httpclient import HttpClient
+from forecastcache import ForecastCache
+from gridpoints import GridpointResolver
+from jokes import JokeReservoir
+from brain import Brain
+from enums import WeatherDay
+
+POINTS = {'properties': {
+    'forecast': 'https://api.weather.gov/gridpoints/RNK/1,2/forecast',
+    'forecastHourly':
+        'https://api.weather.gov/gridpoints/RNK/1,2/forecast/hourly',
+}}
+FORECAST = {'properties': {'periods': [
+    {'name': 'Tonight', 'temperature': 30, 'windSpeed': '5 mph',
+     'shortForecast': 'Clear'},
+    {'name': 'Monday', 'temperature': 45, 'windSpeed': '10 to 25 mph',
+     'shortForecast': 'Mostly Cloudy'},
+]}}
+JOKES = {
+    'results': [{'id': 'a', 'joke': 'Bulk\u2019s joke.'}],
+    'total_pages': 1,
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like weather.gov and icanhazdadjoke.com, over keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 200
+        if self.path.startswith('/slow'):
+            sleep(1)
+            body = b'{}'
+        elif self.path.startswith('/gridpoints/OLD/'):
+            status = 404
+            body = b'{"status": 404}'
+        elif self.path.startswith('/points/'):
+            body = json.dumps(POINTS).encode()
+        elif self.path.startswith('/gridpoints/'):
+            body = json.dumps(FORECAST).encode()
+        elif self.path.startswith('/search'):
+            body = json.dumps(JOKES).encode()
+        else:
+            body = b'I\xe2\x80\x99m a joke.'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep the test output clean."""
+
+
+class TestHttpClient(unittest.TestCase):
+    """Runs tests on the HttpClient against a local stand-in server."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the stand-in server once for every test."""
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.base = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the stand-in server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Create a client routing both APIs to the stand-in server."""
+        self.client = HttpClient(read_timeout=0.2, host_overrides={
+            'api.weather.gov': self.base,
+            'icanhazdadjoke.com': self.base,
+        })
+
+    def tearDown(self):
+        """Close the client's connections."""
+        self.client.close()
+
+    def test_connection_reuse(self):
+        """Tests that requests to one host share a kept-alive connection."""
+        for _ in range(3):
+            self.client.get(POINTS['properties']['forecast'])
+        _stats = self.client.get_stats()['api.weather.gov']
+        self.assertEqual(3, _stats['requests'])
+        self.assertEqual(1, _stats['new_connections'])
+        self.assertEqual(2, _stats['reused_connections'])
+        self.assertGreater(_stats['max_ttfb'], 0)
+
+    def test_concurrent_connections(self):
+        """Tests that new connections are counted exactly, however many
+        requests are made at once.
+        """
+        _barrier = Barrier(6, timeout=5)
+
+        def _requests():
+            _barrier.wait()
+            for _ in range(3):
+                self.client.get(POINTS['properties']['forecast'])
+        _threads = [Thread(target=_requests) for _ in range(6)]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+
+        # Every pool counts each connection it ever opened
+        _pools = self.client.session.get_adapter(self.base).poolmanager.pools
+        _opened = sum(
+            _pools.get(_key).num_connections for _key in _pools.keys()
+        )
+        _stats = self.client.get_stats()['api.weather.gov']
+        self.assertEqual(18, _stats['requests'])
+        self.assertEqual(_opened, _stats['new_connections'])
+        self.assertEqual(18 - _opened, _stats['reused_connections'])
+
+    def test_timeout(self):
+        """Tests that a hung server times out instead of blocking forever."""
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.client.get('https://api.weather.gov/slow')
+
+    def test_brain(self):
+        """Tests the Brain's responses using only the stand-in server."""
+        _brain = Brain(
+            client=self.client,
+            forecast_cache=ForecastCache(None, session=self.client),
+            gridpoints=GridpointResolver(None, session=self.client),
+            jokes=JokeReservoir(session=self.client)
+        )
+        self.assertEqual('Mostly Cloudy',
+                         _brain.get_brief_broadcast(WeatherDay.TOMORROW))
+
+        # The reservoir starts empty, so a single joke is fetched directly
+        self.assertEqual("I'm a joke.", _brain.get_joke())
+        _brain.jokes.refill()
+        self.assertEqual("Bulk's joke.", _brain.get_joke())
+        _stats = self.client.get_stats()
+        self.assertIn('api.weather.gov', _stats)
+        self.assertIn('icanhazdadjoke.com', _stats)
+
+    def test_brain_moved_gridpoint(self):
+        """Tests that the Brain looks its location up again after a 404."""
+        with TemporaryDirectory() as _directory:
+            _path = os.path.join(_directory, 'gridpoints.json')
+            _old = 'https://api.weather.gov/gridpoints/OLD/1,2/forecast'
+            with open(_path, 'w') as stream:
+                json.dump({'37.232191,-80.423165': {
+                    'forecast': _old, 'forecastHourly': _old + '/hourly',
+                }}, stream)
+
+            _gridpoints = GridpointResolver(_path, session=self.client)
+            _brain = Brain(
+                client=self.client,
+                forecast_cache=ForecastCache(None, session=self.client),
+                gridpoints=_gridpoints
+            )
+            self.assertEqual('Clear',
+                             _brain.get_brief_broadcast(WeatherDay.TODAY))
+            self.assertEqual(POINTS['properties']['forecast'],
+                             _gridpoints.forecast_url(_brain.location_coords))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from threading import Event
+from jokes import JokeReservoir, clean_joke
+
+
+class FakeResponse:
+    """Stands in for a requests.Response holding a page of jokes."""
+
+    def __init__(self, document):
+        self.document = document
+
+    def json(self):
+        return self.document
+
+
+class FakeSession:
+    """Stands in for requests, serving pages of jokes from a fixed list.
+
+    Args:
+        jokes (list): (id, joke) pairs to serve.
+        page_size (int): How many jokes the API puts on each page.
+    """
+
+    def __init__(self, jokes, page_size):
+        self.jokes = jokes
+        self.page_size = page_size
+        self.requests = 0
+        self.served = Event()
+
+    def get(self, url, params=None, headers=None):
+        self.requests += 1
+        start = (params['page'] - 1) * self.page_size
+        page = self.jokes[start:start + self.page_size]
+        self.served.set()
+        return FakeResponse({
+            'results': [{'id': i, 'joke': joke} for i, joke in page],
+            'total_pages': -(-len(self.jokes) // self.page_size),
+        })
+
+
+class TestJokeReservoir(unittest.TestCase):
+    """Runs tests on the JokeReservoir."""
+
+    def test_clean_joke(self):
+        """Tests that jokes are repaired and flattened to a single line."""
+        _joke = 'Why\u2019d the duck\tcross?\r\nTo get to the\nother side.'
+        self.assertEqual("Why'd the duck cross? To get to the other side.",
+                         clean_joke(_joke))
+
+    def test_refill_and_take(self):
+        """Tests that a refill cleans jokes and take never repeats one."""
+        _jokes = [('a', 'One\u2019s joke.'), ('b', 'Two.'), ('c', 'Three.')]
+        _session = FakeSession(_jokes, page_size=3)
+        _reservoir = JokeReservoir(capacity=10, page_size=3, session=_session)
+
+        self.assertEqual(3, _reservoir.refill())
+        self.assertEqual(3, len(_reservoir))
+        _told = [_reservoir.take() for _ in range(3)]
+        self.assertEqual(["One's joke.", 'Two.', 'Three.'], _told)
+
+        # Every joke has been told lately, so none come back
+        self.assertEqual(0, _reservoir.refill())
+        self.assertIsNone(_reservoir.take())
+
+    def test_expiry(self):
+        """Tests that told jokes may be told again once they expire."""
+        _session = FakeSession([('a', 'One.')], page_size=1)
+        _reservoir = JokeReservoir(page_size=1, seen_days=0, session=_session)
+
+        _reservoir.refill()
+        self.assertEqual('One.', _reservoir.take())
+        # Taking it also wakes the background refill, which may add it back
+        #   before this one does
+        _reservoir.refill()
+        self.assertEqual(1, len(_reservoir))
+        self.assertEqual('One.', _reservoir.take())
+
+    def test_capacity(self):
+        """Tests that I never hold more than my capacity."""
+        _jokes = [(str(i), 'Joke {}.'.format(i)) for i in range(10)]
+        _session = FakeSession(_jokes, page_size=10)
+        _reservoir = JokeReservoir(capacity=4, page_size=10, session=_session)
+
+        _reservoir.refill()
+        self.assertEqual(4, len(_reservoir))
+
+    def test_background_warming(self):
+        """Tests that taking refills and warms in the background."""
+        _jokes = [(str(i), 'Joke {}.'.format(i)) for i in range(5)]
+        _session = FakeSession(_jokes, page_size=5)
+        _warmed = []
+        _done = Event()
+
+        def _warm(joke):
+            _warmed.append(joke)
+            if len(_warmed) == 2:
+                _done.set()
+        _reservoir = JokeReservoir(capacity=5, low_water=2, page_size=5,
+                                   warm=_warm, num_warm=2, session=_session)
+
+        # Nothing is held yet, so the first take starts a refill
+        self.assertIsNone(_reservoir.take())
+        self.assertTrue(_done.wait(1))
+        self.assertEqual(['Joke 0.', 'Joke 1.'], _warmed)
+        self.assertEqual('Joke 0.', _reservoir.take())
+
+
+if __name__ == '__main__':
+    unittest.main()
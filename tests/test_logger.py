@@ -2,8 +2,43 @@ import unittest
 from unittest.mock import patch
 import re
 import os
+import json
+from glob import glob
 from io import StringIO
-from logger import Logger
+from threading import Event
+from time import sleep
+from logger import Logger, log_segments, open_segment
+from enums import OverflowPolicy
+
+
+class GatedStream(StringIO):
+    """Stands in for stdout, where writing waits until the gate is open."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = Event()
+        self.gate.set()
+        # Set once a write is waiting on the gate
+        self.waiting = Event()
+
+    def write(self, text):
+        if not self.gate.is_set():
+            self.waiting.set()
+            self.gate.wait()
+        return super().write(text)
+
+
+class FullStream(StringIO):
+    """Stands in for stdout, where writing fails while full is True."""
+
+    def __init__(self):
+        super().__init__()
+        self.full = False
+
+    def write(self, text):
+        if self.full:
+            raise OSError(28, 'No space left on device')
+        return super().write(text)
 
 
 class TestLogger(unittest.TestCase):
@@ -109,6 +144,223 @@ class TestLogger(unittest.TestCase):
         _actual = TestLogger.scrub_string(mock_stdout.getvalue())
         self.assertEqual(_expected, _actual)
 
+    def test_logger_async_file(self):
+        """Tests that logging asynchronously writes the same file."""
+        _outfile = 'logger_async_output.log'
+        _expected_file = 'resources/logger_file_expected.log'
+        _logger = Logger(_outfile, asynchronous=True, batch_size=4)
+
+        TestLogger.run_logs(_logger)
+        del _logger
+
+        _expected = TestLogger.read_file(_expected_file)
+        _scrubbed_name = TestLogger.scrub_file('logs/' + _outfile)
+        _actual = TestLogger.read_file(_scrubbed_name)
+        self.assertEqual(_expected, _actual)
+        os.remove(_scrubbed_name)
+
+    def test_logger_async_flush(self):
+        """Tests that queued records are written within the flush interval."""
+        _outfile = 'logger_flush_output.log'
+        _logger = Logger(_outfile, asynchronous=True, flush_interval=0.05)
+        _logger.log_info('neat', 'Played neat.')
+        # Far fewer records than a batch, but they waited long enough
+        for _ in range(50):
+            if 'Played neat.' in self.read_file('logs/' + _outfile):
+                break
+            sleep(0.02)
+        self.assertIn('Played neat.', self.read_file('logs/' + _outfile))
+        del _logger
+        os.remove('logs/' + _outfile)
+
+    def test_logger_json_lines(self):
+        """Tests the Logger's JSON Lines format, picked by the extension."""
+        _outfile = 'logger_json_output.jsonl'
+        _logger = Logger(_outfile, max_bytes=400)
+        TestLogger.run_logs(_logger)
+        _logger.log_info('time', "It's 7:30.", 0.25)
+        del _logger
+
+        _records = [
+            json.loads(_line)
+            for _text in self.read_segments('logs/' + _outfile)
+            for _line in _text.splitlines()
+        ]
+        self.assertEqual('start', _records[0]['event'])
+        self.assertEqual({'event': 'stop', 'commands': 5},
+                         {k: _records[-1][k] for k in ('event', 'commands')})
+        _commands = [_record for _record in _records if 'command' in _record]
+        self.assertEqual(
+            ['neat', 'why', 'date', 'toggle_lamp', 'joke', 'time', 'time'],
+            [_record['command'] for _record in _commands]
+        )
+        self.assertEqual('Played neat.', _commands[0]['output'])
+        self.assertEqual('WARN', _commands[4]['level'])
+        self.assertTrue(_commands[4]['stacktrace'].startswith('This is'))
+        self.assertEqual(0.25, _commands[-1]['duration'])
+        # Segments are bracketed by events, too
+        self.assertIn('segment_end', [_r.get('event') for _r in _records])
+
+        for _path in glob('logs/' + _outfile + '*'):
+            os.remove(_path)
+
+    @staticmethod
+    def read_segments(path):
+        """Returns the text of every segment of a log file, oldest first."""
+        _texts = []
+        for _segment in log_segments(path):
+            with open_segment(_segment) as _stream:
+                _texts.append(_stream.read())
+        return _texts
+
+    def test_logger_rotation(self):
+        """Tests that a session split into segments stays intact."""
+        _outfile = 'logger_rotation_output.log'
+        _logger = Logger(_outfile, max_bytes=200, backups=100)
+        for _ in range(3):
+            TestLogger.run_logs(_logger)
+        del _logger
+
+        _segments = self.read_segments('logs/' + _outfile)
+        self.assertGreater(len(_segments), 2)
+        for _path in log_segments('logs/' + _outfile)[:-1]:
+            self.assertTrue(_path.endswith('.gz'))
+        # Every segment is bracketed like a session
+        self.assertIn('Logger initialized on', _segments[0])
+        for _text in _segments[:-1]:
+            self.assertTrue(_text.endswith('-----------------\n'))
+            self.assertIn('Logger continued in next segment on', _text)
+        for _text in _segments[1:]:
+            self.assertTrue(_text.startswith(
+                '\n-----------------\nLogger continued from previous'
+            ))
+        self.assertIn('ran 12 commands', _segments[-1])
+
+        # Put back together, no record was lost or split
+        _whole = ''.join(_segments)
+        for _level, _count in (('[INFO', 12), ('[WARN', 3), ('[ERROR', 3)):
+            self.assertEqual(_count, _whole.count(_level))
+
+        for _path in glob('logs/' + _outfile + '*'):
+            os.remove(_path)
+
+    def test_logger_retention(self):
+        """Tests that only the newest rotated segments are kept."""
+        _outfile = 'logger_retention_output.log'
+        _logger = Logger(_outfile, max_bytes=100, backups=2)
+        for _ in range(3):
+            TestLogger.run_logs(_logger)
+        del _logger
+
+        _segments = self.read_segments('logs/' + _outfile)
+        self.assertEqual(3, len(_segments))
+        self.assertIn('ran 12 commands', _segments[-1])
+
+        for _path in glob('logs/' + _outfile + '*'):
+            os.remove(_path)
+
+    def test_logger_rotation_burst(self):
+        """Tests that rotating faster than segments compress keeps exactly
+        the newest ones, every one of them compressed.
+        """
+        _outfile = 'logger_burst_output.log'
+        _logger = Logger(_outfile, max_bytes=1, backups=3)
+        for _number in range(30):
+            _logger.log_info('neat', 'Played neat {}.'.format(_number))
+        del _logger
+
+        _paths = log_segments('logs/' + _outfile)
+        self.assertEqual(4, len(_paths))
+        for _path in _paths[:-1]:
+            self.assertTrue(_path.endswith('.gz'))
+        self.assertEqual([], glob('logs/' + _outfile + '*.part'))
+        self.assertIn('Played neat 29.', self.read_segments(
+            'logs/' + _outfile
+        )[-2])
+
+        for _path in glob('logs/' + _outfile + '*'):
+            os.remove(_path)
+
+    def test_logger_age(self):
+        """Tests that segments are rotated once they are old enough."""
+        _outfile = 'logger_age_output.log'
+        _logger = Logger(_outfile, max_age=0.05)
+        _logger.log_info('neat', 'Played neat.')
+        sleep(0.1)
+        _logger.log_info('why', 'Played why.')
+        del _logger
+
+        _segments = self.read_segments('logs/' + _outfile)
+        self.assertEqual(2, len(_segments))
+        self.assertIn('Played neat.', _segments[0])
+        self.assertIn('Played why.', _segments[1])
+
+        for _path in glob('logs/' + _outfile + '*'):
+            os.remove(_path)
+
+    @staticmethod
+    def overflow_logs(overflow, stream):
+        """Logs five commands while the writer is stuck on the first.
+
+        Returns the Logger's output and how many records it dropped.
+        """
+        _logger = Logger(asynchronous=True, max_queued=2, batch_size=1,
+                         overflow=overflow)
+        stream.gate.clear()
+        _logger.log_info('one', '1')
+        stream.waiting.wait()
+        for _name in ('two', 'three', 'four', 'five'):
+            _logger.log_info(_name, _name)
+        _dropped = _logger.dropped
+        stream.gate.set()
+        del _logger
+        return stream.getvalue(), _dropped
+
+    @patch('sys.stdout', new_callable=GatedStream)
+    def test_logger_count_drops(self, mock_stdout):
+        """Tests that new records are dropped and counted when full."""
+        _output, _dropped = self.overflow_logs(
+            OverflowPolicy.COUNT, mock_stdout
+        )
+        self.assertEqual(2, _dropped)
+        self.assertIn('Ran three command', _output)
+        self.assertNotIn('Ran four command', _output)
+        self.assertIn('ran 5 commands', _output)
+
+    @patch('sys.stdout', new_callable=GatedStream)
+    def test_logger_drop_oldest(self, mock_stdout):
+        """Tests that the oldest queued records make room for new ones."""
+        _output, _dropped = self.overflow_logs(
+            OverflowPolicy.DROP_OLDEST, mock_stdout
+        )
+        self.assertEqual(2, _dropped)
+        self.assertIn('Ran one command', _output)
+        self.assertNotIn('Ran three command', _output)
+        self.assertIn('Ran five command', _output)
+
+    @patch('sys.stdout', new_callable=FullStream)
+    def test_logger_write_fails(self, mock_stdout):
+        """Tests that the writer counts records it fails to write, and keeps
+        draining the queue instead of stalling every command.
+        """
+        _logger = Logger(asynchronous=True, max_queued=2, batch_size=1)
+        mock_stdout.full = True
+        # More than the queue holds, so these would block if the writer died
+        for _name in ('one', 'two', 'three', 'four', 'five'):
+            _logger.log_info(_name, _name)
+        for _ in range(50):
+            if _logger.failed == 5:
+                break
+            sleep(0.02)
+        self.assertEqual(5, _logger.failed)
+        mock_stdout.full = False
+        _logger.log_info('six', 'six')
+        del _logger
+        self.assertNotIn('Ran five command', mock_stdout.getvalue())
+        self.assertIn('Ran six command', mock_stdout.getvalue())
+        self.assertIn('ran 6 commands', mock_stdout.getvalue())
+
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import gzip
+import os
+from tempfile import TemporaryDirectory
+from logger import json_line
+from logquery import LogQuery, percentile
+
+
+def record(time, command, level='INFO', duration=0.5, **fields):
+    """Returns a command's record as the Logger writes it in JSON Lines."""
+    return json_line(time=time, level=level, command=command,
+                     duration=duration, **fields)
+
+
+class TestLogQuery(unittest.TestCase):
+    """Runs tests on the LogQuery."""
+
+    def setUp(self):
+        """Give each test its own log file."""
+        self.tempdir = TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'xavier.jsonl')
+        with open(self.path, 'w') as _stream:
+            _stream.write(json_line(event='start', time='2018-12-17 06:00'))
+            _stream.write(record('2018-12-17 07:31:02', 'weather', 'INFO', 1))
+            _stream.write(record('2018-12-17 07:33:00', 'date', 'INFO', 0.1))
+            _stream.write(record(
+                '2018-12-18 07:36:10', 'weather', 'WARN', 3,
+                stacktrace='requests.exceptions.ConnectionError'
+            ))
+            _stream.write(record('2018-12-19 07:40:00', 'weather', 'INFO', 2))
+
+    def tearDown(self):
+        """Delete the log file and its index."""
+        self.tempdir.cleanup()
+
+    def append(self, text):
+        """Append text to the log file."""
+        with open(self.path, 'a') as _stream:
+            _stream.write(text)
+
+    def test_percentile(self):
+        """Tests nearest-rank percentiles."""
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(2, percentile([3, 1, 2], 50))
+        self.assertEqual(95, percentile(list(range(101)), 95))
+
+    def test_stats(self):
+        """Tests counts, error rates, and latencies per command."""
+        _query = LogQuery(self.path)
+        _query.refresh()
+        _stats = _query.stats()
+        self.assertEqual({'weather', 'date'}, set(_stats))
+        self.assertEqual(3, _stats['weather']['count'])
+        self.assertEqual(1, _stats['weather']['errors'])
+        self.assertAlmostEqual(1 / 3, _stats['weather']['error_rate'])
+        self.assertEqual(2, _stats['weather']['p50'])
+        self.assertEqual(3, _stats['weather']['p95'])
+
+    def test_range(self):
+        """Tests limiting stats to a command and range of days."""
+        _query = LogQuery(self.path)
+        _query.refresh()
+        _stats = _query.stats('weather', since='2018-12-18')
+        self.assertEqual(['weather'], list(_stats))
+        self.assertEqual(2, _stats['weather']['count'])
+        _stats = _query.stats(until='2018-12-17')
+        self.assertEqual(1, _stats['weather']['count'])
+        self.assertEqual({}, _query.stats(since='2019-01-01'))
+
+    def test_records(self):
+        """Tests reading a command's full records by their offsets."""
+        _query = LogQuery(self.path)
+        _query.refresh()
+        _records = _query.records('weather', '2018-12-18', '2018-12-18')
+        self.assertEqual(1, len(_records))
+        self.assertEqual('requests.exceptions.ConnectionError',
+                         _records[0]['stacktrace'])
+        self.assertEqual(3, len(_query.records('weather')))
+
+    def test_incremental(self):
+        """Tests that only appended lines are read, and only once complete."""
+        _query = LogQuery(self.path)
+        _query.refresh()
+        _line = record('2018-12-20 07:30:00', 'date', 'ERROR', 0.2)
+        self.append(_line[:20])
+        _query.refresh()
+        self.assertEqual(1, _query.stats()['date']['count'])
+        self.append(_line[20:])
+        _query.refresh()
+        self.assertEqual(2, _query.stats()['date']['count'])
+
+        # A new query picks up where the saved index left off, so it never
+        #   rereads (or notices changes to) what was already indexed
+        with open(self.path, 'r+') as _stream:
+            _stream.write('x' * 40)
+        _query = LogQuery(self.path)
+        _query.refresh()
+        self.assertEqual(3, _query.stats()['weather']['count'])
+
+    def test_malformed(self):
+        """Tests that records missing what's needed are skipped, like lines
+        that aren't JSON.
+        """
+        self.append('{"command": "weather"}\n')
+        self.append('{"command": "weather", "time": 5, "level": "INFO"}\n')
+        self.append(record('2018-12-20 07:30:00', 'weather', 'DEBUG'))
+        self.append(record('2018-12-20 07:30:00', 'weather', duration='1s'))
+        self.append('{"command": "weather", "not json\n')
+        self.append(record('2018-12-20 07:31:00', 'weather', 'INFO', 1))
+        _query = LogQuery(self.path)
+        _query.refresh()
+        self.assertEqual(4, _query.stats()['weather']['count'])
+        self.assertEqual(
+            '2018-12-20 07:31:00', _query.records('weather')[-1]['time']
+        )
+
+    def test_records_after_rotation(self):
+        """Tests that records are read from where they are now, even if the
+        log was rotated since the last refresh.
+        """
+        _query = LogQuery(self.path)
+        _query.refresh()
+        os.rename(self.path, self.path + '.20181219-000000-000000')
+        self.append(json_line(event='segment_start', time='2018-12-20'))
+        self.append(record('2018-12-20 07:30:00', 'weather', 'INFO', 1))
+        _records = _query.records('weather')
+        self.assertEqual(4, len(_records))
+        self.assertEqual('2018-12-20 07:30:00', _records[-1]['time'])
+
+    def test_rotated(self):
+        """Tests that gzipped segments are indexed, and forgotten once
+        deleted.
+        """
+        _archive = self.path + '.20181219-000000-000000.gz'
+        with open(self.path, 'rb') as _source:
+            with gzip.open(_archive, 'wb') as _target:
+                _target.write(_source.read())
+        # The current segment was started over when it was rotated
+        os.remove(self.path)
+        self.append(record('2018-12-20 07:30:00', 'weather', 'INFO', 1))
+
+        _query = LogQuery(self.path)
+        _query.refresh()
+        self.assertEqual(4, _query.stats()['weather']['count'])
+        self.assertEqual(4, len(_query.records('weather')))
+
+        os.remove(_archive)
+        _query.refresh()
+        self.assertEqual(1, _query.stats()['weather']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from threading import Event
+from time import monotonic, sleep
+from pins import PinManager
+
+
+class FakeGPIO:
+    """Stands in for RPi.GPIO, recording every write and read.
+
+    Can be made to block writes until let go of.
+    """
+
+    def __init__(self, states):
+        self.states = dict(states)
+        self.writes = []
+        self.reads = 0
+        self.unblocked = Event()
+        self.unblocked.set()
+
+    def input(self, pin):
+        self.reads += 1
+        return int(self.states[pin])
+
+    def output(self, pins, values):
+        self.unblocked.wait()
+        self.writes.append((monotonic(), dict(zip(pins, values))))
+        self.states.update(zip(pins, values))
+
+
+class TestPinManager(unittest.TestCase):
+    """Runs tests on the PinManager."""
+
+    def setUp(self):
+        """Manage two pins, with the second starting on."""
+        self.gpio = FakeGPIO({10: 0, 11: 1})
+        self.pins = PinManager(self.gpio, [10, 11], min_hold=0.05)
+        self.addCleanup(self.pins.close)
+
+    def test_cached(self):
+        """Tests that pins are only read once, and written once changed."""
+        self.assertTrue(self.pins.toggle(10))
+        self.assertFalse(self.pins.toggle(11))
+        self.pins.set(10, True)
+        self.pins.flush(5)
+        self.assertEqual(2, self.gpio.reads)
+        self.assertEqual({10: True, 11: False}, self.gpio.states)
+        self.assertTrue(self.pins.get(10))
+        # Setting a pin to what it already is writes nothing
+        _count = len(self.gpio.writes)
+        self.pins.set(11, False)
+        self.pins.flush(5)
+        self.assertEqual(_count, len(self.gpio.writes))
+
+    def test_batched(self):
+        """Tests that posts made while writing are written together, and
+        that a pin flipped twice in between isn't written at all.
+        """
+        self.gpio.unblocked.clear()
+        self.pins.toggle(10)
+        sleep(0.05)
+        # The first write is stuck, so these are all posted meanwhile
+        self.pins.toggle(11)
+        self.pins.set(10, False)
+        self.pins.set(10, True)
+        self.gpio.unblocked.set()
+        self.pins.flush(5)
+        self.assertEqual(
+            [{10: True}, {11: False}],
+            [_write for _, _write in self.gpio.writes]
+        )
+
+    def test_returns_at_once(self):
+        """Tests that posting never waits on writing."""
+        self.gpio.unblocked.clear()
+        _start = monotonic()
+        self.pins.blink(10, times=3, period=0.1)
+        self.pins.toggle(11)
+        self.pins.hold(10)
+        self.assertLess(monotonic() - _start, 0.05)
+        self.gpio.unblocked.set()
+
+    def test_blink(self):
+        """Tests that blinking plays on the thread, then goes back to the
+        pin's state.
+        """
+        _start = monotonic()
+        self.pins.blink(11, times=3, period=0.1)
+        sleep(0.5)
+        self.assertEqual(
+            [False, True, False, True, False, True],
+            [_write[11] for _, _write in self.gpio.writes]
+        )
+        # The steps were spread over the blinking, not written at once
+        self.assertGreaterEqual(self.gpio.writes[-1][0] - _start, 0.3)
+
+    def test_hold(self):
+        """Tests that a held pin is on while any hold remains, and for at
+        least min_hold.
+        """
+        _held = monotonic()
+        self.pins.hold(10)
+        self.pins.hold(10)
+        self.pins.release(10)
+        self.pins.flush(5)
+        self.assertEqual(1, self.gpio.states[10])
+        _released = monotonic()
+        self.pins.release(10)
+        sleep(0.1)
+        self.assertEqual(0, self.gpio.states[10])
+        # Stayed on for min_hold, even though released right away
+        _on, _off = self.gpio.writes
+        self.assertTrue(_on[1][10])
+        self.assertGreaterEqual(_off[0] - _held, 0.05)
+        self.assertGreaterEqual(_off[0], _released)
+
+    def test_close(self):
+        """Tests that closing stops effects and writes every pin's state."""
+        self.pins.set(10, True)
+        self.pins.blink(11, times=50)
+        sleep(0.05)
+        self.pins.close()
+        self.assertEqual({10: True, 11: True}, self.gpio.states)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from threading import Lock
+from time import sleep
+from pipeline import SpeechPipeline, split_sentences
+
+
+class FakeSynthesizer:
+    """Stands in for a Synthesizer, recording what it was asked to do.
+
+    Each sentence takes longer to render the earlier it comes, so they finish
+    out of order.
+    """
+
+    def __init__(self):
+        self.rendered = []
+        self.synthesized = []
+        self.streamed = []
+        self.lock = Lock()
+
+    def render(self, sentence):
+        sleep(0.05 / (len(self.rendered) + 1))
+        with self.lock:
+            self.rendered.append(sentence)
+        return sentence.encode()
+
+    def synthesize(self, text):
+        self.synthesized.append(text)
+        return text + '.mp3'
+
+    def stream(self, text):
+        self.streamed.append(text)
+        return [text.encode()]
+
+
+class TestSpeechPipeline(unittest.TestCase):
+    """Runs tests on the SpeechPipeline and split_sentences."""
+
+    def setUp(self):
+        """Create a new pipeline with a fake synthesizer for each test."""
+        self.synthesizer = FakeSynthesizer()
+        self.pipeline = SpeechPipeline(self.synthesizer, workers=3,
+                                       lookahead=2)
+
+    def tearDown(self):
+        """Stop the pipeline's workers."""
+        self.pipeline.shutdown()
+
+    def test_split_sentences(self):
+        """Tests splitting text into sentences."""
+        _text = "Tonight, it's cool with a temperature of 40.5! " \
+            "It's a nice day, too!  Why?\nBecause."
+        self.assertEqual([
+            "Tonight, it's cool with a temperature of 40.5!",
+            "It's a nice day, too!", 'Why?', 'Because.'
+        ], split_sentences(_text))
+        self.assertEqual([], split_sentences('  '))
+
+    def test_in_order(self):
+        """Tests that sentences are yielded in order though they finish out of
+        order.
+        """
+        _text = 'One. Two! Three? Four. Five.'
+        _clips = list(self.pipeline.stream(_text))
+        self.assertEqual([b'One.', b'Two!', b'Three?', b'Four.', b'Five.'],
+                         _clips)
+
+    def test_lookahead(self):
+        """Tests that only lookahead sentences are synthesized ahead."""
+        _clips = self.pipeline.stream('One. Two. Three. Four. Five. Six.')
+        self.assertEqual(b'One.', next(_clips))
+        # While the first sentence plays, only two more may be synthesized
+        sleep(0.2)
+        self.assertEqual(3, len(self.synthesizer.rendered))
+        _clips.close()
+
+    def test_single_sentence(self):
+        """Tests that a single sentence is streamed by the synthesizer."""
+        self.assertEqual([b'Toggled lamp.'],
+                         list(self.pipeline.stream('Toggled lamp.')))
+        self.assertEqual(['Toggled lamp.'], self.synthesizer.streamed)
+        self.assertEqual([], self.synthesizer.rendered)
+
+    def test_warm(self):
+        """Tests that warming caches exactly what streaming would play."""
+        self.pipeline.warm('Why? Because.')
+        self.pipeline.warm('Toggled lamp.')
+        self.assertEqual(['Why?', 'Because.', 'Toggled lamp.'],
+                         self.synthesizer.synthesized)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from threading import Event
+from playback import Player
+
+
+class FakeMusic:
+    """Stands in for pygame.mixer.music.
+
+    Each clip plays until finish is called or the clip is stopped.
+    """
+
+    def __init__(self):
+        self.loaded = []
+        self.playing = False
+        self.started = Event()
+        self.namehints = []
+
+    def load(self, source, namehint=''):
+        # Remember in-memory clips by their contents
+        self.loaded.append(source if isinstance(source, str)
+                           else source.read())
+        self.namehints.append(namehint)
+
+    def play(self):
+        self.playing = True
+        self.started.set()
+
+    def stop(self):
+        self.playing = False
+
+    def get_busy(self):
+        return self.playing
+
+    def finish(self):
+        self.playing = False
+
+
+class TestPlayer(unittest.TestCase):
+    """Runs tests on the Player and its handles."""
+
+    def setUp(self):
+        """Create a new Player with a fake music stream for each test."""
+        self.music = FakeMusic()
+        self.player = Player(self.music, idle_path='idle.mp3', tick=0.01)
+
+    def tearDown(self):
+        """End the Player's thread."""
+        self.player.stop()
+
+    def test_fire_and_forget(self):
+        """Tests that a non-blocking play returns a handle to wait on."""
+        _handle = self.player.play('neat.mp3', block=False)
+        self.assertTrue(self.music.started.wait(1))
+        self.assertFalse(_handle.done)
+        self.assertTrue(self.player.busy)
+
+        self.music.finish()
+        self.assertTrue(_handle.wait(1))
+        self.assertFalse(_handle.cancelled)
+        # The idle clip is loaded once the clip finishes
+        self.assertEqual(['neat.mp3', 'idle.mp3'], self.music.loaded)
+
+    def test_cancel_playing(self):
+        """Tests that cancelling a playing clip stops it."""
+        _handle = self.player.play('why.mp3', block=False)
+        self.assertTrue(self.music.started.wait(1))
+        _handle.cancel()
+        self.assertTrue(_handle.wait(1))
+        self.assertTrue(_handle.cancelled)
+        self.assertFalse(self.music.playing)
+
+    def test_cancel_queued(self):
+        """Tests that a cancelled clip is skipped if it has not started yet."""
+        _first = self.player.play('neat.mp3', block=False)
+        _second = self.player.play('why.mp3', block=False)
+        self.assertTrue(self.music.started.wait(1))
+        _second.cancel()
+        self.assertTrue(_second.done)
+
+        self.music.finish()
+        self.assertTrue(_first.wait(1))
+        self.assertNotIn('why.mp3', self.music.loaded)
+
+    def test_blocking(self):
+        """Tests that a blocking play only returns once the clip is done."""
+        # Finishes every clip as soon as it starts
+        self.music.play = self.music.started.set
+        _handle = self.player.play('neat.mp3')
+        self.assertTrue(_handle.done)
+
+    def test_timestamps(self):
+        """Tests that handles remember when they started and finished."""
+        self.music.play = self.music.started.set
+        _handle = self.player.play('neat.mp3')
+        self.assertLessEqual(_handle.started_at, _handle.finished_at)
+
+        # A cancelled clip never started
+        self.player.stop()
+        _handle = self.player.play('why.mp3')
+        self.assertIsNone(_handle.started_at)
+
+    def test_stream(self):
+        """Tests that a stream of clips is played back to back, in order."""
+        self.music.play = self.music.started.set
+        _handle = self.player.play(iter([b'first', 'second.mp3', b'third']))
+        self.assertTrue(_handle.done)
+        self.assertEqual([b'first', 'second.mp3', b'third', 'idle.mp3'],
+                         self.music.loaded)
+
+    def test_stream_formats(self):
+        """Tests that in-memory clips are loaded with their format."""
+        self.music.play = self.music.started.set
+        self.player.play([b'\xff\xf3mp3', b'RIFF\x24\x00\x00\x00WAVE'])
+        self.assertEqual(['mp3', 'wav', ''], self.music.namehints)
+
+    def test_stream_error(self):
+        """Tests that a failing stream's exception reaches the caller."""
+        self.music.play = self.music.started.set
+
+        def _clips():
+            yield b'first'
+            raise ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.player.play(_clips())
+        # The player survives to play the next clip
+        self.assertTrue(self.player.play('neat.mp3').done)
+
+    def test_idle_fails(self):
+        """Tests that a play still finishes if the idle clip fails to load."""
+        def _load(source, namehint=''):
+            if source == 'idle.mp3':
+                raise RuntimeError('Unable to open file')
+            self.music.loaded.append(source)
+        self.music.load = _load
+        _handle = self.player.play('neat.mp3', block=False)
+        self.assertTrue(self.music.started.wait(1))
+        self.music.finish()
+        self.assertTrue(_handle.wait(1))
+        self.assertIsInstance(_handle.error, RuntimeError)
+        # The player survives to play the next clip
+        self.music.started.clear()
+        _handle = self.player.play('neat.mp3', block=False)
+        self.assertTrue(self.music.started.wait(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import gzip
+import os
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from threading import Event
+from logquery import LogQuery
+from prefetch import UsageProfile, Prefetcher
+
+# Three weekday mornings of history, as the Logger writes it
+HISTORY = """
+-----------------
+Logger initialized on 2018-12-17 06:00:00.000000.
+[INFO : 2018-12-17 07:31:02.123456] Ran weather_today_full command, output: \
+Today, it's cool with a temperature of 40!
+[INFO : 2018-12-17 07:33:45.000001] Ran date command, output: Monday.
+[INFO : 2018-12-18 07:36:10.654321] Ran weather_today_full command, output: \
+Today, it's cool with a temperature of 41!
+[WARN : 2018-12-19 07:40:00.000000] Command weather_today_full threw an \
+exception:
+    Traceback (most recent call last):
+    requests.exceptions.ConnectionError
+[INFO : 2018-12-19 21:00:00] Ran joke command, output: Why?
+Logger closed on 2018-12-19 22:00:00.000000, ran 4 commands.
+-----------------
+"""
+
+
+class TestPrefetch(unittest.TestCase):
+    """Runs tests on the UsageProfile and Prefetcher."""
+
+    def setUp(self):
+        """Write the history to a log file for each test."""
+        self.tempdir = TemporaryDirectory()
+        self.log_path = os.path.join(self.tempdir.name, 'xavier.log')
+        with open(self.log_path, 'w') as stream:
+            stream.write(HISTORY)
+        # A weekday morning, ten minutes before the usual weather
+        self.morning = datetime(2018, 12, 20, 7, 25)
+
+    def tearDown(self):
+        """Delete the log file."""
+        self.tempdir.cleanup()
+
+    def test_profile(self):
+        """Tests the profile learned from the log."""
+        _profile = UsageProfile.from_log(self.log_path)
+        _at = datetime(2018, 12, 20, 7, 35)
+        _weather = 'weather_today_full'
+        self.assertAlmostEqual(1.0, _profile.likelihood(_weather, _at))
+        self.assertAlmostEqual(1 / 3, _profile.likelihood('date', _at))
+        self.assertEqual(0.0, _profile.likelihood('joke', _at))
+        # Weekends are learned separately
+        _saturday = datetime(2018, 12, 22, 7, 35)
+        self.assertEqual(0.0, _profile.likelihood(_weather, _saturday))
+
+    def test_rotated_log(self):
+        """Tests that the profile is learned from rotated segments, too."""
+        _split = HISTORY.index('[INFO : 2018-12-18')
+        _archive = self.log_path + '.20181218-000000-000000.gz'
+        with gzip.open(_archive, 'wt') as _stream:
+            _stream.write(HISTORY[:_split])
+        with open(self.log_path, 'w') as _stream:
+            _stream.write(HISTORY[_split:])
+
+        _profile = UsageProfile.from_log(self.log_path)
+        _at = datetime(2018, 12, 20, 7, 35)
+        self.assertAlmostEqual(1.0, _profile.likelihood(
+            'weather_today_full', _at
+        ))
+        self.assertAlmostEqual(1 / 3, _profile.likelihood('date', _at))
+
+    def test_json_log(self):
+        """Tests that the profile is learned from JSON Lines logs, too."""
+        with open(self.log_path, 'w') as _stream:
+            _stream.write(
+                '{"event": "start", "time": "2018-12-17 06:00:00"}\n'
+                '{"time": "2018-12-17 07:31:02.123456", "level": "INFO", '
+                '"command": "weather_today_full", "duration": 1.5, '
+                '"output": "Today, it\'s cool."}\n'
+            )
+        _profile = UsageProfile.from_log(self.log_path)
+        self.assertEqual(['weather_today_full'], _profile.commands)
+
+    def test_indexed_log(self):
+        """Tests that JSON Lines logs are learned from through their index."""
+        _path = os.path.join(self.tempdir.name, 'xavier.jsonl')
+        with open(_path, 'w') as _stream:
+            for _day in (17, 18):
+                _stream.write(
+                    '{"time": "2018-12-%d 07:31:02", "level": "INFO", '
+                    '"command": "weather_today_full", "output": "Cool."}\n'
+                    % _day
+                )
+        _profile = UsageProfile.from_index(LogQuery(_path))
+        self.assertAlmostEqual(1.0, _profile.likelihood(
+            'weather_today_full', datetime(2018, 12, 20, 7, 35)
+        ))
+        self.assertTrue(os.path.isdir(_path + '.idx'))
+
+    def test_missing_log(self):
+        """Tests that a missing log makes an empty profile."""
+        _profile = UsageProfile.from_log(self.log_path + '.missing')
+        self.assertEqual([], _profile.commands)
+
+    def test_check(self):
+        """Tests that likely commands are warmed once per slot."""
+        _warmed = []
+        _prefetcher = Prefetcher(self.log_path, {
+            'weather_today_full': lambda: _warmed.append('weather'),
+            'date': lambda: _warmed.append('date'),
+            'joke': lambda: _warmed.append('joke'),
+        }, threshold=0.5)
+
+        self.assertEqual(['weather_today_full'],
+                         _prefetcher.check(self.morning))
+        # Already warmed for this slot
+        self.assertEqual([], _prefetcher.check(self.morning))
+        self.assertEqual(['weather'], _warmed)
+
+    def test_budget(self):
+        """Tests that no more warmers run than the hourly budget allows."""
+        _warmed = []
+        _prefetcher = Prefetcher(self.log_path, {
+            'weather_today_full': lambda: _warmed.append('weather'),
+            'date': lambda: _warmed.append('date'),
+        }, threshold=0.1, max_per_hour=1)
+
+        _prefetcher.check(self.morning)
+        self.assertEqual(['weather'], _warmed)
+
+    def test_failing_warmer(self):
+        """Tests that a failing warmer is reported and does not stop others."""
+        _errors = []
+
+        def _fail():
+            raise ConnectionError()
+        _prefetcher = Prefetcher(self.log_path, {
+            'weather_today_full': _fail,
+            'date': lambda: None,
+        }, threshold=0.1, on_error=lambda *args: _errors.append(args))
+
+        self.assertEqual(['date'], _prefetcher.check(self.morning))
+        self.assertEqual('weather_today_full', _errors[0][0])
+
+    def test_failing_relearn(self):
+        """Tests that learning waits for my thread, and that failing to learn
+        is reported without ending it.
+        """
+        _errors = []
+        _again = Event()
+
+        def _error(*args):
+            _errors.append(args)
+            if len(_errors) > 1:
+                _again.set()
+        # A corrupt archive can't be read
+        with open(self.log_path + '.20181216-000000-000000.gz', 'wb') as _f:
+            _f.write(b'not gzipped')
+        _prefetcher = Prefetcher(self.log_path, {
+            'date': lambda: None,
+        }, check_interval=0.01, on_error=_error)
+        self.assertIsNone(_prefetcher.profile)
+        _prefetcher.start()
+        self.assertTrue(_again.wait(1))
+        _prefetcher.stop()
+        self.assertIsNone(_errors[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
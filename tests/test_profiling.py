@@ -0,0 +1,90 @@
+import unittest
+import os
+import pstats
+from tempfile import TemporaryDirectory
+from time import sleep
+from profiling import CommandProfiler
+
+
+def slow_fetch(seconds):
+    """Stands in for a command stuck on the network."""
+    sleep(seconds)
+    return 'Fetched.'
+
+
+def failing_fetch():
+    """Stands in for a command that fails."""
+    raise ConnectionError()
+
+
+class TestCommandProfiler(unittest.TestCase):
+    """Runs tests on the CommandProfiler."""
+
+    def setUp(self):
+        """Give each test its own profile directory."""
+        self.tempdir = TemporaryDirectory()
+        self.directory = os.path.join(self.tempdir.name, 'profiles')
+
+    def tearDown(self):
+        """Delete the profiles."""
+        self.tempdir.cleanup()
+
+    def profiles(self):
+        """Returns the names of the saved profiles, sorted."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(os.listdir(self.directory))
+
+    def test_disabled(self):
+        """Tests that nothing is profiled by default."""
+        _profiler = CommandProfiler(directory=self.directory)
+        self.assertFalse(_profiler.enabled)
+        self.assertEqual('Fetched.', _profiler.call('joke', slow_fetch, 0))
+        self.assertEqual([], self.profiles())
+
+    def test_every(self):
+        """Tests that every Nth run of each command is profiled."""
+        _profiler = CommandProfiler(every=2, directory=self.directory)
+        self.assertTrue(_profiler.enabled)
+        for _ in range(3):
+            self.assertEqual('Fetched.',
+                             _profiler.call('joke', slow_fetch, 0))
+        _profiler.call('date', slow_fetch, 0)
+
+        _profiles = self.profiles()
+        self.assertEqual(1, len(_profiles))
+        self.assertTrue(_profiles[0].startswith('joke-'))
+        self.assertTrue(_profiles[0].endswith('.prof'))
+        # The profile can be read back, and saw the command
+        _stats = pstats.Stats(os.path.join(self.directory, _profiles[0]))
+        self.assertIn('slow_fetch',
+                      [_key[2] for _key in _stats.stats])
+
+    def test_threshold(self):
+        """Tests that only runs slower than the threshold are saved."""
+        _profiler = CommandProfiler(threshold=0.05, directory=self.directory,
+                                    interval=0.001)
+        _profiler.call('joke', slow_fetch, 0)
+        self.assertEqual([], self.profiles())
+        _profiler.call('joke', slow_fetch, 0.1)
+
+        _profiles = self.profiles()
+        self.assertEqual(1, len(_profiles))
+        self.assertTrue(_profiles[0].endswith('.folded'))
+        with open(os.path.join(self.directory, _profiles[0])) as _stream:
+            _folded = _stream.read()
+        self.assertIn('slow_fetch', _folded)
+        # Each line is a stack and how many samples were in it
+        _stack, _count = _folded.splitlines()[0].rsplit(' ', 1)
+        self.assertGreater(int(_count), 0)
+
+    def test_failure(self):
+        """Tests that a failing command is still profiled, then raises."""
+        _profiler = CommandProfiler(every=1, directory=self.directory)
+        with self.assertRaises(ConnectionError):
+            _profiler.call('joke', failing_fetch)
+        self.assertEqual(1, len(self.profiles()))
+
+
+if __name__ == '__main__':
+    unittest.main()
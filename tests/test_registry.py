@@ -0,0 +1,195 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from registry import CommandRegistry
+
+
+def make_command(name, sensitivity=0.5):
+    """Returns a command with the given name, as HomeCommand tags it."""
+    def command(body):
+        return name
+    command.__name__ = name
+    command.sensitivity = sensitivity
+    command.sound = None
+    return command
+
+
+class FakeExecutor:
+    """Stands in for a CommandExecutor, recording every command submitted."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, command, *args):
+        self.submitted.append((command.__name__, args))
+        return True
+
+
+class FakeBody:
+    """Stands in for a Body, with an executor of its own."""
+
+    def __init__(self):
+        self.executor = FakeExecutor()
+
+
+class FakeDetector:
+    """Stands in for a LocalDetector, recording every change made to it.
+
+    Fails to load a model named broken.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.changes = []
+        self.callbacks = dict()
+
+    def add_model(self, model, sensitivity=None, callback=None):
+        if 'broken' in model:
+            raise RuntimeError('Invalid model file')
+        number = self.count
+        self.count += 1
+        self.callbacks[number] = callback
+        self.changes.append(('add', os.path.basename(model), sensitivity))
+        return number
+
+    def remove_model(self, number):
+        self.changes.append(('remove', number))
+
+    def set_sensitivity(self, number, sensitivity):
+        self.changes.append(('tune', number, sensitivity))
+
+
+class TestCommandRegistry(unittest.TestCase):
+    """Runs tests on the CommandRegistry."""
+
+    def setUp(self):
+        """Make a registry of two commands, with their models in a
+        temporary directory.
+        """
+        _directory = TemporaryDirectory()
+        self.addCleanup(_directory.cleanup)
+        self.models = _directory.name
+        for _name in ('a', 'b', 'c'):
+            with open(os.path.join(self.models, _name + '.pmdl'), 'w'):
+                pass
+        self.body = FakeBody()
+        self.commands = {
+            make_command('a'): 0.4, make_command('b'): 0.5
+        }
+        self.registry = CommandRegistry(
+            self.body, self.commands, models=self.models
+        )
+
+    def attach(self):
+        """Attach a detector loaded with the registry's commands.
+
+        Returns:
+            tuple: The detector, and the callbacks to start it with.
+        """
+        _detector = FakeDetector(len(self.registry))
+        _callbacks = self.registry.attach(
+            _detector, self.registry.entries()
+        )
+        return _detector, _callbacks
+
+    def test_lookup(self):
+        """Tests that commands are looked up by name, in the order added."""
+        self.assertEqual(['a', 'b'], list(self.registry))
+        self.assertIn('b', self.registry)
+        self.assertNotIn('c', self.registry)
+        _command = self.registry['a']
+        self.assertEqual(0.4, _command.sensitivity)
+        self.assertEqual(
+            os.path.join(self.models, 'a.pmdl'), _command.model
+        )
+        with self.assertRaises(KeyError):
+            self.registry.run('c')
+
+    def test_bound_per_body(self):
+        """Tests that each body's registry runs commands on that body."""
+        _other = FakeBody()
+        _registry = CommandRegistry(_other, self.commands)
+        self.registry.run('a')
+        _registry.run('b')
+        self.assertEqual([('a', (self.body,))], self.body.executor.submitted)
+        self.assertEqual([('b', (_other,))], _other.executor.submitted)
+
+    def test_deleted_body(self):
+        """Tests that commands are quietly dropped once the body is gone."""
+        _registry = CommandRegistry(FakeBody(), self.commands)
+        self.assertIsNone(_registry.run('a'))
+        with self.assertRaises(KeyError):
+            _registry.run('c')
+
+    def test_attach(self):
+        """Tests that attaching catches the detector up with whatever
+        changed since it was loaded, and binds its callbacks.
+        """
+        _commands = self.registry.entries()
+        self.registry.remove('b')
+        self.registry.add(make_command('c'), 0.6)
+        self.registry.retune('a', 0.3)
+        _detector = FakeDetector(2)
+        _callbacks = self.registry.attach(_detector, _commands)
+        self.assertEqual(
+            [('tune', 0, 0.3), ('remove', 1), ('add', 'c.pmdl', 0.6)],
+            _detector.changes
+        )
+        self.assertEqual(2, len(_callbacks))
+        _callbacks[0]()
+        _detector.callbacks[2]()
+        self.assertEqual(
+            ['a', 'c'], [_name for _name, _ in self.body.executor.submitted]
+        )
+
+    def test_hot_changes(self):
+        """Tests that only the changed command's model is touched while a
+        detector is attached.
+        """
+        _detector, _ = self.attach()
+        self.registry.add(make_command('c', 0.7))
+        self.registry.retune('b', 0.2)
+        self.registry.remove('a')
+        # Replacing a command loads its new model before dropping the old
+        self.registry.add(make_command('b'), 0.2, model=os.path.join(
+            self.models, 'c.pmdl'
+        ))
+        self.assertEqual([
+            ('add', 'c.pmdl', 0.7), ('tune', 1, 0.2), ('remove', 0),
+            ('add', 'c.pmdl', 0.2), ('remove', 1),
+        ], _detector.changes)
+        # Once detached, nothing is touched
+        self.registry.detach()
+        self.registry.remove('c')
+        self.assertEqual(5, len(_detector.changes))
+
+    def test_reload(self):
+        """Tests that only models whose files changed are reloaded."""
+        _detector, _ = self.attach()
+        self.assertEqual([], self.registry.reload())
+        _path = os.path.join(self.models, 'b.pmdl')
+        _stat = os.stat(_path)
+        os.utime(_path, ns=(_stat.st_atime_ns, _stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(['b'], self.registry.reload())
+        self.assertEqual([], self.registry.reload())
+        self.assertEqual(['a'], self.registry.reload('a'))
+        self.assertEqual([
+            ('add', 'b.pmdl', 0.5), ('remove', 1),
+            ('add', 'a.pmdl', 0.4), ('remove', 0),
+        ], _detector.changes)
+
+    def test_failed_add(self):
+        """Tests that a model failing to load leaves the command as it was."""
+        _detector, _ = self.attach()
+        _before = self.registry['a']
+        with self.assertRaises(RuntimeError):
+            self.registry.add(make_command('a'), model='models/broken.pmdl')
+        with self.assertRaises(RuntimeError):
+            self.registry.add(make_command('broken'))
+        self.assertIs(_before, self.registry['a'])
+        self.assertNotIn('broken', self.registry)
+        self.assertEqual([], _detector.changes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import os
+from tempfile import TemporaryDirectory
+from time import monotonic
+from soundbank import SoundBank
+
+
+class FakeSound:
+    """Stands in for pygame.mixer.Sound.
+
+    Decoding a file takes its contents as samples, unless it is broken.
+    """
+
+    def __init__(self, file=None, buffer=None):
+        if file is not None:
+            with open(file, 'rb') as stream:
+                buffer = stream.read()
+            if buffer == b'broken':
+                raise RuntimeError('Unrecognized audio format')
+        self.samples = buffer
+
+    def get_raw(self):
+        return self.samples
+
+    def get_length(self):
+        return 0.05
+
+
+class FakeChannel:
+    """Stands in for pygame.mixer.Channel; sounds play for 0.05 seconds."""
+
+    def __init__(self):
+        self.played = []
+        self.ends_at = 0.0
+
+    def play(self, sound):
+        self.played.append(sound.samples)
+        self.ends_at = monotonic() + sound.get_length()
+
+    def stop(self):
+        self.ends_at = 0.0
+
+    def get_busy(self):
+        return monotonic() < self.ends_at
+
+
+class FakeMixer:
+    """Stands in for pygame.mixer, counting how many files it decoded."""
+
+    def __init__(self, frequency=24000):
+        self.frequency = frequency
+        self.channels = [FakeChannel() for _ in range(2)]
+        self.reserved = 0
+        self.decoded = 0
+
+    def Sound(self, file=None, buffer=None):
+        if file is not None:
+            self.decoded += 1
+        return FakeSound(file, buffer)
+
+    def Channel(self, number):
+        return self.channels[number]
+
+    def get_init(self):
+        return self.frequency, -16, 2
+
+    def get_num_channels(self):
+        return len(self.channels)
+
+    def set_num_channels(self, count):
+        self.channels = [FakeChannel() for _ in range(count)]
+
+    def set_reserved(self, count):
+        self.reserved = count
+
+
+class TestSoundBank(unittest.TestCase):
+    """Runs tests on the SoundBank."""
+
+    def setUp(self):
+        """Create a directory with a few sounds for each test."""
+        self.directory = TemporaryDirectory()
+        self.sounds = os.path.join(self.directory.name, 'sounds')
+        self.cache = os.path.join(self.directory.name, 'cache')
+        os.mkdir(self.sounds)
+        for _name in ('neat', 'why', 'thicc'):
+            self.write_sound(_name, _name.encode())
+
+    def tearDown(self):
+        """Delete the sounds and their decoded samples."""
+        self.directory.cleanup()
+
+    def write_sound(self, name, data):
+        """Write a sound file with the given contents."""
+        with open(os.path.join(self.sounds, name + '.mp3'), 'wb') as _stream:
+            _stream.write(data)
+
+    def make_bank(self, mixer):
+        """Returns a bank of my sounds on the given mixer."""
+        return SoundBank(mixer, self.sounds, self.cache, tick=0.001)
+
+    def test_decoded_once(self):
+        """Tests that sounds are only decoded again once they change."""
+        _first = self.make_bank(FakeMixer())
+        self.assertEqual(3, _first.decoded)
+        self.assertEqual(['neat', 'thicc', 'why'], _first.names())
+
+        # A new bank reuses the samples decoded by the first
+        _mixer = FakeMixer()
+        _second = self.make_bank(_mixer)
+        self.assertEqual(0, _mixer.decoded)
+        self.assertEqual(3, _second.reused)
+        _second.play('neat')
+        self.assertIn(b'neat', [
+            _played for _channel in _mixer.channels
+            for _played in _channel.played
+        ])
+
+        # Changing a sound, or the mixer's format, means decoding it again
+        self.write_sound('why', b'why again')
+        _mixer = FakeMixer()
+        self.make_bank(_mixer)
+        self.assertEqual(1, _mixer.decoded)
+        _mixer = FakeMixer(frequency=44100)
+        self.make_bank(_mixer)
+        self.assertEqual(3, _mixer.decoded)
+
+    def test_channels(self):
+        """Tests that each sound plays on a reserved channel of its own."""
+        _mixer = FakeMixer()
+        _bank = self.make_bank(_mixer)
+        # Needed a channel more than the mixer had, and reserved all of them
+        self.assertEqual(3, _mixer.get_num_channels())
+        self.assertEqual(3, _mixer.reserved)
+
+        for _name in _bank.names():
+            _bank.play(_name, block=False)
+        self.assertEqual(
+            [[b'neat'], [b'thicc'], [b'why']],
+            [_channel.played for _channel in _mixer.channels]
+        )
+        _bank.stop()
+        self.assertFalse(any(
+            _channel.get_busy() for _channel in _mixer.channels
+        ))
+
+    def test_blocking(self):
+        """Tests that a blocking play returns once its sound is done."""
+        _mixer = FakeMixer()
+        _bank = self.make_bank(_mixer)
+        _started_at = _bank.play('why')
+        self.assertGreaterEqual(monotonic() - _started_at, 0.05)
+        self.assertFalse(_mixer.channels[2].get_busy())
+
+    def test_undecodable(self):
+        """Tests that sounds that can't be decoded are left out."""
+        self.write_sound('broken', b'broken')
+        _bank = self.make_bank(FakeMixer())
+        self.assertNotIn('broken', _bank)
+        self.assertIn('neat', _bank)
+        with self.assertRaises(KeyError):
+            _bank.play('broken')
+
+
+if __name__ == '__main__':
+    unittest.main()
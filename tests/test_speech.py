@@ -0,0 +1,211 @@
+import os
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from time import sleep
+from speech import (
+    BackendSelector, BackendStats, EspeakBackend, SpeechBackend, Synthesizer
+)
+from speechcache import SpeechCache
+
+
+class FakeBackend(SpeechBackend):
+    """Stands in for a speech backend, taking delay seconds per part.
+
+    Args:
+        name (str): Name to cache clips under.
+        delay (float): Seconds each part takes.
+        parts (int): How many parts to split each clip into.
+    """
+
+    lang = 'en'
+    fmt = 'mp3'
+
+    def __init__(self, name, delay=0.0, parts=1):
+        self.name = name
+        self.delay = delay
+        self.parts = parts
+        # Raised once the given number of parts have been made, if set
+        self.error = None
+        self.fail_after = 0
+        self.calls = 0
+
+    def stream(self, text):
+        self.calls += 1
+        for index in range(self.parts):
+            if self.error is not None and index == self.fail_after:
+                raise self.error
+            sleep(self.delay)
+            yield '{}:{}:{}'.format(self.name, text, index).encode()
+
+
+class TestBackendSelector(unittest.TestCase):
+    """Runs tests on the BackendSelector."""
+
+    def setUp(self):
+        """Create a preferred and an alternative backend for each test."""
+        self.preferred = FakeBackend('preferred')
+        self.other = FakeBackend('other')
+        self.selector = BackendSelector(
+            [self.preferred, self.other], cooldown=60, slack=0.1
+        )
+
+    def test_percentile(self):
+        """Tests rolling percentiles of latencies."""
+        _stats = BackendStats(window=10)
+        self.assertEqual(0.0, _stats.percentile(50))
+        for _latency in range(20):
+            _stats.latencies.append(_latency)
+        # Only the latest ten are remembered
+        self.assertEqual(10, _stats.percentile(0))
+        self.assertEqual(14, _stats.percentile(50))
+        self.assertEqual(19, _stats.percentile(95))
+
+    def test_preference(self):
+        """Tests that untried or similar backends keep their preference."""
+        self.assertEqual([self.preferred, self.other], self.selector.rank())
+        self.selector.record(self.preferred, 0.3)
+        self.selector.record(self.other, 0.25)
+        self.assertEqual([self.preferred, self.other], self.selector.rank())
+
+    def test_fastest(self):
+        """Tests that a much faster backend is chosen."""
+        self.selector.record(self.preferred, 0.5)
+        self.selector.record(self.other, 0.05)
+        self.assertEqual([self.other, self.preferred], self.selector.rank())
+
+    def test_failure(self):
+        """Tests that failed backends are avoided until they recover."""
+        self.selector.fail(self.preferred)
+        self.assertEqual([self.other, self.preferred], self.selector.rank())
+        self.assertFalse(self.selector.get_stats()['preferred']['healthy'])
+
+        # With nothing healthy, everything is still tried
+        self.selector.fail(self.other)
+        self.assertEqual([self.preferred, self.other], self.selector.rank())
+
+        # Working again makes it healthy again
+        self.selector.record(self.preferred, 0.1)
+        self.assertEqual(self.preferred, self.selector.rank()[0])
+        self.assertEqual(1, self.selector.get_stats()['preferred']['failures'])
+
+    def test_no_backends(self):
+        """Tests that a selector needs something to select."""
+        with self.assertRaises(ValueError):
+            BackendSelector([])
+
+
+class TestSynthesizer(unittest.TestCase):
+    """Runs tests on the Synthesizer with fake backends."""
+
+    def setUp(self):
+        """Give each test its own cache and backends."""
+        self.tempdir = TemporaryDirectory()
+        self.cache = SpeechCache(self.tempdir.name)
+        self.preferred = FakeBackend('preferred', parts=2)
+        self.other = FakeBackend('other', parts=2)
+        self.synthesizer = Synthesizer(self.cache, BackendSelector(
+            [self.preferred, self.other]
+        ))
+
+    def tearDown(self):
+        """Delete the cache."""
+        self.tempdir.cleanup()
+
+    def test_synthesize(self):
+        """Tests that clips are synthesized once, then cached."""
+        _path = self.synthesizer.synthesize('Toggled lamp.')
+        with open(_path, 'rb') as _stream:
+            self.assertEqual(
+                b'preferred:Toggled lamp.:0preferred:Toggled lamp.:1',
+                _stream.read()
+            )
+        self.assertEqual(_path, self.synthesizer.synthesize('Toggled lamp.'))
+        self.assertEqual(1, self.preferred.calls)
+        # Each lookup counts once, however many backends it checks
+        _stats = self.cache.get_stats()
+        self.assertEqual((1, 1), (_stats['hits'], _stats['misses']))
+
+    def test_fallback(self):
+        """Tests that a failing backend falls back to the next one."""
+        self.preferred.error = ConnectionError()
+        _clip = self.synthesizer.render('Toggled lamp.')
+        self.assertEqual(b'other:Toggled lamp.:0other:Toggled lamp.:1', _clip)
+        self.assertEqual(self.other, self.synthesizer.selector.rank()[0])
+
+        # The other backend's clip is reused from now on
+        self.preferred.error = None
+        self.assertIsInstance(self.synthesizer.render('Toggled lamp.'), str)
+        self.assertEqual(1, self.preferred.calls)
+
+    def test_all_fail(self):
+        """Tests that the last failure is raised when nothing works."""
+        self.preferred.error = ConnectionError()
+        self.other.error = TimeoutError()
+        with self.assertRaises(TimeoutError):
+            self.synthesizer.synthesize('Toggled lamp.')
+        with self.assertRaises(TimeoutError):
+            list(self.synthesizer.stream('Toggled lamp.'))
+
+    def test_stream_fallback(self):
+        """Tests that streaming falls back before anything was played."""
+        self.preferred.error = ConnectionError()
+        self.assertEqual(
+            b'other:Why?:0other:Why?:1',
+            b''.join(self.synthesizer.stream('Why?'))
+        )
+        self.assertEqual([self.cache.get('Why?', 'en', 'other')],
+                         list(self.synthesizer.stream('Why?')))
+
+    def test_stream_midway_failure(self):
+        """Tests that streaming doesn't switch voices midway through."""
+        self.preferred.error = ConnectionError()
+        self.preferred.fail_after = 1
+        _clips = self.synthesizer.stream('Why?')
+        self.assertEqual(b'preferred:Why?:0', next(_clips))
+        with self.assertRaises(ConnectionError):
+            next(_clips)
+        self.assertEqual(0, self.other.calls)
+
+    def test_stream_joins_ready_parts(self):
+        """Tests that parts which arrived while the first was playing are
+        joined into one clip.
+        """
+        self.preferred.parts = 4
+        self.preferred.delay = 0.05
+        _clips = self.synthesizer.stream('Why?')
+        self.assertEqual(b'preferred:Why?:0', next(_clips))
+        # Every other part arrives while the first is playing
+        sleep(0.5)
+        self.assertEqual(
+            [b'preferred:Why?:1preferred:Why?:2preferred:Why?:3'],
+            list(_clips)
+        )
+
+
+class TestEspeakBackend(unittest.TestCase):
+    """Runs tests on the EspeakBackend with a fake eSpeak NG."""
+
+    def test_dashed_text(self):
+        """Tests that text starting with a dash is spoken, not parsed."""
+        _tempdir = TemporaryDirectory()
+        self.addCleanup(_tempdir.cleanup)
+        # Answers with its arguments, then what it was asked to speak
+        _executable = os.path.join(_tempdir.name, 'espeak-ng')
+        with open(_executable, 'w') as _stream:
+            _stream.write(
+                '#!{}\nimport sys\n'
+                'sys.stdout.write(repr(sys.argv[1:]) + sys.stdin.read())\n'
+                .format(sys.executable)
+            )
+        os.chmod(_executable, 0o755)
+        _backend = EspeakBackend(executable=_executable)
+        _clip = b''.join(_backend.stream('-5 degrees outside.'))
+        self.assertEqual(
+            b"['-v', 'en-gb', '--stdout', '--stdin']-5 degrees outside.",
+            _clip
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
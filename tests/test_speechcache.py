@@ -0,0 +1,129 @@
+import unittest
+import os
+from tempfile import TemporaryDirectory
+from threading import Thread
+from speechcache import SpeechCache
+
+
+class TestSpeechCache(unittest.TestCase):
+    """Runs tests on the SpeechCache."""
+
+    def setUp(self):
+        """Give each test its own empty cache directory."""
+        self.tempdir = TemporaryDirectory()
+        self.directory = self.tempdir.name
+
+    def tearDown(self):
+        """Delete the cache directory."""
+        self.tempdir.cleanup()
+
+    def test_hit_and_miss(self):
+        """Tests that stored clips are found and counted."""
+        _cache = SpeechCache(self.directory)
+        self.assertIsNone(_cache.get('Toggled lamp.', 'en-uk', 'gtts'))
+
+        _path = _cache.put('Toggled lamp.', 'en-uk', 'gtts', b'clip')
+        self.assertEqual(_path, _cache.get('Toggled lamp.', 'en-uk', 'gtts'))
+        with open(_path, 'rb') as stream:
+            self.assertEqual(b'clip', stream.read())
+
+        # Language and backend are part of the key
+        self.assertIsNone(_cache.get('Toggled lamp.', 'en', 'gtts'))
+        self.assertIsNone(_cache.get('Toggled lamp.', 'en-uk', 'local'))
+
+        _stats = _cache.get_stats()
+        self.assertEqual(1, _stats['hits'])
+        self.assertEqual(3, _stats['misses'])
+        self.assertEqual(1, _stats['clips'])
+        self.assertEqual(4, _stats['bytes'])
+
+    def test_find(self):
+        """Tests that the first stored clip of several is found, counting
+        once.
+        """
+        _cache = SpeechCache(self.directory)
+        _sources = [('en-uk', 'gtts', 'mp3'), ('en-gb', 'espeak', 'wav')]
+        self.assertIsNone(_cache.find('Toggled lamp.', _sources))
+
+        _path = _cache.put('Toggled lamp.', 'en-gb', 'espeak', b'clip', 'wav')
+        self.assertEqual(_path, _cache.find('Toggled lamp.', _sources))
+
+        _stats = _cache.get_stats()
+        self.assertEqual(1, _stats['hits'])
+        self.assertEqual(1, _stats['misses'])
+
+    def test_concurrent_puts(self):
+        """Tests that one clip can be stored from many threads at once."""
+        _cache = SpeechCache(self.directory)
+        _errors = []
+
+        def _put():
+            for _ in range(300):
+                try:
+                    _cache.put('Toggled lamp.', 'en-uk', 'gtts', b'clip')
+                except Exception as e:
+                    _errors.append(e)
+        _threads = [Thread(target=_put) for _ in range(4)]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+
+        self.assertEqual([], _errors)
+        self.assertEqual(1, _cache.get_stats()['clips'])
+        self.assertEqual(4, _cache.get_stats()['bytes'])
+        # No temporary file is left behind
+        self.assertEqual(1, len(os.listdir(self.directory)))
+
+    def test_eviction(self):
+        """Tests that the least recently used clips are evicted by size."""
+        _cache = SpeechCache(self.directory, max_bytes=10)
+        _first = _cache.put('one', 'en-uk', 'gtts', b'1111')
+        _cache.put('two', 'en-uk', 'gtts', b'2222')
+        # Use the first clip so the second becomes the least recently used
+        _cache.get('one', 'en-uk', 'gtts')
+        _cache.put('three', 'en-uk', 'gtts', b'3333')
+
+        self.assertIsNotNone(_cache.get('one', 'en-uk', 'gtts'))
+        self.assertIsNone(_cache.get('two', 'en-uk', 'gtts'))
+        self.assertIsNotNone(_cache.get('three', 'en-uk', 'gtts'))
+        self.assertTrue(os.path.isfile(_first))
+        self.assertEqual(8, _cache.total_bytes)
+        self.assertEqual(2, len(os.listdir(self.directory)))
+
+    def test_oversized_clip(self):
+        """Tests that a clip larger than the limit is still kept to play."""
+        _cache = SpeechCache(self.directory, max_bytes=2)
+        _path = _cache.put('big', 'en-uk', 'gtts', b'12345')
+        self.assertTrue(os.path.isfile(_path))
+        self.assertEqual(_path, _cache.get('big', 'en-uk', 'gtts'))
+
+    def test_formats(self):
+        """Tests that clips keep their format's extension."""
+        _cache = SpeechCache(self.directory)
+        _path = _cache.put('Toggled lamp.', 'en-gb', 'espeak', b'RIFF', 'wav')
+        self.assertTrue(_path.endswith('.wav'))
+        self.assertEqual(
+            _path, _cache.get('Toggled lamp.', 'en-gb', 'espeak', 'wav')
+        )
+        self.assertIsNone(_cache.get('Toggled lamp.', 'en-gb', 'espeak'))
+
+        # Both formats are found again after a restart
+        _cache.put('Toggled lamp.', 'en-uk', 'gtts', b'mp3')
+        _cache = SpeechCache(self.directory)
+        self.assertEqual(2, _cache.get_stats()['clips'])
+
+    def test_persistence(self):
+        """Tests that a new cache reuses the clips an old one stored."""
+        _cache = SpeechCache(self.directory)
+        _cache.put('Monday, December 17.', 'en-uk', 'gtts', b'date')
+        del _cache
+
+        _cache = SpeechCache(self.directory)
+        _path = _cache.get('Monday, December 17.', 'en-uk', 'gtts')
+        self.assertIsNotNone(_path)
+        self.assertEqual(4, _cache.total_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import json
+import os
+from tempfile import TemporaryDirectory
+from threading import Barrier
+from startup import Startup
+
+
+class TestStartup(unittest.TestCase):
+    """Runs tests on Startup."""
+
+    def test_run_concurrently(self):
+        """Tests that steps run at once, each returning its own result."""
+        _startup = Startup()
+        # Each step waits for the other, so they only finish if run at once
+        _barrier = Barrier(2, timeout=5)
+        _results = _startup.run(
+            first=lambda: (_barrier.wait(), 1)[1],
+            second=lambda: (_barrier.wait(), 2)[1],
+        )
+        self.assertEqual({'first': 1, 'second': 2}, _results)
+        _timings = _startup.timings()
+        self.assertEqual({'first', 'second'},
+                         {_timing['name'] for _timing in _timings})
+        self.assertNotEqual(_timings[0]['thread'], _timings[1]['thread'])
+
+    def test_run_failure(self):
+        """Tests that a failed step raises only once every step is done."""
+        _startup = Startup()
+
+        def _fail():
+            raise FileNotFoundError('sounds/missing.mp3')
+
+        with self.assertRaises(FileNotFoundError):
+            _startup.run(failing=_fail, working=lambda: None)
+        self.assertEqual({'failing', 'working'},
+                         {_timing['name'] for _timing in _startup.timings()})
+
+    def test_report_and_dump(self):
+        """Tests that every step is reported and dumped once finished."""
+        with TemporaryDirectory() as _directory:
+            _path = os.path.join(_directory, 'startup.json')
+            _startup = Startup(path=_path)
+            with _startup.step('imports'):
+                pass
+            _startup.run(mixer=lambda: None)
+            _startup.finish()
+
+            with open(_path) as _stream:
+                _steps = json.load(_stream)['steps']
+            self.assertEqual(['imports', 'mixer', 'listening'],
+                             [_step['name'] for _step in _steps])
+            self.assertEqual(0.0, _steps[-1]['seconds'])
+            self.assertFalse(os.path.exists(_path[:-5] + '.part'))
+
+            _report = _startup.report().splitlines()
+            self.assertEqual(4, len(_report))
+            self.assertTrue(_report[1].startswith('imports'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import json
+import os
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep
+from tracing import Histogram, Tracer, BUCKET_BOUNDS, NO_COMMAND
+
+
+class TestTracing(unittest.TestCase):
+    """Runs tests on the Histogram and Tracer."""
+
+    def setUp(self):
+        """Give each test its own dump file."""
+        self.tempdir = TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'traces.json')
+
+    def tearDown(self):
+        """Delete the dump file."""
+        self.tempdir.cleanup()
+
+    def test_histogram(self):
+        """Tests that times land in fixed buckets and give percentiles."""
+        _histogram = Histogram()
+        self.assertIsNone(_histogram.percentile(50))
+        for _seconds in (0.0005, 0.003, 0.003, 0.003, 0.5, 100):
+            _histogram.record(_seconds)
+        self.assertEqual(len(BUCKET_BOUNDS) + 1, len(_histogram.buckets))
+        self.assertEqual(1, _histogram.buckets[0])
+        self.assertEqual(3, _histogram.buckets[2])
+        self.assertEqual(1, _histogram.buckets[-1])
+        self.assertEqual(0.004, _histogram.percentile(50))
+        self.assertEqual(100, _histogram.percentile(100))
+        self.assertEqual(6, _histogram.to_dict()['count'])
+
+    def test_commands(self):
+        """Tests that spans are filed under the command running them."""
+        _tracer = Tracer()
+        with _tracer.command('weather_today_full'):
+            with _tracer.span('fetch'):
+                sleep(0.01)
+            _tracer.record('playback', 2.0)
+        _tracer.record('fetch', 0.5)
+
+        _snapshot = _tracer.snapshot()
+        _weather = _snapshot['weather_today_full']
+        self.assertEqual({'fetch', 'playback', 'total'}, set(_weather))
+        self.assertGreaterEqual(_weather['fetch']['total'], 0.01)
+        self.assertGreaterEqual(_weather['total']['total'],
+                                _weather['fetch']['total'])
+        self.assertEqual(1, _snapshot[NO_COMMAND]['fetch']['count'])
+
+    def test_threads(self):
+        """Tests that each thread traces its own command."""
+        _tracer = Tracer()
+
+        def _run(name):
+            with _tracer.command(name):
+                sleep(0.01)
+                _tracer.record('fetch', 0.1)
+        _threads = [Thread(target=_run, args=(_name,))
+                    for _name in ('joke', 'date')]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+        _snapshot = _tracer.snapshot()
+        self.assertEqual(1, _snapshot['joke']['fetch']['count'])
+        self.assertEqual(1, _snapshot['date']['fetch']['count'])
+
+    def test_dump(self):
+        """Tests that histograms are dumped periodically and when stopped."""
+        _tracer = Tracer(self.path, dump_interval=0.02)
+        _tracer.start()
+        _tracer.record('fetch', 0.1, 'joke')
+        for _ in range(50):
+            if os.path.isfile(self.path):
+                break
+            sleep(0.01)
+        self.assertTrue(os.path.isfile(self.path))
+
+        _tracer.record('fetch', 0.2, 'joke')
+        _tracer.stop()
+        with open(self.path, 'r') as _stream:
+            _document = json.load(_stream)
+        self.assertEqual(2, _document['commands']['joke']['fetch']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
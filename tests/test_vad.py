@@ -0,0 +1,120 @@
+import unittest
+try:
+    import numpy as np
+    from vad import SILENCE, GatedDetect, VoiceGate
+except ImportError:
+    # The voice gate is optional, and so is numpy
+    np = None
+
+RATE = 16000
+# Samples per 20ms frame
+FRAME = 320
+
+
+def tone(frames, amplitude=3000, frequency=200):
+    """Returns the given number of frames of a voice-like tone, as PCM."""
+    _times = np.arange(frames * FRAME) / RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * _times)).astype(
+        '<i2'
+    ).tobytes()
+
+
+def hiss(frames, amplitude=3000):
+    """Returns the given number of frames of loud white noise, as PCM."""
+    _noise = np.random.default_rng(0).normal(0, amplitude, frames * FRAME)
+    return _noise.astype('<i2').tobytes()
+
+
+def quiet(frames):
+    """Returns the given number of frames of a quiet room, as PCM."""
+    return hiss(frames, amplitude=20)
+
+
+class FakeDetect:
+    """Stands in for snowboydetect.SnowboyDetect, recording what it heard."""
+
+    def __init__(self):
+        self.heard = []
+        self.resets = 0
+
+    def Reset(self):
+        self.resets += 1
+
+    def RunDetection(self, data):
+        self.heard.append(data)
+        return 0
+
+    def SampleRate(self):
+        return RATE
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestVoiceGate(unittest.TestCase):
+    """Runs tests on the VoiceGate and GatedDetect."""
+
+    def test_closed(self):
+        """Tests that a quiet room, or hiss, is never passed on."""
+        _gate = VoiceGate(hangover=5, preroll=3)
+        self.assertEqual(b'', _gate.process(quiet(50)))
+        self.assertEqual(b'', _gate.process(hiss(50)))
+        self.assertFalse(_gate.is_open)
+        self.assertEqual(100, _gate.seen)
+        self.assertEqual(0, _gate.passed)
+
+    def test_preroll(self):
+        """Tests that opening passes on the frames heard just before."""
+        _gate = VoiceGate(hangover=5, preroll=3)
+        _before = quiet(10)
+        self.assertEqual(b'', _gate.process(_before))
+        _voice = tone(4)
+        self.assertEqual(_before[-3 * FRAME * 2:] + _voice,
+                         _gate.process(_voice))
+        self.assertTrue(_gate.opened)
+        self.assertEqual(list(range(7, 14)), list(_gate.included))
+
+        # Still open, so nothing is passed on twice
+        _voice = tone(2)
+        self.assertEqual(_voice, _gate.process(_voice))
+        self.assertFalse(_gate.opened)
+
+    def test_hangover(self):
+        """Tests that the gate stays open for hangover frames after voice."""
+        _gate = VoiceGate(hangover=5, preroll=0)
+        _gate.process(quiet(10))
+        _gate.process(tone(3))
+        _after = quiet(8)
+        self.assertEqual(_after[:5 * FRAME * 2], _gate.process(_after))
+        self.assertFalse(_gate.is_open)
+        self.assertEqual(8, _gate.passed)
+
+        # Voice after a pause opens the gate again
+        _gate.process(tone(1))
+        self.assertTrue(_gate.opened)
+
+    def test_partial_frames(self):
+        """Tests that chunks needn't hold a whole number of frames."""
+        _gate = VoiceGate(hangover=50, preroll=0)
+        _voice = tone(10)
+        _passed = b''.join(
+            _gate.process(_voice[_start:_start + 1000])
+            for _start in range(0, len(_voice), 1000)
+        )
+        self.assertEqual(_voice, _passed)
+        self.assertEqual(10, _gate.seen)
+
+    def test_gated_detect(self):
+        """Tests that the detector only runs, reset, while the gate is open."""
+        _detect = FakeDetect()
+        _gated = GatedDetect(_detect, VoiceGate(hangover=1, preroll=0))
+        self.assertEqual(RATE, _gated.SampleRate())
+        self.assertEqual(SILENCE, _gated.RunDetection(quiet(10)))
+        self.assertEqual(0, _gated.RunDetection(tone(2)))
+        self.assertEqual(0, _gated.RunDetection(quiet(1)))
+        self.assertEqual(SILENCE, _gated.RunDetection(quiet(10)))
+        self.assertEqual(0, _gated.RunDetection(tone(2)))
+        self.assertEqual(3, len(_detect.heard))
+        self.assertEqual(2, _detect.resets)
+
+
+if __name__ == '__main__':
+    unittest.main()
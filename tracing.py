@@ -0,0 +1,208 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Lock, Thread, local
+from time import monotonic
+
+# Upper bounds (in seconds) of each histogram bucket: 1ms, 2ms, 4ms, ... 65s
+#   Anything slower lands in one last overflow bucket
+BUCKET_BOUNDS = tuple(0.001 * 2 ** i for i in range(17))
+# What spans recorded outside of any command are filed under
+NO_COMMAND = 'background'
+
+
+class Histogram:
+    """Fixed-size histogram of how long something took.
+
+    Never grows no matter how much is recorded: it only keeps a count per
+    bucket (see BUCKET_BOUNDS), plus the total and the slowest time.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Count one more time.
+
+        Args:
+            seconds (float): How long it took.
+        """
+        index = 0
+        while index < len(BUCKET_BOUNDS) and seconds > BUCKET_BOUNDS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Returns about how long the given percentile of times took.
+
+        Args:
+            percent (float): Percentile to return, from 0 to 100.
+
+        Returns:
+            float: The upper bound of the percentile's bucket (or the slowest
+                time, if it is in the overflow bucket), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, round(percent / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                break
+        if index < len(BUCKET_BOUNDS):
+            return min(BUCKET_BOUNDS[index], self.max)
+        return self.max
+
+    def to_dict(self):
+        """Returns a dict summarizing me, ready to be written as JSON."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'buckets': list(self.buckets),
+        }
+
+
+class Tracer:
+    """Records how long each phase of each command took.
+
+    Commands are traced by running them within command, which names the
+    command for every span recorded on that thread until it ends (and records
+    its total). A command's timeline is broken down into phases such as:
+        * detection: Waiting to start after being heard.
+        * led_on: Turning on the thinking LED.
+        * fetch: Fetching data over the network.
+        * synthesis: Waiting for speech, until it starts playing.
+        * playback: Playing a response.
+        * led_off: Turning off the thinking LED.
+    Every span goes into a Histogram per command and phase, so memory stays
+    fixed however long I run. Spans recorded outside of a command (like by
+    the prefetcher) are filed under NO_COMMAND.
+
+    Once started, the histograms are dumped to a JSON file every
+    dump_interval seconds, and once more when I am stopped.
+
+    Args:
+        path (str): JSON file to dump histograms to. Nothing is dumped if
+            None.
+        dump_interval (float): Seconds between dumps.
+    """
+
+    def __init__(self, path=None, dump_interval=60):
+        self.path = Path(path) if path else None
+        self.dump_interval = dump_interval
+        # Maps (command, phase) to its Histogram
+        self.__histograms = dict()
+        self.__lock = Lock()
+        # Holds the name of the command running on each thread
+        self.__current = local()
+        self.__stopped = Event()
+        self.__thread = None
+
+    @contextmanager
+    def command(self, name):
+        """Name every span recorded on this thread until I exit.
+
+        Also records the command's total time.
+
+        Args:
+            name (str): Name of the command.
+        """
+        previous = getattr(self.__current, 'name', None)
+        self.__current.name = name
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.record('total', monotonic() - start)
+            self.__current.name = previous
+
+    @contextmanager
+    def span(self, phase):
+        """Record how long this takes as a phase of the current command.
+
+        Args:
+            phase (str): Name of the phase.
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.record(phase, monotonic() - start)
+
+    def record(self, phase, seconds, command=None):
+        """Record how long a phase took.
+
+        Args:
+            phase (str): Name of the phase.
+            seconds (float): How long it took.
+            command (str): Name of the command it was part of. Defaults to
+                the one running on this thread.
+        """
+        if command is None:
+            command = getattr(self.__current, 'name', None) or NO_COMMAND
+        with self.__lock:
+            histogram = self.__histograms.get((command, phase))
+            if histogram is None:
+                histogram = self.__histograms[(command, phase)] = Histogram()
+            histogram.record(seconds)
+
+    def snapshot(self):
+        """Returns a dict mapping commands to dicts mapping their phases to
+        summaries of their histograms (see Histogram.to_dict).
+        """
+        with self.__lock:
+            commands = dict()
+            for (command, phase), histogram in self.__histograms.items():
+                commands.setdefault(command, dict())[phase] = \
+                    histogram.to_dict()
+            return commands
+
+    def dump(self):
+        """Write my histograms to my file, if I have one."""
+        if not self.path:
+            return
+        document = {
+            'dumped_on': str(datetime.now()),
+            'bucket_bounds': BUCKET_BOUNDS,
+            'commands': self.snapshot(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so a crash never corrupts it
+        temp_path = self.path.with_suffix('.part')
+        with open(temp_path, 'w') as stream:
+            json.dump(document, stream, indent=2)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        """Begin dumping my histograms periodically on a background thread."""
+        self.__stopped.clear()
+        self.__thread = Thread(
+            target=self.__run, name='xavier-tracer', daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self):
+        """Stop dumping periodically, then dump one last time."""
+        self.__stopped.set()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+        self.dump()
+
+    # Helpers #
+    def __run(self):
+        """Dump every dump_interval seconds until I am stopped."""
+        while not self.__stopped.wait(self.dump_interval):
+            self.dump()
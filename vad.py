@@ -0,0 +1,211 @@
+import numpy as np
+
+# What snowboy's RunDetection answers for audio with no voice in it
+SILENCE = -2
+
+
+class VoiceGate:
+    """Passes audio on only while someone might be speaking.
+
+    Running every hotword model over every chunk of audio is most of what
+    Xavier does while idle, even though most of what the microphone hears is
+    a quiet room. Instead, each chunk of 16-bit mono PCM is cut into frames,
+    and every frame's energy (its RMS) and zero-crossing rate are computed at
+    once. A frame is voice if it is ratio times louder than the room (and at
+    least min_energy), and crosses zero no more often than max_crossings,
+    since hiss and clicks cross far more often than speech. How loud the
+    room is is learned from the quietest frames that aren't voice: it drops
+    to them right away, but only rises slowly, so a burst of hiss doesn't
+    deafen the gate.
+
+    The gate opens on voice and stays open for hangover frames after the
+    last of it, so pauses between words and quiet endings get through. When
+    it opens, the preroll frames heard just before are passed on first, from
+    a ring buffer of the latest frames, so a command's onset (often too quiet
+    or too hissy to count as voice) is never clipped.
+
+    Args:
+        rate (int): Samples per second.
+        frame_ms (int): Milliseconds of audio per frame.
+        ratio (float): How many times louder than the room voice is.
+        min_energy (float): Quietest RMS that counts as voice.
+        max_crossings (float): Largest share of samples crossing zero that
+            counts as voice.
+        hangover (int): Frames to stay open for after the last voice.
+        preroll (int): Frames from before opening to pass on when opening.
+        adapt (float): Share of the way the room's loudness rises towards
+            louder quiet frames per frame, from 0 (never) to 1 (at once).
+    """
+
+    def __init__(self, rate=16000, frame_ms=20, ratio=3.0, min_energy=200.0,
+                 max_crossings=0.4, hangover=40, preroll=15, adapt=0.01):
+        self.frame_size = rate * frame_ms // 1000
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.max_crossings = max_crossings
+        self.hangover = hangover
+        self.preroll = preroll
+        self.adapt = adapt
+        # Until I hear the room, anything louder than min_energy is voice
+        self.floor = min_energy / ratio
+        # Frames seen and passed on, to tell how much detection was skipped
+        self.seen = 0
+        self.passed = 0
+        # Whether the last chunk opened me, and the numbers (counting from
+        #   the first frame I saw) of the frames it passed on
+        self.opened = False
+        self.included = np.empty(0, dtype=np.int64)
+
+        # Bytes of the last chunk that didn't fill a frame
+        self.__partial = b''
+        # The latest preroll frames, whether each was passed on already, and
+        #   where the oldest one is; nothing before the first frame is owed
+        self.__ring = np.zeros((preroll, self.frame_size), dtype='<i2')
+        self.__ring_passed = np.ones(preroll, dtype=bool)
+        self.__head = 0
+        # Frames since the last voice, and whether the last frame was passed
+        self.__since_voice = hangover + 1
+        self.__open = False
+
+    @property
+    def is_open(self):
+        """bool: Whether the last frame I saw was passed on."""
+        return self.__open
+
+    def process(self, data):
+        """Returns the part of the audio so far that should be detected in.
+
+        Args:
+            data (bytes): The next chunk of audio (or a memoryview of it).
+                Any frame it doesn't fill is finished by the next chunk.
+
+        Returns:
+            bytes: The frames to pass on, oldest first. Empty while closed.
+        """
+        if self.__partial:
+            data = self.__partial + data
+        size = self.frame_size
+        count = len(data) // (2 * size)
+        # Keep a copy, since data may be a view of a buffer that gets reused
+        self.__partial = bytes(data[count * 2 * size:])
+        self.opened = False
+        if not count:
+            self.included = self.included[:0]
+            return b''
+        frames = np.frombuffer(
+            data, dtype='<i2', count=count * size
+        ).reshape(count, size)
+
+        # A frame is open if voice was heard at most hangover frames before
+        numbers = np.arange(count)
+        last_voice = np.maximum.accumulate(np.where(
+            self.__voice(frames), numbers, -1 - self.__since_voice
+        ))
+        since_voice = numbers - last_voice
+        open_ = since_voice <= self.hangover
+        self.__since_voice = min(int(since_voice[-1]), self.hangover + 1)
+
+        # Also pass on whatever wasn't passed on within preroll frames before
+        #   an open frame, starting with the ones in my ring
+        preroll = self.preroll
+        order = (self.__head + np.arange(preroll)) % max(preroll, 1)
+        wanted = np.concatenate((np.zeros(preroll, dtype=bool), open_))
+        total = np.concatenate(([0], np.cumsum(wanted)))
+        positions = np.arange(preroll + count)
+        include = total[
+            np.minimum(positions + preroll + 1, preroll + count)
+        ] > total[positions]
+        include[:preroll] &= ~self.__ring_passed[order]
+
+        # The audio skips ahead, unless the frame before was passed on too
+        self.opened = bool(include.any()) and not self.__open
+        self.__open = bool(open_[-1])
+        first = self.seen - preroll
+        self.included = first + np.flatnonzero(include)
+        audio = b''.join((
+            self.__ring[order[include[:preroll]]].tobytes(),
+            frames[include[preroll:]].tobytes(),
+        ))
+
+        # Remember the latest frames, in case the next chunk opens me
+        if preroll:
+            self.__ring_passed[order] |= include[:preroll]
+            kept = min(count, preroll)
+            slots = (self.__head + np.arange(count - kept, count)) % preroll
+            self.__ring[slots] = frames[-kept:]
+            self.__ring_passed[slots] = include[-kept:]
+            self.__head = (self.__head + count) % preroll
+        self.seen += count
+        self.passed += len(self.included)
+        return audio
+
+    # Helpers #
+    def __voice(self, frames):
+        """Returns which frames are voice, learning the room from the rest.
+
+        Args:
+            frames (numpy.ndarray): Samples, one row per frame.
+
+        Returns:
+            numpy.ndarray: Whether each frame is voice.
+        """
+        samples = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        crossings = np.count_nonzero(
+            signs[:, 1:] != signs[:, :-1], axis=1
+        ) / (self.frame_size - 1)
+        voice = (
+            (energy >= max(self.min_energy, self.floor * self.ratio)) &
+            (crossings <= self.max_crossings)
+        )
+        # The room is as loud as its quietest frame; louder rooms are only
+        #   believed slowly, a little more with each quiet frame
+        quiet = energy[~voice]
+        if quiet.size:
+            quietest = float(quiet.min())
+            if quietest < self.floor:
+                self.floor = quietest
+            else:
+                weight = 1 - (1 - self.adapt) ** quiet.size
+                self.floor += weight * (quietest - self.floor)
+        return voice
+
+
+class GatedDetect:
+    """Runs a snowboydetect.SnowboyDetect only on audio a VoiceGate passes.
+
+    Stands in anywhere a SnowboyDetect does (such as a HotwordDetector's
+    detector), answering SILENCE without running any models while the gate
+    is closed. Whenever the gate opens, the detector is reset first, since
+    the audio it hears has skipped ahead.
+
+    Args:
+        detect (SnowboyDetect): The detector to run.
+        gate (VoiceGate): Decides which audio the detector hears.
+    """
+
+    def __init__(self, detect, gate):
+        self.detect = detect
+        self.gate = gate
+
+    def __getattr__(self, name):
+        # Everything but RunDetection goes straight to the detector
+        return getattr(self.detect, name)
+
+    def RunDetection(self, data):
+        """Returns what the detector answers for the audio the gate passes.
+
+        Args:
+            data (bytes): The next chunk of audio.
+
+        Returns:
+            int: The detected model's number, 0 if none was, SILENCE if the
+                gate is closed, or -1 on error.
+        """
+        audio = self.gate.process(data)
+        if not audio:
+            return SILENCE
+        if self.gate.opened:
+            self.detect.Reset()
+        return self.detect.RunDetection(audio)